@@ -1,32 +1,31 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import mysql.connector
 from datetime import datetime
-import base64
-import io
-import csv
-import os
-
-# Optional: try to use Pillow for better image support; if not available we fall back to PhotoImage
-try:
-    from PIL import Image, ImageTk
-    PIL_AVAILABLE = True
-except Exception:
-    PIL_AVAILABLE = False
+import sys
+import time
+
+# images come from the shared cache (Pillow preferred there; plain PhotoImage without it)
+import asset_cache
 
 # ----------- Database connection -----------
-def get_db_connection():
-    return mysql.connector.connect(
-        host='localhost',
-        database='drug_inventory',
-        user='root',
-        password='muskan'
-    )
+# pooled connections shared by every module (see database.py)
+from database import get_connection as get_db_connection
+from db_executor import DBExecutor
+from delta_refresh import DeltaView
+import export_engine
+import reorder_alerts
+from reorder_alerts import ReorderAlerts
+from virtual_table import VirtualTable
+
+BACKGROUND = "C:\\Users\\muska\\Downloads\\background.png"
+PREFETCH_DELAY_MS = 500   # idle time before the tab after the open one is built in the background
 
 
 # ----------- Main App -----------
 class DrugInventoryApp:
-    def __init__(self, root):
+    def __init__(self, root, prefetch=True):
+        self._started = time.perf_counter()
+        self.first_paint_ms = None
         self.root = root
         self.root.title("Drug Inventory Management System")
         self.root.geometry("1100x700")
@@ -71,6 +70,11 @@ class DrugInventoryApp:
         status_lbl = ttk.Label(header, textvariable=self.status_var)
         status_lbl.pack(side='right', padx=12)
 
+        # background DB work; results come back on the Tk thread
+        self.db = DBExecutor(self.root, status=self.set_status)
+        self._views = {}         # table -> DeltaView (high-water marks for delta refresh)
+        self.root.bind("<Destroy>", lambda e: self.db.shutdown() if e.widget is self.root else None, add="+")
+
         # ---------- Notebook ----------
         self.tab_control = ttk.Notebook(root)
         self.tab_control.pack(expand=1, fill='both', padx=12, pady=(6,12))
@@ -82,6 +86,7 @@ class DrugInventoryApp:
         self.vendors_tab = ttk.Frame(self.tab_control)
         self.locations_tab = ttk.Frame(self.tab_control)
         self.purchase_orders_tab = ttk.Frame(self.tab_control)
+        self.reorder_tab = ttk.Frame(self.tab_control)
 
         self.tab_control.add(self.roles_tab, text='Roles')
         self.tab_control.add(self.users_tab, text='Users')
@@ -89,52 +94,73 @@ class DrugInventoryApp:
         self.tab_control.add(self.vendors_tab, text='Vendors')
         self.tab_control.add(self.locations_tab, text='Locations')
         self.tab_control.add(self.purchase_orders_tab, text='Purchase Orders')
-
-        # per-tab background image (optional)
-        self._maybe_set_tab_background(self.roles_tab, "C:\\Users\\muska\\Downloads\\background.png")
-        self._maybe_set_tab_background(self.users_tab, "C:\\Users\\muska\\Downloads\\background.png")
-        self._maybe_set_tab_background(self.drugs_tab, "C:\\Users\\muska\\Downloads\\background.png")
-        self._maybe_set_tab_background(self.vendors_tab, "C:\\Users\\muska\\Downloads\\background.png")
-        self._maybe_set_tab_background(self.locations_tab, "C:\\Users\\muska\\Downloads\\background.png")
-        self._maybe_set_tab_background(self.purchase_orders_tab, "C:\\Users\\muska\\Downloads\\background.png")
-
-        # Initialize tabs (keeps all original functionality)
-        self.init_roles_tab()
-        self.init_users_tab()
-        self.init_drugs_tab()
-        self.init_vendors_tab()
-        self.init_locations_tab()
-        self.init_purchase_orders_tab()
+        self.tab_control.add(self.reorder_tab, text='Below Reorder Level')
+
+        # tabs are built (widgets, background, first load) the first time they are shown
+        self._tab_init = {
+            str(self.roles_tab): self.init_roles_tab,
+            str(self.users_tab): self.init_users_tab,
+            str(self.drugs_tab): self.init_drugs_tab,
+            str(self.vendors_tab): self.init_vendors_tab,
+            str(self.locations_tab): self.init_locations_tab,
+            str(self.purchase_orders_tab): self.init_purchase_orders_tab,
+            str(self.reorder_tab): self.init_reorder_tab,
+        }
+        self._built = set()
+        self._prefetch = prefetch
+        self._prefetch_id = None
+        self.tab_control.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        self.on_tab_changed()
 
         # Make window responsive
         root.update_idletasks()
         root.minsize(1000, 620)
+        root.after_idle(lambda: root.after(0, self._painted))
+
+    # ---------- Lazy tabs ----------
+    def on_tab_changed(self, event=None):
+        """Build the selected tab on first view, then prefetch the one after it once things are idle."""
+        current = self.tab_control.select()
+        if not current:
+            return
+        self._build_tab(current)
+        if self._prefetch_id is not None:
+            self.root.after_cancel(self._prefetch_id)
+            self._prefetch_id = None
+        if self._prefetch:
+            tabs = self.tab_control.tabs()
+            following = tabs[(tabs.index(current) + 1) % len(tabs)]
+            if following not in self._built:
+                self._prefetch_id = self.root.after(PREFETCH_DELAY_MS, lambda: self._prefetch_tab(following))
+
+    def _prefetch_tab(self, tab):
+        self._prefetch_id = None
+        if self.db.busy():
+            # the open tab is still loading; try again later rather than queue behind it
+            self._prefetch_id = self.root.after(PREFETCH_DELAY_MS, lambda: self._prefetch_tab(tab))
+            return
+        self._build_tab(tab)
+
+    def _build_tab(self, tab):
+        tab = str(tab)
+        if tab in self._built:
+            return
+        self._built.add(tab)
+        frame = self.tab_control.nametowidget(tab)
+        self._maybe_set_tab_background(frame, BACKGROUND)
+        self._tab_init[tab]()
+
+    def is_built(self, tab):
+        return str(tab) in self._built
+
+    def _painted(self):
+        self.first_paint_ms = (time.perf_counter() - self._started) * 1000
+        self.set_status(f"Ready in {self.first_paint_ms:.0f} ms", secs=3)
 
     # ---------- Utility helpers ----------
     def _load_image_if_exists(self, filename, size=None):
-        """Try to load an image (PIL preferred), return PhotoImage or None."""
-        try:
-            with open(filename, 'rb') as f:
-                data = f.read()
-        except Exception:
-            return None
-        try:
-            if PIL_AVAILABLE:
-                img = Image.open(io.BytesIO(data))
-                if size:
-                    img = img.resize(size, Image.ANTIALIAS)
-                ph = ImageTk.PhotoImage(img)
-            else:
-                # fallback: write bytes to PhotoImage if GIF/PNG readable by Tk
-                ph = tk.PhotoImage(data=base64.b64encode(data))
-            return ph
-        except Exception:
-            try:
-                # fallback: try direct PhotoImage load
-                ph = tk.PhotoImage(file=filename)
-                return ph
-            except Exception:
-                return None
+        """Shared PhotoImage of the file (decoded once per process, see asset_cache) or None."""
+        return asset_cache.photo(filename, size)
 
     def _maybe_set_tab_background(self, tab_frame, filename):
         img = self._load_image_if_exists(filename)
@@ -172,13 +198,13 @@ class DrugInventoryApp:
         return entries, form_frame
 
     def _add_tree_with_scroll(self, parent, columns, row=1):
-        """Create a Treeview with a vertical scrollbar and return it."""
+        """Create a (virtualized, filterable) table with a vertical scrollbar and return it."""
         container = ttk.Frame(parent)
         container.grid(row=row, column=0, sticky='nsew', padx=12, pady=(6,12))
         parent.rowconfigure(row, weight=1)
         parent.columnconfigure(0, weight=1)
 
-        tree = ttk.Treeview(container, columns=columns, show='headings')
+        tree = VirtualTable(container, columns=columns, show='headings', filterable=True)
         for col in columns:
             tree.heading(col, text=col)
             tree.column(col, anchor='w', stretch=True)
@@ -190,28 +216,41 @@ class DrugInventoryApp:
         container.columnconfigure(0, weight=1)
         return tree
 
+    def _load_tree(self, tree, table, columns, what):
+        """
+        Refresh tree from table on a worker thread (at most one load per tree).
+        The first call loads everything; later calls only fetch rows added
+        since (or touched by this window) and patch the tree in place.
+        """
+        view = self._views.get(table)
+        if view is None:
+            view = self._views[table] = DeltaView(columns, table, "id")
+
+        def done(patch):
+            full = not view.loaded
+            added, removed = view.apply(tree, patch)
+            if full:
+                self.set_status(f"{what.capitalize()} loaded", secs=2)
+            else:
+                self.set_status(f"{what.capitalize()}: {added} new/changed, {removed} removed", secs=2)
+
+        def failed(e):
+            messagebox.showerror("Error", str(e))
+            self.set_status(f"Error loading {what}", secs=6)
+
+        self.db.submit(what, view.fetcher(tree), done, failed, label=f"Loading {what}...")
+
     # ---------------- Export helper ----------------
     def export_tree_to_excel(self, tree, table_name):
         """
-        Export treeview contents to an Excel (.xlsx) if pandas + engine exist;
-        otherwise falls back to CSV. Default filename includes table_name + timestamp
-        to make it unique (no two tables will have same default file name).
+        Export a table to Excel (.xlsx), CSV or gzip CSV, streamed from the
+        database in the background (falls back to CSV without openpyxl).
+        Default filename includes table_name + timestamp to make it unique
+        (no two tables will have same default file name).
         """
-        # prepare data
-        cols = list(tree["columns"])
-        data = []
-        for iid in tree.get_children():
-            vals = tree.item(iid).get('values', ())
-            # convert datetimes to string
-            row_vals = []
-            for v in vals:
-                if isinstance(v, datetime):
-                    row_vals.append(v.strftime("%Y-%m-%d %H:%M:%S"))
-                elif v is None:
-                    row_vals.append("")
-                else:
-                    row_vals.append(v)
-            data.append(row_vals)
+        # same columns as the tree, read straight from the table rather than copied out of it
+        view = self._views.get(table_name)
+        columns = view.columns if view else "*"
 
         # default unique filename
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -221,42 +260,13 @@ class DrugInventoryApp:
         path = filedialog.asksaveasfilename(
             defaultextension=".xlsx",
             initialfile=default_filename,
-            filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("All files", "*.*")]
+            filetypes=export_engine.FILETYPES
         )
         if not path:
             return  # user cancelled
 
-        _, ext = os.path.splitext(path)
-        ext = ext.lower()
-
-        # Try pandas -> Excel first (if .xlsx requested), otherwise follow extension
-        try:
-            import pandas as pd
-            df = pd.DataFrame(data, columns=cols)
-            if ext == ".csv":
-                df.to_csv(path, index=False)
-                messagebox.showinfo("Export complete", f"Exported table to CSV:\n{path}")
-            else:
-                # default to Excel
-                df.to_excel(path, index=False)
-                messagebox.showinfo("Export complete", f"Exported table to Excel:\n{path}")
-            return
-        except Exception as e:
-            # pandas or engine not available — fallback to CSV
-            try:
-                # if user selected .xlsx but pandas unavailable, switch to .csv in same directory
-                if ext == ".xlsx" or ext == "":
-                    path_csv = os.path.splitext(path)[0] + ".csv"
-                else:
-                    path_csv = path
-                with open(path_csv, "w", newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(cols)
-                    for row in data:
-                        writer.writerow(["" if v is None else str(v) for v in row])
-                messagebox.showinfo("Export complete (CSV fallback)", f"pandas/openpyxl not available.\nExported as CSV:\n{path_csv}")
-            except Exception as e2:
-                messagebox.showerror("Export failed", f"Failed to export table.\nError1: {e}\nError2: {e2}")
+        export_engine.start_export(self.root, self.db, f"SELECT {columns} FROM {table_name} ORDER BY id", path,
+                                   headers=list(tree["columns"]), title=f"Export {table_name}")
 
     # ---------------- Roles Tab ----------------
     def init_roles_tab(self):
@@ -283,21 +293,7 @@ class DrugInventoryApp:
         self.load_roles()
 
     def load_roles(self):
-        self.set_status("Loading roles...")
-        for i in self.roles_tree.get_children():
-            self.roles_tree.delete(i)
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, name FROM roles")
-            for row in cursor.fetchall():
-                self.roles_tree.insert('', 'end', values=row)
-            cursor.close()
-            conn.close()
-            self.set_status("Roles loaded", secs=2)
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-            self.set_status("Error loading roles", secs=6)
+        self._load_tree(self.roles_tree, "roles", "id, name", "roles")
 
     def add_role(self):
         name = self.role_name_entry.get()
@@ -340,21 +336,7 @@ class DrugInventoryApp:
         self.load_users()
 
     def load_users(self):
-        self.set_status("Loading users...")
-        for i in self.users_tree.get_children():
-            self.users_tree.delete(i)
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id, username, email, full_name, role_id, organization_id, created_at, last_login FROM users")
-            for row in cursor.fetchall():
-                self.users_tree.insert('', 'end', values=(row['id'], row['username'], row['email'], row['full_name'], row['role_id'], row['organization_id'], row['created_at'], row['last_login']))
-            cursor.close()
-            conn.close()
-            self.set_status("Users loaded", secs=2)
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-            self.set_status("Error loading users", secs=6)
+        self._load_tree(self.users_tree, "users", "id, username, email, full_name, role_id, organization_id, created_at, last_login", "users")
 
     def add_user(self):
         data = {k: v.get() for k, v in self.user_entries.items()}
@@ -401,21 +383,7 @@ class DrugInventoryApp:
         self.load_drugs()
 
     def load_drugs(self):
-        self.set_status("Loading drugs...")
-        for i in self.drugs_tree.get_children():
-            self.drugs_tree.delete(i)
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id, name, generic_name, code, unit, reorder_level, created_at FROM drugs")
-            for row in cursor.fetchall():
-                self.drugs_tree.insert('', 'end', values=(row['id'], row['name'], row['generic_name'], row['code'], row['unit'], row['reorder_level'], row['created_at']))
-            cursor.close()
-            conn.close()
-            self.set_status("Drugs loaded", secs=2)
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-            self.set_status("Error loading drugs", secs=6)
+        self._load_tree(self.drugs_tree, "drugs", "id, name, generic_name, code, unit, reorder_level, created_at", "drugs")
 
     def add_drug(self):
         data = {k: v.get() for k, v in self.drug_entries.items()}
@@ -462,21 +430,7 @@ class DrugInventoryApp:
         self.load_vendors()
 
     def load_vendors(self):
-        self.set_status("Loading vendors...")
-        for i in self.vendors_tree.get_children():
-            self.vendors_tree.delete(i)
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id, name, contact_person, contact_email, rating, created_at FROM vendors")
-            for row in cursor.fetchall():
-                self.vendors_tree.insert('', 'end', values=(row['id'], row['name'], row['contact_person'], row['contact_email'], row['rating'], row['created_at']))
-            cursor.close()
-            conn.close()
-            self.set_status("Vendors loaded", secs=2)
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-            self.set_status("Error loading vendors", secs=6)
+        self._load_tree(self.vendors_tree, "vendors", "id, name, contact_person, contact_email, rating, created_at", "vendors")
 
     def add_vendor(self):
         data = {k: v.get() for k, v in self.vendor_entries.items()}
@@ -523,21 +477,7 @@ class DrugInventoryApp:
         self.load_locations()
 
     def load_locations(self):
-        self.set_status("Loading locations...")
-        for i in self.locations_tree.get_children():
-            self.locations_tree.delete(i)
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id, name, type, address, contact FROM locations")
-            for row in cursor.fetchall():
-                self.locations_tree.insert('', 'end', values=(row['id'], row['name'], row['type'], row['address'], row['contact']))
-            cursor.close()
-            conn.close()
-            self.set_status("Locations loaded", secs=2)
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-            self.set_status("Error loading locations", secs=6)
+        self._load_tree(self.locations_tree, "locations", "id, name, type, address, contact", "locations")
 
     def add_location(self):
         data = {k: v.get() for k, v in self.location_entries.items()}
@@ -584,21 +524,7 @@ class DrugInventoryApp:
         self.load_pos()
 
     def load_pos(self):
-        self.set_status("Loading purchase orders...")
-        for i in self.po_tree.get_children():
-            self.po_tree.delete(i)
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id, po_number, created_by, vendor_id, location_id, status, total_amount, expected_delivery_date, created_at FROM purchase_orders")
-            for row in cursor.fetchall():
-                self.po_tree.insert('', 'end', values=(row['id'], row['po_number'], row['created_by'], row['vendor_id'], row['location_id'], row['status'], row['total_amount'], row['expected_delivery_date'], row['created_at']))
-            cursor.close()
-            conn.close()
-            self.set_status("Purchase orders loaded", secs=2)
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-            self.set_status("Error loading purchase orders", secs=6)
+        self._load_tree(self.po_tree, "purchase_orders", "id, po_number, created_by, vendor_id, location_id, status, total_amount, expected_delivery_date, created_at", "purchase orders")
 
     def add_po(self):
         data = {k: v.get() for k, v in self.po_entries.items()}
@@ -628,9 +554,115 @@ class DrugInventoryApp:
             messagebox.showerror("Error", str(e))
             self.set_status("Error adding purchase order", secs=6)
 
+    # ---------------- Below Reorder Level Tab ----------------
+    def init_reorder_tab(self):
+        frame = self.reorder_tab
+        frame.columnconfigure(0, weight=1)
+        top = ttk.Frame(frame)
+        top.grid(row=0, column=0, sticky='ew', padx=12, pady=(12,6))
+        self.reorder_summary = tk.StringVar(value="Checking stock levels...")
+        ttk.Label(top, textvariable=self.reorder_summary).pack(side='left')
+        draft_btn = ttk.Button(top, text="📝 Draft PO", style='Accent.TButton', command=self.draft_pos)
+        draft_btn.pack(side='right', padx=6)
+        refresh_btn = ttk.Button(top, text="🔁 Refresh", command=self.reload_reorder)
+        refresh_btn.pack(side='right', padx=6)
+
+        cols = ("Drug ID", "Location ID", "Drug", "Location", "On Hand", "Reorder Level", "Shortfall")
+        self.reorder_tree = self._add_tree_with_scroll(frame, cols, row=1)
+        for col in ("Drug ID", "Location ID"):
+            self.reorder_tree.column(col, width=80, stretch=False)
+        self.reorder = ReorderAlerts()
+        self.db.submit("reorder-schema", lambda _req: reorder_alerts.ensure_indexes(), lambda _r: None)
+        self._reorder_poll_id = None
+        self.root.bind("<Destroy>", self._stop_reorder_poll, add="+")
+        self.poll_reorder()
+
+    def poll_reorder(self):
+        """Pick up stock changes from every counter; only changed drug/location rows are re-read."""
+        self._reorder_poll_id = None
+        try:
+            if not self.root.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        self.load_reorder()
+        self._reorder_poll_id = self.root.after(reorder_alerts.POLL_MS, self.poll_reorder)
+
+    def _stop_reorder_poll(self, event):
+        if event.widget is self.root and self._reorder_poll_id is not None:
+            self.root.after_cancel(self._reorder_poll_id)
+            self._reorder_poll_id = None
+
+    def reload_reorder(self):
+        """Full re-evaluation: also picks up reorder levels changed since the last one."""
+        self.reorder.reset()
+        self.load_reorder(force=True)
+
+    def load_reorder(self, force=False):
+        if self.db.busy("reorder") and not force:     # forced loads supersede the one in flight
+            return
+        tree = self.reorder_tree
+
+        def done(result):
+            full = not self.reorder.loaded
+            changed, cleared, ms = self.reorder.apply(result)
+            if full:
+                tree.delete(*tree.get_children())
+                changed.sort(key=lambda a: -a[6])
+            for drug_id, location_id in cleared:
+                if tree.exists(f"{drug_id}:{location_id}"):
+                    tree.delete(f"{drug_id}:{location_id}")
+            for alert in changed:
+                iid = f"{alert[0]}:{alert[1]}"
+                if tree.exists(iid):
+                    tree.item(iid, values=alert)
+                else:
+                    tree.insert("", "end", iid=iid, values=alert)
+            self.reorder_summary.set(f"{len(self.reorder.below)} drug/location pair(s) below reorder level "
+                                     f"(checked in {ms:.0f} ms)")
+
+        def failed(e):
+            self.reorder_summary.set(f"Could not check stock levels: {e}")
+
+        self.db.submit("reorder", self.reorder.fetcher(), done, failed)
+
+    def draft_pos(self):
+        """Draft purchase orders for the selected alerts (all of them when nothing is selected)."""
+        iids = self.reorder_tree.selection() or self.reorder_tree.get_children()
+        alerts = [self.reorder.below[key] for key in (tuple(map(int, iid.split(":"))) for iid in iids)
+                  if key in self.reorder.below]
+        if not alerts:
+            messagebox.showinfo("Draft PO", "Nothing is below its reorder level.")
+            return
+        if not messagebox.askyesno("Draft PO", f"Draft purchase orders for {len(alerts)} item(s)?"):
+            return
+
+        def done(result):
+            drafted, skipped = result
+            lines = [f"{po_number}: {items} item(s) for location {location_id}"
+                     for _, po_number, location_id, items in drafted]
+            if skipped:
+                lines.append(f"{skipped} item(s) skipped, already on an open order")
+            messagebox.showinfo("Draft PO", "\n".join(lines) or "No purchase orders drafted.")
+            if self.is_built(self.purchase_orders_tab):
+                self.load_pos()
+            self.set_status(f"Drafted {len(drafted)} purchase order(s)", secs=4)
+
+        self.db.submit("draft-po", lambda _req: reorder_alerts.draft_purchase_orders(alerts), done,
+                       lambda e: messagebox.showerror("Error", str(e)), label="Drafting purchase orders...")
+
 
 # ----------- Run App -----------
 if __name__ == "__main__":
     root = tk.Tk()
     app = DrugInventoryApp(root)
+    if "--first-paint" in sys.argv:
+        # print time-to-first-paint and quit (for startup measurements)
+        def report():
+            if app.first_paint_ms is None:
+                root.after(10, report)
+                return
+            print(f"first paint: {app.first_paint_ms:.0f} ms")
+            root.destroy()
+        root.after(0, report)
     root.mainloop()
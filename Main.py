@@ -3,8 +3,12 @@ import os
 import sys
 import subprocess
 import tkinter as tk
-from tkinter import ttk
-from PIL import Image, ImageTk
+from tkinter import ttk, messagebox
+
+import asset_cache
+from module_host import ModuleHost
+import zygote
+from resize_scheduler import ResizeScheduler
 
 # ---------------------------
 # CONFIG: change these paths
@@ -31,6 +35,8 @@ TILE_HOVER = "#0b1220"    # hover background
 TILE_TEXT = "#E6EEF3"     # tile text color
 APP_BG = "#081225"        # fallback app bg if no image
 LOGO_SIZE = (110, 110)    # desired logo nominal size
+TILE_PLACEHOLDER = (45, 55, 72, 255)    # tile image when the file is missing
+LOGO_PLACEHOLDER = (14, 165, 233, 255)
 
 
 # ---------------------------
@@ -52,28 +58,29 @@ def open_script(script_name):
     """
     script_path = resource_path(script_name)
     if not os.path.exists(script_path):
-        tk.messagebox.showerror("Script not found", f"Could not find: {script_path}")
+        messagebox.showerror("Script not found", f"Could not find: {script_path}")
         return
     try:
         # Use a non-blocking detached process
         subprocess.Popen([sys.executable, script_path], close_fds=True)
     except Exception as e:
-        tk.messagebox.showerror("Launch failed", f"Failed to launch {script_name}:\n{e}")
+        messagebox.showerror("Launch failed", f"Failed to launch {script_name}:\n{e}")
 
 
 # ---------------------------
 # Tile widget
 # ---------------------------
 class Tile(ttk.Frame):
-    def __init__(self, master, title, image_path, script, *args, **kwargs):
+    def __init__(self, master, title, image_path, script, *args, on_open=None, **kwargs):
         super().__init__(master, *args, **kwargs)
         self.title = title
         self.script = script
+        self.on_open = on_open      # called with the title; without one the script runs as its own process
         self.image_path = resource_path(image_path)
         self.configure(style="Tile.TFrame")
-        # keep references
-        self._img_orig = self._load_image_or_placeholder(self.image_path)
+        # the decoded image lives in asset_cache; _photo is the scaled copy on the canvas
         self._photo = None
+        self._drawn = None      # (width, height, draft) last drawn
 
         # create inner widgets
         self.canvas = tk.Canvas(self, highlightthickness=0, bd=0, relief="flat")
@@ -91,37 +98,19 @@ class Tile(ttk.Frame):
         self.rowconfigure(0, weight=1)
         self.columnconfigure(0, weight=1)
 
-    def _load_image_or_placeholder(self, path):
-        """Load image if exists else create a simple placeholder image."""
-        try:
-            img = Image.open(path).convert("RGBA")
-        except Exception:
-            # placeholder: colored rounded rectangle
-            img = Image.new("RGBA", (400, 280), (45, 55, 72, 255))
-        return img
-
-    def resize_and_draw(self, width, height):
+    def resize_and_draw(self, width, height, draft=False):
         """Resize internal image to fit width x height minus some padding and draw on canvas."""
-        if width <= 10 or height <= 10:
+        if width <= 10 or height <= 10 or self._drawn == (width, height, draft):
             return
         # determine target size leaving space for text
         target_w = width - 24
         target_h = int(height * 0.65)
         if target_w <= 0 or target_h <= 0:
             return
-        img = self._img_orig.copy()
-        img_ratio = img.width / img.height
-        tgt_ratio = target_w / target_h
-        if img_ratio > tgt_ratio:
-            # fit by width
-            new_w = target_w
-            new_h = max(1, int(target_w / img_ratio))
-        else:
-            new_h = target_h
-            new_w = max(1, int(target_h * img_ratio))
-        img = img.resize((new_w, new_h), Image.LANCZOS)
-        # create rounded corners mask (optional)
-        self._photo = ImageTk.PhotoImage(img)
+        # fit inside the target box; missing images get a plain placeholder
+        self._photo = asset_cache.photo(self.image_path, (target_w, target_h), fit="contain",
+                                        placeholder=(TILE_PLACEHOLDER, (400, 280)), draft=draft)
+        self._drawn = (width, height, draft)
         self.canvas.delete("all")
         # center it
         x = (width // 2)
@@ -129,7 +118,10 @@ class Tile(ttk.Frame):
         self.canvas.create_image(x, y, image=self._photo)
 
     def _on_click(self, _ev=None):
-        open_script(self.script)
+        if self.on_open:
+            self.on_open(self.title)
+        else:
+            open_script(self.script)
 
     def _on_enter(self, _ev=None):
         self.configure(style="TileHover.TFrame")
@@ -142,7 +134,8 @@ class Tile(ttk.Frame):
 # Main App
 # ---------------------------
 class LauncherApp(tk.Tk):
-    def __init__(self):
+    def __init__(self, isolated=None):
+        """isolated: None hosts the modules in this process; "fork" / "popen" runs each in its own (see zygote)."""
         super().__init__()
         self.title("Major: Tools Launcher")
         self.minsize(840, 520)
@@ -158,7 +151,7 @@ class LauncherApp(tk.Tk):
         # background canvas (scales with window)
         self.bg_canvas = tk.Canvas(self, highlightthickness=0)
         self.bg_canvas.grid(row=0, column=0, sticky="nsew")
-        self.bg_img_orig = self._load_bg_image(self.bg_path)
+        self.bg_available = asset_cache.available(self.bg_path)
         self.bg_photo = None
 
         # a semi-transparent overlay frame to hold content (so text readable)
@@ -177,6 +170,12 @@ class LauncherApp(tk.Tk):
         self.tile_container.grid_columnconfigure(0, weight=1)
         self.tile_container.grid_columnconfigure(1, weight=1)
 
+        # modules open as windows of this process (see module_host); a second click focuses them
+        self.host = ModuleHost(self)
+        self.launcher = zygote.Launcher(self, self._on_launch_event, mode=isolated) if isolated else None
+        if self.launcher:
+            self.bind("<Destroy>", lambda e: self.launcher.close() if e.widget is self else None, add="+")
+
         # create tiles
         self.tiles = []
         # Order them in a 2x2 grid
@@ -196,15 +195,17 @@ class LauncherApp(tk.Tk):
                 title = items[idx][0]
                 script = items[idx][1]
                 img_path = images_map.get(title, "")
-                tile = Tile(self.tile_container, title, img_path, script, style="Tile.TFrame")
+                tile = Tile(self.tile_container, title, img_path, script, style="Tile.TFrame",
+                            on_open=self.open_module if self.host.hosts(title) else None)
                 tile.grid(row=r, column=c, sticky="nsew", padx=12, pady=12)
                 self.tile_container.grid_rowconfigure(r, weight=1)
                 self.tile_container.grid_columnconfigure(c, weight=1)
                 self.tiles.append(tile)
                 idx += 1
 
-        # footer / small instruction
-        footer = ttk.Label(self.content_frame, text="Click a card to open the corresponding UI (each opens separately).",
+        # footer / small instruction (then how long the last module took to open)
+        self.footer_var = tk.StringVar(value="Click a card to open the corresponding UI.")
+        footer = ttk.Label(self.content_frame, textvariable=self.footer_var,
                            style="Footer.TLabel")
         footer.grid(row=2, column=0, sticky="ew", padx=28, pady=(0, 18))
 
@@ -212,23 +213,45 @@ class LauncherApp(tk.Tk):
         self.content_frame.grid_rowconfigure(1, weight=1)
         self.content_frame.grid_columnconfigure(0, weight=1)
 
-        # bind resize
-        self.bind("<Configure>", self._on_configure)
+        # redraw on resize: draft frames while dragging, one full render when it settles
+        self.resizer = ResizeScheduler(self, self._redraw)
 
         # apply styles
         self._setup_styles()
 
         # initial layout pass
         self.update_idletasks()
-        self._on_configure()
+        self.resizer.render_now()
+        # import the modules in the background so the first click only builds widgets
+        if not self.launcher:
+            self.after_idle(self.host.preload)
+
+    def open_module(self, title):
+        if self.launcher:
+            how = self.launcher.launch(title)
+            self.footer_var.set(f"Starting {title} ({how})...")
+            return
+        try:
+            _win, ms, created = self.host.open(title)
+        except Exception as e:
+            messagebox.showerror("Open failed", f"Could not open {title}:\n{e}")
+            return
+        self.footer_var.set(f"{title} opened in {ms:.0f} ms." if created else f"{title} is already open.")
+
+    def _on_launch_event(self, event):
+        if event["event"] == "ready":
+            self.footer_var.set(f"{event['title']} window up in {event['ms']:.0f} ms ({self.launcher.mode}, "
+                                f"pid {event['pid']}).")
+        elif event["event"] == "error":
+            messagebox.showerror("Open failed", f"Could not open {event['title']}:\n{event['error']}")
 
     def _build_topbar(self, parent):
         top = ttk.Frame(parent, style="Topbar.TFrame")
         top.grid(row=0, column=0, sticky="ew", padx=18, pady=18)
         top.grid_columnconfigure(2, weight=1)
         # logo
-        logo_img = self._load_logo_image(self.logo_path)
-        self.logo_photo = ImageTk.PhotoImage(logo_img)
+        self.logo_photo = asset_cache.photo(self.logo_path, LOGO_SIZE, fit="thumbnail",
+                                            placeholder=(LOGO_PLACEHOLDER, LOGO_SIZE))
         logo_lbl = ttk.Label(top, image=self.logo_photo, background="")
         logo_lbl.grid(row=0, column=0, sticky="w", padx=(0, 12))
         # title and subtitle
@@ -237,25 +260,6 @@ class LauncherApp(tk.Tk):
         subtitle = ttk.Label(top, text="Unified launcher for your GUIs — responsive & elegant", style="Subtitle.TLabel")
         subtitle.grid(row=0, column=2, sticky="w", padx=(10, 0))
 
-    def _load_logo_image(self, path):
-        try:
-            img = Image.open(path).convert("RGBA")
-            img.thumbnail(LOGO_SIZE, Image.LANCZOS)
-        except Exception:
-            # fallback: create a simple circle-like placeholder
-            img = Image.new("RGBA", LOGO_SIZE, (0, 0, 0, 0))
-            # draw a simple filled rectangle
-            placeholder = Image.new("RGBA", LOGO_SIZE, (14, 165, 233, 255))
-            img.paste(placeholder)
-        return img
-
-    def _load_bg_image(self, path):
-        try:
-            img = Image.open(path).convert("RGBA")
-        except Exception:
-            img = None
-        return img
-
     def _setup_styles(self):
         style = ttk.Style(self)
         # Basic theme tweak
@@ -276,30 +280,15 @@ class LauncherApp(tk.Tk):
         # give canvas a default background if no bg image
         self.bg_canvas.configure(background=APP_BG)
 
-    def _on_configure(self, event=None):
+    def _redraw(self, w, h, final=True):
         # adjust background to window size
-        w = self.winfo_width()
-        h = self.winfo_height()
-        if self.bg_img_orig:
-            # produce a scaled bg image that fills the window (cover)
-            img = self.bg_img_orig.copy()
-            img_ratio = img.width / img.height
-            win_ratio = max(0.001, w / max(1, h))
-            if img_ratio > win_ratio:
-                # bg is wider than window -> fit by height
-                new_h = h
-                new_w = int(img_ratio * new_h)
+        if self.bg_available:
+            # a scaled bg image that fills the window (cover, cropped to the centre)
+            self.bg_photo = asset_cache.photo(self.bg_path, (max(1, w), max(1, h)), fit="cover", draft=not final)
+            if self.bg_canvas.find_withtag("bg_image"):
+                self.bg_canvas.itemconfig("bg_image", image=self.bg_photo)
             else:
-                new_w = w
-                new_h = int(new_w / img_ratio)
-            img = img.resize((new_w, new_h), Image.LANCZOS)
-            # crop center
-            left = max(0, (new_w - w) // 2)
-            top = max(0, (new_h - h) // 2)
-            img = img.crop((left, top, left + w, top + h))
-            self.bg_photo = ImageTk.PhotoImage(img)
-            self.bg_canvas.delete("bg_image")
-            self.bg_canvas.create_image(0, 0, image=self.bg_photo, anchor="nw", tags="bg_image")
+                self.bg_canvas.create_image(0, 0, image=self.bg_photo, anchor="nw", tags="bg_image")
         else:
             # fallback color already set
             pass
@@ -314,17 +303,24 @@ class LauncherApp(tk.Tk):
 
         # cascade resize to tiles so they update their internal images
         # compute each tile size as roughly half available content area
-        # find each tile widget's actual size and call resize_and_draw
+        # find each tile widget's actual size and call resize_and_draw (once per frame, not per event)
         self.update_idletasks()
         for tile in self.tiles:
             tw = tile.winfo_width() or (content_w // 2 - 40)
             th = tile.winfo_height() or (content_h // 2 - 40)
-            tile.resize_and_draw(tw, th)
+            tile.resize_and_draw(tw, th, draft=not final)
 
 
 # ---------------------------
 # Entry point
 # ---------------------------
 if __name__ == "__main__":
-    app = LauncherApp()
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Drug management launcher.")
+    ap.add_argument("--isolated", nargs="?", const="fork", choices=("fork", "popen"),
+                    help="run each module in its own process: forked from a pre-warmed zygote (default) or a new "
+                         "interpreter per click")
+    args = ap.parse_args()
+    app = LauncherApp(isolated=args.isolated)
     app.mainloop()
@@ -3,25 +3,20 @@ import re
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
-import mysql.connector
-import pandas as pd
-from PIL import Image, ImageTk
 
 # ----------------- CONFIG -----------------
-DB_CONFIG = {
-    "host": "localhost",
-    "user": "root",
-    "password": "muskan",
-    "database": "drug_inventory"
-}
-
 LOGO_PATH = "C:\\Users\\muska\\Downloads\\logo.png"
 BACKGROUND_PATH = "C:\\Users\\muska\\Downloads\\background.png"
 EXPORT_DIR = os.getcwd()
 
 # ----------------- DB HELPERS -----------------
-def get_connection():
-    return mysql.connector.connect(**DB_CONFIG)
+from database import get_connection, IntegrityError
+from db_executor import DBExecutor, run_query
+from delta_refresh import DeltaView
+import export_engine
+import asset_cache
+from resize_scheduler import ResizeScheduler
+from virtual_table import VirtualTable
 
 def ensure_patients_table():
     conn = get_connection()
@@ -69,7 +64,7 @@ class PatientModule:
         self.master.title("Patient Module")
         self.master.geometry("1100x720")
         self.master.configure(bg="#f3f6fb")
-        self.master.bind("<Configure>", self.on_resize)  # Responsive resizing
+        self.resizer = ResizeScheduler(self.master, self.on_resize)  # Responsive resizing
 
         # Styles
         style = ttk.Style()
@@ -79,27 +74,29 @@ class PatientModule:
         style.configure("Card.TFrame", background="white", relief="flat")
         style.configure("Accent.TButton", background="#0b74d9")
 
-        # Load background
-        try:
-            self.bg_img = Image.open(BACKGROUND_PATH)
-            self.bg_photo = ImageTk.PhotoImage(self.bg_img.resize((1100, 720)))
+        # Background (decoded once per process from the nearest built tier, see asset_cache)
+        self.bg_available = asset_cache.available(BACKGROUND_PATH)
+        self.bg_label = None
+        if self.bg_available:
+            self.bg_photo = asset_cache.photo(BACKGROUND_PATH, (1100, 720))
             self.bg_label = tk.Label(self.master, image=self.bg_photo)
             self.bg_label.place(x=0, y=0, relwidth=1, relheight=1)
-        except:
-            self.bg_label = None
 
         # Header
         self.header_frame = ttk.Frame(self.master, padding=12, style="Card.TFrame")
         self.header_frame.place(relx=0.01, rely=0.01, relwidth=0.98, relheight=0.1)
 
-        try:
-            logo_img = Image.open(LOGO_PATH).resize((56, 56))
-            self.logo_photo = ImageTk.PhotoImage(logo_img)
+        self.logo_photo = asset_cache.photo(LOGO_PATH, (56, 56))
+        if self.logo_photo:
             tk.Label(self.header_frame, image=self.logo_photo, bg="white").place(relx=0.01, rely=0.1)
-        except:
+        else:
             tk.Label(self.header_frame, text="[Logo]", font=("Segoe UI", 12, "bold"), bg="white").place(relx=0.01, rely=0.25)
 
         ttk.Label(self.header_frame, text="Patient Management", style="Header.TLabel").place(relx=0.08, rely=0.2)
+        self.status_var = tk.StringVar(value="Ready")
+        ttk.Label(self.header_frame, textvariable=self.status_var, background="white").place(relx=0.7, rely=0.3)
+        self.db = DBExecutor(self.master, status=self.status_var.set)
+        self.master.bind("<Destroy>", lambda e: self.db.shutdown() if e.widget is self.master else None, add="+")
        # ttk.Label(self.header_frame, text="Maintain patient records — patient_code links with Sales/Dispense",
        #           font=("Segoe UI", 9)).place(relx=0.08, rely=0.65)
 
@@ -133,9 +130,9 @@ class PatientModule:
         ttk.Button(self.list_card, text="Show All", command=self.fetch_patients).place(relx=0.66, rely=0.07, relwidth=0.12)
         ttk.Button(self.list_card, text="Export to Excel", command=self.export_to_excel).place(relx=0.80, rely=0.07, relwidth=0.18)
 
-        # Treeview
+        # Table (only the visible rows are rendered)
         cols = ("ID", "Code", "Name", "Gender", "DOB", "Phone", "Email", "Address", "Created At")
-        self.tree = ttk.Treeview(self.list_card, columns=cols, show="headings")
+        self.tree = VirtualTable(self.list_card, columns=cols, show="headings")
         for c in cols:
             self.tree.heading(c, text=c)
             if c in ("ID", "Gender", "DOB", "Phone"):
@@ -149,6 +146,12 @@ class PatientModule:
         self.tree.place(relx=0.02, rely=0.15, relwidth=0.96, relheight=0.83)
         self.tree.bind("<<TreeviewSelect>>", self.on_tree_select)
 
+        # other counters may add, edit or delete patients; check_deletes notices deletions
+        self.patients_view = DeltaView(
+            "id, patient_code, full_name, gender, dob, phone, email, address, created_at", "patients", "id",
+            order_by="created_at DESC", limit=1000, newest_first=True, check_deletes=True,
+            format_row=self._format_row)
+        self._searching = False
         self.fetch_patients()
         self.master.get_selected_patient = self.get_selected_patient
 
@@ -186,13 +189,13 @@ class PatientModule:
         ttk.Button(self.form_card, text="Clear", command=self.clear_form).place(relx=0.52, rely=0.85, relwidth=0.2)
         ttk.Button(self.form_card, text="Delete", command=self.delete_patient).place(relx=0.76, rely=0.85, relwidth=0.2)
 
-    def on_resize(self, event):
-        # Resize background
-        if self.bg_label and self.bg_img:
-            w, h = event.width, event.height
-            resized_bg = self.bg_img.resize((w, h))
-            self.bg_photo = ImageTk.PhotoImage(resized_bg)
-            self.bg_label.configure(image=self.bg_photo)
+    def on_resize(self, w, h, final=True):
+        # Resize background (quick draft while dragging, see ResizeScheduler)
+        if self.bg_label and self.bg_available:
+            photo = asset_cache.photo(BACKGROUND_PATH, (w, h), draft=not final)
+            if photo:
+                self.bg_photo = photo
+                self.bg_label.configure(image=self.bg_photo)
 
     # ----------------- FULL METHODS -----------------
     def generate_code(self):
@@ -234,7 +237,7 @@ class PatientModule:
             messagebox.showinfo("Success", "Patient added successfully.")
             self.fetch_patients()
             self.clear_form()
-        except mysql.connector.IntegrityError as e:
+        except IntegrityError as e:
             messagebox.showerror("DB error", f"Patient code must be unique. ({e})")
         except Exception as e:
             messagebox.showerror("DB error", str(e))
@@ -243,23 +246,44 @@ class PatientModule:
             conn.close()
 
     def fetch_patients(self):
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT id, patient_code, full_name, gender, dob, phone, email, address, created_at
-            FROM patients
-            ORDER BY created_at DESC
-            LIMIT 1000
-        """)
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
+        """Newest 1000 patients; after the first load only new/edited/deleted rows are fetched."""
+        if self._searching:
+            # the tree holds search results -- start over with a full load
+            self._searching = False
+            self.patients_view.reset()
+        view = self.patients_view
+
+        def done(patch):
+            full = not view.loaded
+            changed, removed = view.apply(self.tree, patch)
+            if full:
+                self.status_var.set(f"{len(self.tree.get_children())} patients")
+            else:
+                self.status_var.set(f"{len(self.tree.get_children())} patients ({changed} new/changed, {removed} removed)")
+
+        self.db.submit("patients", view.fetcher(self.tree), done, self._load_failed, label="Loading patients...")
+
+    def _load_patients(self, sql, params=()):
+        # fetch and search share one view key, so a newer search supersedes an older load
+        self.db.submit("patients", lambda _req: run_query(sql, params), self._show_rows, self._load_failed,
+                       label="Loading patients...")
+
+    def _load_failed(self, e):
+        self.status_var.set("Error loading patients")
+        messagebox.showerror("DB error", str(e))
+
+    @staticmethod
+    def _format_row(r):
+        dob = r[4].strftime("%Y-%m-%d") if r[4] else ""
+        created = r[8].strftime("%Y-%m-%d %H:%M:%S") if r[8] else ""
+        address = (r[7][:80] + "...") if r[7] and len(r[7]) > 90 else (r[7] or "")
+        return (r[0], r[1], r[2], r[3], dob, r[5] or "", r[6] or "", address, created)
+
+    def _show_rows(self, rows):
         self.tree.delete(*self.tree.get_children())
         for r in rows:
-            dob = r[4].strftime("%Y-%m-%d") if r[4] else ""
-            created = r[8].strftime("%Y-%m-%d %H:%M:%S") if r[8] else ""
-            address = (r[7][:80] + "...") if r[7] and len(r[7]) > 90 else (r[7] or "")
-            self.tree.insert("", "end", values=(r[0], r[1], r[2], r[3], dob, r[5] or "", r[6] or "", address, created))
+            self.tree.insert("", "end", iid=str(r[0]), values=self._format_row(r))
+        self.status_var.set(f"{len(rows)} patients")
 
     def on_tree_select(self, event):
         self.populate_form_from_selection()
@@ -337,8 +361,9 @@ class PatientModule:
             """, (code if code else None, name, gender, dob if dob else None, phone if phone else None, email if email else None, addr if addr else None, pid))
             conn.commit()
             messagebox.showinfo("Success", "Patient updated.")
+            self.patients_view.touch(int(pid))
             self.fetch_patients()
-        except mysql.connector.IntegrityError as e:
+        except IntegrityError as e:
             messagebox.showerror("DB error", f"Patient code must be unique. ({e})")
         except Exception as e:
             messagebox.showerror("DB error", str(e))
@@ -360,6 +385,7 @@ class PatientModule:
             cur.execute("DELETE FROM patients WHERE id=%s", (pid,))
             conn.commit()
             messagebox.showinfo("Deleted", "Patient deleted successfully.")
+            self.patients_view.touch(int(pid))
             self.fetch_patients()
             self.clear_form()
         except Exception as e:
@@ -373,44 +399,27 @@ class PatientModule:
             self.fetch_patients()
             return
         like = f"%{q}%"
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("""
+        self._searching = True
+        self._load_patients("""
             SELECT id, patient_code, full_name, gender, dob, phone, email, address, created_at
             FROM patients
             WHERE full_name LIKE %s OR patient_code LIKE %s OR phone LIKE %s
             ORDER BY created_at DESC
             LIMIT 500
         """, (like, like, like))
-        rows = cur.fetchall()
-        cur.close(); conn.close()
-        self.tree.delete(*self.tree.get_children())
-        for r in rows:
-            dob = r[4].strftime("%Y-%m-%d") if r[4] else ""
-            created = r[8].strftime("%Y-%m-%d %H:%M:%S") if r[8] else ""
-            address = (r[7][:80] + "...") if r[7] and len(r[7]) > 90 else (r[7] or "")
-            self.tree.insert("", "end", values=(r[0], r[1], r[2], r[3], dob, r[5] or "", r[6] or "", address, created))
 
     def export_to_excel(self):
-        conn = get_connection()
-        try:
-            df = pd.read_sql("""
+        filename = filedialog.asksaveasfilename(defaultextension=".xlsx",
+                                                initialdir=EXPORT_DIR,
+                                                filetypes=export_engine.FILETYPES,
+                                                title="Save patient list as")
+        if filename:
+            export_engine.start_export(self.master, self.db, """
                 SELECT id AS ID, patient_code AS Code, full_name AS Name, gender AS Gender,
                        dob AS DOB, phone AS Phone, email AS Email, address AS Address, created_at AS CreatedAt
                 FROM patients
                 ORDER BY created_at DESC
-            """, conn)
-            filename = filedialog.asksaveasfilename(defaultextension=".xlsx",
-                                                    initialdir=EXPORT_DIR,
-                                                    filetypes=[("Excel files","*.xlsx")],
-                                                    title="Save patient list as")
-            if filename:
-                df.to_excel(filename, index=False)
-                messagebox.showinfo("Exported", f"Patient data exported to:\n{filename}")
-        except Exception as e:
-            messagebox.showerror("Error exporting", str(e))
-        finally:
-            conn.close()
+            """, filename, title="Export patients")
 
 
 if __name__ == "__main__":
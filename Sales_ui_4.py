@@ -1,22 +1,26 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-from PIL import Image, ImageTk
-import mysql.connector
-import pandas as pd
-from datetime import datetime
-from fpdf import FPDF  # pip install fpdf
+import time
 
 # ---------- Database Connection ----------
-def get_connection():
-    return mysql.connector.connect(
-        host='localhost',
-        database='drug_inventory',
-        user='root',
-        password='muskan'
-    )
+from db_executor import DBExecutor, run_query
+from dispense import dispense, dispense_cart, dispense_fefo, ensure_indexes, InsufficientStock
+import sales_history
+import export_engine
+import billing
+import expiry_sweeper
+import stock_on_hand
+import reorder_alerts
+import asset_cache
+from drug_index import DrugIndex, BatchPrefetcher, load_index
+from scan_index import ScanIndex, UnknownCode, SYNC_MS
+from virtual_table import VirtualTable
+
+FEFO_CHOICE = "Auto (FEFO)"
 
 # ---------- Patient & Sales Window ----------
-def open_patient_sales_window(root):
+def open_patient_sales_window(root, close_root=True):
+    """Build the sales window as a Toplevel of root and return it (close_root: closing it also ends root)."""
     win = tk.Toplevel(root)
     win.title("Patient & Pharmacy Sales")
     win.geometry("1100x750")
@@ -26,14 +30,12 @@ def open_patient_sales_window(root):
     win.rowconfigure(2, weight=1)
 
     # ---------- Background ----------
-    bg_img = Image.open("C:\\Users\\muska\\Downloads\\background.png")
-    bg_photo = ImageTk.PhotoImage(bg_img)
+    bg_photo = asset_cache.photo("C:\\Users\\muska\\Downloads\\background.png")
     bg_label = tk.Label(win, image=bg_photo)
     bg_label.place(x=0, y=0, relwidth=1, relheight=1)
 
     # ---------- Logo ----------
-    logo_img = Image.open("C:\\Users\\muska\\Downloads\\logo.png").resize((50,50))
-    logo_photo = ImageTk.PhotoImage(logo_img)
+    logo_photo = asset_cache.photo("C:\\Users\\muska\\Downloads\\logo.png", (50,50))
     logo_label = tk.Label(win, image=logo_photo, bg="#e6f0ff")
     logo_label.grid(row=0, column=0, sticky="nw", padx=20, pady=10)
 
@@ -71,36 +73,142 @@ def open_patient_sales_window(root):
     qty_entry = ttk.Entry(input_frame, width=25)
     qty_entry.grid(row=2,column=1,padx=10,pady=5,sticky="ew")
 
-    # ---------- Load Drugs ----------
+    # Location (FEFO allocates within this location)
+    ttk.Label(input_frame, text="Location:", font=("Arial",10,"bold")).grid(row=2,column=2,padx=10,pady=5,sticky="w")
+    loc_cb = ttk.Combobox(input_frame, width=25, state="readonly")
+    loc_cb.grid(row=2,column=3,padx=10,pady=5,sticky="ew")
+
+    # ---------- Status / background DB ----------
+    status_var = tk.StringVar(value="Ready")
+    tk.Label(win, textvariable=status_var, anchor="w", bg="#e6f0ff", fg="#003366").grid(row=3, column=0, sticky="ew", padx=20, pady=(0,6))
+    db = DBExecutor(win, status=status_var.set)
+    win.bind("<Destroy>", lambda e: db.shutdown() if e.widget is win else None, add="+")
+
+    def show_db_error(e):
+        status_var.set("Database error")
+        messagebox.showerror("DB Error", str(e))
+
+    # ---------- Load Drugs (type-ahead over an in-memory index) ----------
+    picker = {"index": DrugIndex(), "batches": BatchPrefetcher()}
+    NAV_KEYS = ("Up", "Down", "Left", "Right", "Return", "Tab", "Escape", "Home", "End")
+
+    def drug_label(row):
+        return f"{row[0]} - {row[1]}"
+
+    def prefetch_batches(drug_ids):
+        # one query for every drug in the list, so picking one needs no round trip
+        location_id = selected_location()
+        if location_id is None or not drug_ids:
+            return
+        db.submit("prefetch", lambda _req: picker["batches"].prefetch(location_id, drug_ids), lambda _n: None,
+                  lambda _e: None)
+
+    def show_matches(cb, prefetch=False):
+        rows, ms = picker["index"].timed_search(cb.get())
+        cb["values"] = [drug_label(r) for r in rows]
+        if prefetch:
+            prefetch_batches([r[0] for r in rows])
+        return rows, ms
+
+    def on_drug_typed(event):
+        if event.keysym in NAV_KEYS:
+            return
+        rows, ms = show_matches(event.widget, prefetch=event.widget is drug_cb)
+        status_var.set(f"{len(rows)} matching drugs ({ms:.1f} ms)")
+
     def load_drugs():
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name FROM drugs")
-        drugs = cursor.fetchall()
-        conn.close()
-        drug_cb["values"] = [f"{d[0]} - {d[1]}" for d in drugs]
+        def done(index):
+            picker["index"] = index
+            show_matches(drug_cb, prefetch=True)
+            show_matches(filter_drug_cb)
+            status_var.set(f"{len(index)} drugs loaded")
+        db.submit("drugs", lambda _req: load_index(), done, show_db_error, label="Loading drugs...")
+
+    def load_locations():
+        def done(locations):
+            loc_cb["values"] = [f"{l[0]} - {l[1]}" for l in locations]
+            if locations and not loc_cb.get():
+                loc_cb.current(0)
+        db.submit("locations", lambda _req: run_query("SELECT id, name FROM locations ORDER BY id"), done, show_db_error)
+
+    def selected_location():
+        return int(loc_cb.get().split(" - ")[0]) if loc_cb.get() else None
+
+    def selected_drug():
+        """(drug_id, drug_name) for the chosen drug, or None while the box holds typed text."""
+        drug_id, _, drug_name = drug_cb.get().partition(" - ")
+        return (int(drug_id), drug_name) if drug_id.isdigit() and drug_name else None
+
+    def selected_batch():
+        """(batch_id, batch_no) for the chosen batch (batch_id None for FEFO), or None for typed text."""
+        if batch_cb.get() == FEFO_CHOICE:
+            return None, "FEFO"
+        batch_id, _, batch_label = batch_cb.get().partition(" - ")
+        return (int(batch_id), batch_label.rsplit(" (Qty", 1)[0]) if batch_id.isdigit() and batch_label else None
+
+    def selected_drug_and_batch():
+        """selected_drug() + selected_batch(), or None after telling the user what to pick."""
+        drug, batch = selected_drug(), selected_batch()
+        if drug is None:
+            messagebox.showerror("Error", "Select a drug from the list!")
+            return None
+        if batch is None:
+            messagebox.showerror("Error", "Select a batch from the list!")
+            return None
+        return drug + batch
 
     # ---------- Load Batches ----------
+    def show_batches(batches):
+        # earliest expiry first, same order the FEFO allocator uses
+        batch_cb["values"] = [FEFO_CHOICE] + [f"{b[0]} - {b[1]} (Qty: {b[2]}, Exp: {b[3] or '-'})" for b in batches]
+        batch_cb.set(FEFO_CHOICE)
+        status_var.set(f"{len(batches)} batches available")
+
     def load_batches(event):
-        if not drug_cb.get():
+        if selected_drug() is None:
+            return
+        drug_id = selected_drug()[0]
+        location_id = selected_location()
+        cached = picker["batches"].get(location_id, drug_id)
+        if cached is not None:
+            show_batches(cached)
             return
-        drug_id = drug_cb.get().split(" - ")[0]
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, batch_no, quantity FROM drug_batch WHERE drug_id=%s AND quantity>0", (drug_id,))
-        batches = cursor.fetchall()
-        conn.close()
-        batch_cb["values"] = [f"{b[0]} - {b[1]} (Qty: {b[2]})" for b in batches]
+        db.submit("batches", lambda _req: picker["batches"].fetch(location_id, drug_id),
+                  show_batches, show_db_error, label="Loading batches...")
+
+    def on_location_changed(event):
+        picker["batches"].invalidate()
+        show_matches(drug_cb, prefetch=True)
+        load_batches(event)
+
+    def stock_changed(drug_ids):
+        """After a sale the cached quantities of these drugs are stale."""
+        picker["batches"].invalidate(drug_ids)
+        load_batches(None)
+
+    def check_reorder(drug_ids, location_id):
+        """Warn in the status bar when a sale took these drugs below their reorder level."""
+        def done(result):
+            alerts, _ms = result
+            if alerts:
+                status_var.set("⚠ Below reorder level: " + ", ".join(
+                    f"{a[2]} @ {a[3]} ({a[4]} < {a[5]})" for a in alerts[:3]) + (" ..." if len(alerts) > 3 else ""))
+        db.submit("reorder-check", lambda _req: reorder_alerts.check(drug_ids, location_id), done, lambda _e: None)
 
     drug_cb.bind("<<ComboboxSelected>>", load_batches)
+    drug_cb.bind("<KeyRelease>", on_drug_typed)
+    loc_cb.bind("<<ComboboxSelected>>", on_location_changed)
 
     # ---------- Record Sale ----------
     def record_sale():
         if not patient_entry.get() or not patient_name_entry.get() or not drug_cb.get() or not batch_cb.get() or not qty_entry.get():
             messagebox.showerror("Error", "All fields are required!")
             return
-        drug_id = int(drug_cb.get().split(" - ")[0])
-        batch_id = int(batch_cb.get().split(" - ")[0])
+        picked = selected_drug_and_batch()
+        if picked is None:
+            return
+        drug_id, _, batch_id, _ = picked
+        location_id = selected_location()
         patient_id = patient_entry.get()
         patient_name = patient_name_entry.get()
         try:
@@ -108,85 +216,335 @@ def open_patient_sales_window(root):
         except ValueError:
             messagebox.showerror("Error", "Quantity must be a number!")
             return
+        if qty <= 0:
+            messagebox.showerror("Error", "Quantity must be positive!")
+            return
+        if db.busy("sale"):
+            return  # previous sale still committing; ignore double clicks
+
+        dispensed_by_id = 7
+
+        if batch_id is None and location_id is None:
+            messagebox.showerror("Error", "Select a location for automatic (FEFO) batch selection!")
+            return
+
+        def done(result):
+            elapsed_ms = result[1]
+            status_var.set(f"Sale recorded in {elapsed_ms:.1f} ms")
+            scans.consume(result[2] if batch_id is None else [(drug_id, batch_id, qty)])
+            messagebox.showinfo("Success","Sale recorded successfully!")
+            refresh_sales()
+            stock_changed([drug_id])
+            check_reorder([drug_id], location_id)
+
+        def failed(e):
+            status_var.set("Sale not recorded")
+            if isinstance(e, InsufficientStock):
+                messagebox.showerror("Error","Not enough stock available!")
+            else:
+                messagebox.showerror("DB Error", str(e))
+
+        def work(_req):
+            if batch_id is None:
+                return dispense_fefo(drug_id, location_id, qty, patient_id, patient_name, dispensed_by_id)
+            return dispense(drug_id, batch_id, qty, patient_id, patient_name, dispensed_by_id)
+
+        db.submit("sale", work, done, failed, label="Recording sale...")
+
+    # ---------- Cart ----------
+    cart_frame = ttk.LabelFrame(input_frame, text="Cart", padding=6)
+    cart_frame.grid(row=4,column=0,columnspan=4,padx=10,pady=(0,5),sticky="ew")
+    cart_frame.columnconfigure(0, weight=1)
+    cart_table = ttk.Treeview(cart_frame, columns=("Drug","Batch","Quantity"), show="headings", height=4)
+    for col in ("Drug","Batch","Quantity"):
+        cart_table.heading(col, text=col)
+        cart_table.column(col, width=200, anchor="center")
+    cart_table.grid(row=0,column=0,sticky="ew")
+    cart = {}   # cart_table iid -> (drug_id, batch_id, qty, drug_name, batch_no)
+
+    def add_to_cart():
+        if not drug_cb.get() or not batch_cb.get() or not qty_entry.get():
+            messagebox.showerror("Error", "Select drug, batch and quantity!")
+            return
+        try:
+            qty = int(qty_entry.get())
+        except ValueError:
+            messagebox.showerror("Error", "Quantity must be a number!")
+            return
+        if qty <= 0:
+            messagebox.showerror("Error", "Quantity must be positive!")
+            return
+        picked = selected_drug_and_batch()
+        if picked is None:
+            return
+        drug_id, drug_name, batch_id, batch_no = picked
+        iid = cart_table.insert("", "end", values=(drug_name, batch_no, qty))
+        cart[iid] = (drug_id, batch_id, qty, drug_name, batch_no)
+        qty_entry.delete(0, tk.END)
+        status_var.set(f"{len(cart)} line(s) in cart")
 
-        conn = get_connection()
-        cursor = conn.cursor()
-        # Get default location
-        cursor.execute("SELECT id FROM locations LIMIT 1")
-        location_id = cursor.fetchone()[0]
+    def remove_cart_line():
+        for iid in cart_table.selection():
+            cart_table.delete(iid)
+            cart.pop(iid, None)
+        status_var.set(f"{len(cart)} line(s) in cart")
 
-        cursor.execute("SELECT quantity FROM drug_batch WHERE id=%s", (batch_id,))
-        available = cursor.fetchone()[0]
-        if qty > available:
-            messagebox.showerror("Error","Not enough stock available!")
-            conn.close()
+    def checkout_cart():
+        if not cart:
+            messagebox.showerror("Error", "Cart is empty!")
+            return
+        if not patient_entry.get() or not patient_name_entry.get():
+            messagebox.showerror("Error", "Patient ID and name are required!")
+            return
+        if db.busy("sale"):
+            return
+        patient_id = patient_entry.get()
+        patient_name = patient_name_entry.get()
+        location_id = selected_location()
+        lines = list(cart.values())
+        if location_id is None and any(line[1] is None for line in lines):
+            messagebox.showerror("Error", "Select a location for automatic (FEFO) batch selection!")
             return
-        
-        dispensed_by_id = 7
 
-        cursor.execute("""
-            INSERT INTO consumption (drug_id, drug_batch_id, patient_id, reason, quantity, dispensed_by, timestamp, location_id)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-        """, (drug_id, batch_id, patient_id, "dispense", qty, dispensed_by_id, datetime.now(), location_id))
+        def done(result):
+            sale_time, elapsed_ms, dispensed = result
+            status_var.set(f"Checked out {len(lines)} line(s) in {elapsed_ms:.1f} ms")
+            cart_table.delete(*cart_table.get_children())
+            cart.clear()
+            scans.consume(dispensed)
+            refresh_sales()
+            stock_changed({line[0] for line in lines})
+            check_reorder({line[0] for line in lines}, location_id)
+            names = {line[0]: line[3] for line in lines}
+            batch_nos = {line[1]: line[4] for line in lines if line[1] is not None}
+            bill_lines = [(d, b, q, names[d], bn or batch_nos.get(b, b)) for d, b, q, bn in dispensed]
+            save_cart_bill(patient_id, patient_name, bill_lines, sale_time)
 
-        cursor.execute("UPDATE drug_batch SET quantity=quantity-%s WHERE id=%s", (qty,batch_id))
-        conn.commit()
-        conn.close()
-        messagebox.showinfo("Success","Sale recorded successfully!")
-        refresh_sales()
+        def failed(e):
+            status_var.set("Checkout failed")
+            if isinstance(e, InsufficientStock):
+                messagebox.showerror("Error", str(e))
+            else:
+                messagebox.showerror("DB Error", str(e))
+
+        db.submit("sale",
+                  lambda _req: dispense_cart([(d, b, q) for d, b, q, _, _ in lines], patient_id, patient_name, 7,
+                                             location_id=location_id),
+                  done, failed, label=f"Checking out {len(lines)} line(s)...")
+
+    def save_cart_bill(patient_id, patient_name, lines, sale_time):
+        try:
+            from fpdf import FPDF  # pip install fpdf2; deferred, fpdf + fontTools take ~0.3 s to import
+        except ImportError:
+            messagebox.showerror("Error", "Saving bills needs fpdf2 (pip install fpdf2).")
+            return
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font("Arial","B",16)
+        pdf.cell(0,10,"Pharmacy Bill",ln=True,align="C")
+        pdf.ln(6)
+        pdf.set_font("Arial","",12)
+        for label, value in (("Patient ID", patient_id), ("Patient Name", patient_name),
+                             ("Date", sale_time.strftime("%Y-%m-%d %H:%M:%S"))):
+            pdf.cell(50,8,f"{label}:",border=0)
+            pdf.cell(0,8,str(value),ln=True)
+        pdf.ln(4)
+        pdf.set_font("Arial","B",12)
+        for head, width in (("Drug",90),("Batch",60),("Quantity",30)):
+            pdf.cell(width,8,head,border=1)
+        pdf.ln()
+        pdf.set_font("Arial","",12)
+        for _, _, qty, drug_name, batch_no in lines:
+            pdf.cell(90,8,str(drug_name),border=1)
+            pdf.cell(60,8,str(batch_no),border=1)
+            pdf.cell(30,8,str(qty),border=1,ln=True)
+        file = filedialog.asksaveasfilename(defaultextension=".pdf",filetypes=[("PDF files","*.pdf")],
+                                            initialfile=f"bill_{sale_time.strftime('%Y%m%d_%H%M%S')}.pdf")
+        if file:
+            pdf.output(file)
+            messagebox.showinfo("Generated", f"Bill saved as {file}")
+
+    # ---------- Scan to cart (keyboard-wedge barcode scanner) ----------
+    scans = ScanIndex()
+
+    def sync_scans():
+        """Pull drug/batch changes from other counters into the scan index, then reschedule."""
+        def done(patches):
+            first = not scans.loaded
+            scans.apply(patches)
+            if first:
+                status_var.set(f"Scanner ready ({len(scans.by_code)} codes)")
+        if not win.winfo_exists():
+            return
+        if not db.busy("scan-sync"):   # never supersede a sync that is still running
+            db.submit("scan-sync", scans.fetcher(), done, lambda _e: None)
+        win.after(SYNC_MS, sync_scans)
+
+    def on_scan(event=None):
+        code = scan_entry.get().strip()
+        scan_entry.delete(0, tk.END)
+        if not code:
+            return "break"
+        location_id = selected_location()
+        if not scans.loaded or location_id is None:
+            win.bell()
+            status_var.set("Scanner not ready (select a location)")
+            return "break"
+        start = time.perf_counter()
+        reserved = {}
+        for line in cart.values():
+            if line[1] is not None:
+                reserved[line[1]] = reserved.get(line[1], 0) + line[2]
+        try:
+            drug_id, drug_name, batch_id, batch_no = scans.resolve(code, location_id, 1, reserved)
+        except UnknownCode:
+            win.bell()
+            status_var.set(f"Unknown code: {code}")
+            return "break"
+        except InsufficientStock as e:
+            win.bell()
+            status_var.set(str(e))
+            return "break"
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        # repeated scans of the same batch bump the quantity of its line
+        for iid, line in cart.items():
+            if line[0] == drug_id and line[1] == batch_id:
+                cart[iid] = (drug_id, batch_id, line[2] + 1, drug_name, batch_no)
+                cart_table.item(iid, values=(drug_name, batch_no, line[2] + 1))
+                break
+        else:
+            iid = cart_table.insert("", "end", values=(drug_name, batch_no, 1))
+            cart[iid] = (drug_id, batch_id, 1, drug_name, batch_no)
+        status_var.set(f"{code} -> {drug_name} / {batch_no} ({elapsed_ms:.2f} ms), {len(cart)} line(s) in cart")
+        return "break"
+
+    scan_bar = tk.Frame(cart_frame, bg="#e6f0ff")
+    scan_bar.grid(row=1,column=0,columnspan=2,sticky="ew",pady=(4,0))
+    ttk.Label(scan_bar, text="Scan code:", font=("Arial",10,"bold")).pack(side="left",padx=(0,6))
+    scan_entry = ttk.Entry(scan_bar, width=30)
+    scan_entry.pack(side="left")
+    scan_entry.bind("<Return>", on_scan)
+    scan_entry.bind("<KP_Enter>", on_scan)
+
+    cart_btns = tk.Frame(cart_frame, bg="#e6f0ff")
+    cart_btns.grid(row=0,column=1,padx=(10,0),sticky="n")
+    tk.Button(cart_btns,text="Remove Line",bg="#cc3300",fg="white",font=("Arial",10,"bold"),command=remove_cart_line).pack(fill="x",pady=2)
+    tk.Button(cart_btns,text="Checkout Cart",bg="#009933",fg="white",font=("Arial",10,"bold"),command=checkout_cart).pack(fill="x",pady=2)
 
     # ---------- Sales History ----------
     history_frame = ttk.LabelFrame(win, text="Sales History", padding=10)
     history_frame.grid(row=2,column=0,columnspan=2,padx=20,pady=10,sticky="nsew")
     history_frame.columnconfigure(0, weight=1)
-    history_frame.rowconfigure(0, weight=1)
+    history_frame.rowconfigure(1, weight=1)
+
+    # Filters (applied on the server)
+    filter_bar = tk.Frame(history_frame)
+    filter_bar.grid(row=0,column=0,columnspan=2,sticky="ew",pady=(0,6))
+    filter_entries = {}
+    for label, key, width in (("From (YYYY-MM-DD)","date_from",12),("To","date_to",12),("Patient ID","patient_id",12),("Dispensed By","dispensed_by",6)):
+        ttk.Label(filter_bar, text=label).pack(side="left",padx=(0,4))
+        filter_entries[key] = ttk.Entry(filter_bar, width=width)
+        filter_entries[key].pack(side="left",padx=(0,10))
+    ttk.Label(filter_bar, text="Drug").pack(side="left",padx=(0,4))
+    filter_drug_cb = ttk.Combobox(filter_bar, width=22)
+    filter_drug_cb.pack(side="left",padx=(0,10))
+    filter_drug_cb.bind("<KeyRelease>", on_drug_typed)
 
     cols = ("ID","Drug","Batch","Patient ID","Patient Name","Quantity","Dispensed By","Date")
-    sales_table = ttk.Treeview(history_frame, columns=cols, show="headings", selectmode="browse")
+    sales_table = VirtualTable(history_frame, columns=cols, show="headings", selectmode="extended")
     for col in cols:
         sales_table.heading(col, text=col)
         sales_table.column(col, width=130, anchor="center")
-    sales_table.grid(row=0,column=0,sticky="nsew")
+    sales_table.grid(row=1,column=0,sticky="nsew")
     scroll = ttk.Scrollbar(history_frame, orient="vertical", command=sales_table.yview)
-    sales_table.configure(yscroll=scroll.set)
-    scroll.grid(row=0,column=1,sticky="ns")
+    scroll.grid(row=1,column=1,sticky="ns")
+
+    # ---------- Refresh (keyset pages, fetched on scroll) ----------
+    history = {"filters": None, "after": None, "more": False, "max_id": 0}
+
+    def current_filters():
+        drug = filter_drug_cb.get().split(" - ")[0]
+        drug = drug if drug.isdigit() else None   # half-typed text is not a filter yet
+        return {
+            "date_from": sales_history.parse_day(filter_entries["date_from"].get()),
+            "date_to": sales_history.parse_day(filter_entries["date_to"].get()),
+            "drug_id": drug,
+            "patient_id": filter_entries["patient_id"].get().strip() or None,
+            "dispensed_by": filter_entries["dispensed_by"].get().strip() or None,
+        }
+
+    def show_count():
+        shown = len(sales_table.get_children())
+        status_var.set(f"{shown} sales shown" + (" (scroll for more)" if history["more"] else ""))
+
+    def fetch_page(first):
+        filters, after = history["filters"], (None if first else history["after"])
+        def done(result):
+            rows, next_after = result
+            if first:
+                sales_table.delete(*sales_table.get_children())
+                history["max_id"] = 0
+            for r in rows:
+                if not sales_table.exists(str(r[0])):
+                    sales_table.insert("", "end", iid=str(r[0]), values=r)
+            history["max_id"] = max([history["max_id"]] + [r[0] for r in rows])
+            history["after"], history["more"] = next_after, next_after is not None
+            show_count()
+        history["more"] = False   # no further page requests until this one lands
+        db.submit("sales", lambda _req: sales_history.fetch_sales_page(filters, after), done, show_db_error,
+                  label="Loading sales history...")
+
+    def fetch_new():
+        """Prepend only the sales recorded since the newest row shown."""
+        filters, since_id, more = history["filters"], history["max_id"], history["more"]
+        def done(rows):
+            if rows is None:            # too many to patch in -- start again from page one
+                fetch_page(first=True)
+                return
+            for r in reversed(rows):    # oldest first, so the newest ends up on top
+                if not sales_table.exists(str(r[0])):
+                    sales_table.insert("", 0, iid=str(r[0]), values=r)
+            history["max_id"] = max([since_id] + [r[0] for r in rows])
+            history["more"] = more
+            show_count()
+        history["more"] = False
+        db.submit("sales", lambda _req: sales_history.fetch_new_sales(filters, since_id), done, show_db_error,
+                  label="Checking for new sales...")
 
-    # ---------- Refresh ----------
     def refresh_sales():
-        for row in sales_table.get_children():
-            sales_table.delete(row)
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT c.id,d.name,b.batch_no,c.patient_id,c.patient_name,c.quantity,c.dispensed_by,c.timestamp
-            FROM consumption c
-            JOIN drugs d ON c.drug_id=d.id
-            JOIN drug_batch b ON c.drug_batch_id=b.id
-            WHERE c.reason='dispense'
-            ORDER BY c.timestamp DESC
-        """)
-        rows = cursor.fetchall()
-        conn.close()
-        for r in rows:
-            sales_table.insert("", "end", values=r)
+        try:
+            filters = current_filters()
+        except ValueError:
+            messagebox.showerror("Error", "Dates must be in YYYY-MM-DD format!")
+            return
+        if filters == history["filters"] and not db.busy("sales"):
+            fetch_new()
+        else:
+            history["filters"] = filters
+            fetch_page(first=True)
+
+    def clear_filters():
+        for e in filter_entries.values():
+            e.delete(0, tk.END)
+        filter_drug_cb.set("")
+        refresh_sales()
+
+    def on_history_scroll(lo, hi):
+        scroll.set(lo, hi)
+        if history["more"] and float(hi) >= 0.95:
+            fetch_page(first=False)
+
+    sales_table.configure(yscroll=on_history_scroll)
+    ttk.Button(filter_bar, text="Apply", command=refresh_sales).pack(side="left",padx=4)
+    ttk.Button(filter_bar, text="Clear", command=clear_filters).pack(side="left",padx=4)
 
     # ---------- Export ----------
     def export_sales_excel():
-        conn = get_connection()
-        df = pd.read_sql("""
-            SELECT c.id,d.name AS Drug,b.batch_no AS Batch,c.patient_id,c.patient_name AS Patient,c.quantity,
-                   c.dispensed_by AS Dispensed_By,c.timestamp AS Date
-            FROM consumption c
-            JOIN drugs d ON c.drug_id=d.id
-            JOIN drug_batch b ON c.drug_batch_id=b.id
-            WHERE c.reason='dispense'
-            ORDER BY c.timestamp DESC
-        """, conn)
-        conn.close()
-        file = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files","*.xlsx")])
+        # streams every sale matching the history filters; nothing is held in memory
+        file = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=export_engine.FILETYPES)
         if file:
-            df.to_excel(file,index=False)
-            messagebox.showinfo("Exported", f"Sales data exported to {file}")
+            sql, params = sales_history.export_query(history["filters"])
+            export_engine.start_export(win, db, sql, file, params, title="Export sales")
 
     # ---------- Generate Bill ----------
     def generate_bill():
@@ -195,32 +553,103 @@ def open_patient_sales_window(root):
             messagebox.showerror("Error","Select a sale to generate bill.")
             return
         values = sales_table.item(selected,"values")
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial","B",16)
-        pdf.cell(0,10,"Pharmacy Bill",ln=True,align="C")
-        pdf.ln(10)
-        pdf.set_font("Arial","",12)
-        labels = ["Sale ID","Drug","Batch","Patient ID","Patient Name","Quantity","Dispensed By","Date"]
-        for i,label in enumerate(labels):
-            pdf.cell(50,8,f"{label}:",border=0)
-            pdf.cell(0,8,str(values[i]),ln=True)
-        file = filedialog.asksaveasfilename(defaultextension=".pdf",filetypes=[("PDF files","*.pdf")])
+        file = filedialog.asksaveasfilename(defaultextension=".pdf",filetypes=[("PDF files","*.pdf")],
+                                            initialfile=f"bill_{values[0]}.pdf")
         if file:
-            pdf.output(file)
-            messagebox.showinfo("Generated", f"Bill saved as {file}")
+            # rendered off the Tk thread from the shared bill template
+            db.submit("bill", lambda _req: billing.generate_bills(file, sale_ids=[values[0]], merged=True, workers=0),
+                      lambda _result: messagebox.showinfo("Generated", f"Bill saved as {file}"),
+                      show_db_error, label="Generating bill...")
+
+    # ---------- Bulk Bills ----------
+    def open_bulk_bills():
+        selected_ids = [sales_table.item(iid, "values")[0] for iid in sales_table.selection()]
+        dlg = tk.Toplevel(win)
+        dlg.title("Bulk Bills")
+        dlg.resizable(False, False)
+        dlg.transient(win)
+        mode = tk.StringVar(value="selected" if len(selected_ids) > 1 else "range")
+        merged = tk.BooleanVar(value=False)
+        ttk.Radiobutton(dlg, text=f"Selected sales ({len(selected_ids)})", variable=mode,
+                        value="selected").grid(row=0,column=0,columnspan=4,sticky="w",padx=10,pady=(10,2))
+        ttk.Radiobutton(dlg, text="Date range", variable=mode, value="range").grid(row=1,column=0,sticky="w",padx=10)
+        range_entries = {}
+        for col, (key, label) in enumerate((("date_from","From"),("date_to","To"))):
+            ttk.Label(dlg, text=label).grid(row=2,column=col*2,sticky="e",padx=(10,4),pady=4)
+            e = ttk.Entry(dlg, width=12)
+            e.insert(0, filter_entries[key].get())
+            e.grid(row=2,column=col*2+1,sticky="w",pady=4)
+            range_entries[key] = e
+        ttk.Checkbutton(dlg, text="One merged PDF", variable=merged).grid(row=3,column=0,columnspan=4,sticky="w",padx=10)
+        buttons = tk.Frame(dlg)
+        buttons.grid(row=4,column=0,columnspan=4,pady=10)
+
+        def run():
+            if mode.get() == "selected":
+                if not selected_ids:
+                    messagebox.showerror("Error","Select sales in the history first.", parent=dlg)
+                    return
+                sale_ids, date_from, date_to = selected_ids, None, None
+            else:
+                try:
+                    date_from = sales_history.parse_day(range_entries["date_from"].get())
+                    date_to = sales_history.parse_day(range_entries["date_to"].get())
+                except ValueError:
+                    messagebox.showerror("Error", "Dates must be in YYYY-MM-DD format!", parent=dlg)
+                    return
+                if not (date_from and date_to):
+                    messagebox.showerror("Error", "Enter both dates.", parent=dlg)
+                    return
+                sale_ids = None
+            one_file = merged.get()
+            if one_file:
+                out = filedialog.asksaveasfilename(parent=dlg, defaultextension=".pdf",
+                                                   filetypes=[("PDF files","*.pdf")], initialfile="bills.pdf")
+            else:
+                out = filedialog.askdirectory(parent=dlg, title="Folder for bill PDFs")
+            if not out:
+                return
+            dlg.destroy()
+
+            def done(result):
+                count, secs, rate = result
+                status_var.set(f"{count:,} bills in {secs:.1f}s ({rate:.0f} bills/s)")
+                messagebox.showinfo("Bulk Bills", f"Generated {count:,} bills in {secs:.1f}s "
+                                                  f"({rate:.0f} bills/s)\n{out}")
+            db.submit("bills", lambda req: billing.generate_bills(out, date_from, date_to, sale_ids,
+                                                                  merged=one_file, request=req),
+                      done, show_db_error, label="Generating bills... (Esc to cancel)")
+
+        ttk.Button(buttons, text="Generate", command=run).pack(side="left",padx=4)
+        ttk.Button(buttons, text="Close", command=dlg.destroy).pack(side="left",padx=4)
+
+    def cancel_bulk_bills(event=None):
+        if db.busy("bills"):
+            db.cancel("bills")
+            status_var.set("Bill generation cancelled")
+
+    win.bind("<Escape>", cancel_bulk_bills)
 
     # ---------- Buttons ----------
     btn_frame = tk.Frame(input_frame,bg="#e6f0ff")
     btn_frame.grid(row=3,column=0,columnspan=4,pady=10,sticky="ew")
     tk.Button(btn_frame,text="Record Sale",bg="#003366",fg="white",font=("Arial",11,"bold"),command=record_sale).pack(side="left",padx=10,ipadx=15,ipady=5)
+    tk.Button(btn_frame,text="Add to Cart",bg="#003366",fg="white",font=("Arial",11,"bold"),command=add_to_cart).pack(side="left",padx=10,ipadx=15,ipady=5)
     tk.Button(btn_frame,text="Refresh",bg="#0073e6",fg="white",font=("Arial",11,"bold"),command=refresh_sales).pack(side="left",padx=10,ipadx=15,ipady=5)
     tk.Button(btn_frame,text="Export to Excel",bg="#0073e6",fg="white",font=("Arial",11,"bold"),command=export_sales_excel).pack(side="left",padx=10,ipadx=15,ipady=5)
     tk.Button(btn_frame,text="Generate Bill",bg="#009933",fg="white",font=("Arial",11,"bold"),command=generate_bill).pack(side="left",padx=10,ipadx=15,ipady=5)
+    tk.Button(btn_frame,text="Bulk Bills",bg="#009933",fg="white",font=("Arial",11,"bold"),command=open_bulk_bills).pack(side="left",padx=10,ipadx=15,ipady=5)
 
     # ---------- Initial Load ----------
+    db.submit("schema", lambda _req: (ensure_indexes(), sales_history.ensure_indexes(),
+                                      expiry_sweeper.ensure_indexes(), stock_on_hand.ensure_table()),
+              lambda _: None, show_db_error)
     load_drugs()
+    load_locations()
     refresh_sales()
+    sync_scans()
+    # expired batches stop being offered once the sweeper has flagged them
+    expiry_sweeper.schedule(win, db, on_done=lambda expired, _report, _ms: stock_changed(None) if expired else None)
 
     # Keep image refs
     win.bg_photo = bg_photo
@@ -229,8 +658,10 @@ def open_patient_sales_window(root):
     # Properly close
     def close_win():
         win.destroy()
-        root.destroy()
+        if close_root:
+            root.destroy()
     win.protocol("WM_DELETE_WINDOW", close_win)
+    return win
 
 # ---------- Run ----------
 if __name__ == "__main__":
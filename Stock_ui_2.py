@@ -1,21 +1,20 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
-import mysql.connector
-from mysql.connector import Error
-from PIL import Image, ImageTk
+from decimal import Decimal, InvalidOperation
 
 # ---------- DB CONFIG ----------
-DB_CONFIG = {
-    "host": "localhost",
-    "user": "root",
-    "password": "muskan",
-    "database": "drug_inventory",
-    "port": 3306
-}
-
-def get_connection():
-    return mysql.connector.connect(**DB_CONFIG)
+# credentials live in db_config.ini / environment (see database.py)
+from database import get_connection, Error
+from db_executor import DBExecutor
+from delta_refresh import DeltaView
+import delta_refresh
+import receiving
+import manifest_import
+import expiry_sweeper
+import stock_on_hand
+import asset_cache
+from virtual_table import VirtualTable
 
 # ---------- UI ----------
 class StockInwardApp:
@@ -30,10 +29,8 @@ class StockInwardApp:
         root.grid_columnconfigure(0, weight=1)
 
         # ===== Background placeholder =====
-        try:
-            self.bg_img = ImageTk.PhotoImage(file="C:\\Users\\muska\\Downloads\\background.png")  # replace with your file
-        except:
-            self.bg_img = ImageTk.PhotoImage(Image.new("RGB", (1100, 700), "#eaf0f7"))
+        self.bg_img = asset_cache.photo("C:\\Users\\muska\\Downloads\\background.png",  # replace with your file
+                                        placeholder=("#eaf0f7", (1100, 700)))
         bg_label = tk.Label(root, image=self.bg_img)
         bg_label.place(relx=0, rely=0, relwidth=1, relheight=1)
 
@@ -41,6 +38,9 @@ class StockInwardApp:
         container = tk.Frame(root, bg="#ffffff")
         container.grid(row=0, column=0, sticky="nsew")
         container.grid_rowconfigure(3, weight=1)  # table expands
+        self.status_var = tk.StringVar(value="Ready")
+        self.db = DBExecutor(root, status=self.status_var.set)
+        root.bind("<Destroy>", lambda e: self.db.shutdown() if e.widget is root else None, add="+")
         container.grid_columnconfigure(0, weight=1)
 
         # ===== Header with logo =====
@@ -48,10 +48,8 @@ class StockInwardApp:
         header_frame.grid(row=0, column=0, sticky="ew")
         header_frame.grid_columnconfigure(1, weight=1)
 
-        try:
-            self.logo_img = ImageTk.PhotoImage(file="C:\\Users\\muska\\Downloads\\logo.png")  # replace with your file
-        except:
-            self.logo_img = ImageTk.PhotoImage(Image.new("RGB", (60, 60), "#4a90e2"))
+        self.logo_img = asset_cache.photo("C:\\Users\\muska\\Downloads\\logo.png",  # replace with your file
+                                          placeholder=("#4a90e2", (60, 60)))
 
         logo_label = tk.Label(header_frame, image=self.logo_img, bg="#2c3e50")
         logo_label.grid(row=0, column=0, padx=15, pady=5)
@@ -74,6 +72,12 @@ class StockInwardApp:
         self.loc_cb = ttk.Combobox(form_frame, state="readonly")
         self.loc_cb.grid(row=0, column=3, sticky="ew", padx=5)
 
+        ttk.Label(form_frame, text="On hand:").grid(row=0, column=4, sticky="w")
+        self.on_hand_var = tk.StringVar(value="-")
+        ttk.Label(form_frame, textvariable=self.on_hand_var).grid(row=0, column=5, sticky="w", padx=5)
+        for cb in (self.drug_cb, self.loc_cb):
+            cb.bind("<<ComboboxSelected>>", self.show_on_hand, add="+")
+
         ttk.Label(form_frame, text="Batch No:").grid(row=1, column=0, sticky="w", pady=4)
         self.batch_entry = ttk.Entry(form_frame)
         self.batch_entry.grid(row=1, column=1, sticky="ew", padx=5)
@@ -98,16 +102,31 @@ class StockInwardApp:
         self.remark_entry = ttk.Entry(form_frame)
         self.remark_entry.grid(row=3, column=3, sticky="ew", padx=5)
 
+        # ===== Receipt lines (one GRN, posted in a single transaction) =====
+        line_cols = ("drug", "batch_no", "quantity", "unit_cost", "manufacture_date", "expiry_date")
+        self.lines_tree = ttk.Treeview(form_frame, columns=line_cols, show="headings", height=4)
+        for c in line_cols:
+            self.lines_tree.heading(c, text=c)
+            self.lines_tree.column(c, anchor="center", width=110)
+        self.lines_tree.grid(row=4, column=0, columnspan=4, sticky="ew", pady=(8, 0))
+        self.lines = {}   # lines_tree iid -> (drug_id, batch_no, quantity, unit_cost, mfg, expiry)
+        self.lines_location = None
+
         # ===== Buttons =====
         btn_frame = tk.Frame(container, bg="#ffffff")
         btn_frame.grid(row=2, column=0, sticky="ew", pady=8)
-        btn_frame.grid_columnconfigure((0, 1, 2, 3, 4), weight=1)
-
-        self.add_button(btn_frame, "Receive Stock", self.receive_stock, 0)
-        self.add_button(btn_frame, "Clear Inputs", self.clear_inputs, 1)
-        self.add_button(btn_frame, "Refresh Lists", self.load_lookups, 2)
-        self.add_button(btn_frame, "Refresh Table", self.load_batches_table, 3)
-        self.add_button(btn_frame, "Exit", root.quit, 4)
+        btn_frame.grid_columnconfigure((0, 1, 2, 3, 4, 5, 6, 7, 8), weight=1)
+
+        self.add_button(btn_frame, "Add Line", self.add_line, 0)
+        self.add_button(btn_frame, "Remove Line", self.remove_line, 1)
+        self.add_button(btn_frame, "Receive Stock", self.receive_stock, 2)
+        self.add_button(btn_frame, "Import Manifest", self.import_manifest, 3)
+        self.add_button(btn_frame, "Expiry Report", self.expiry_report, 4)
+        self.add_button(btn_frame, "Clear Inputs", self.clear_inputs, 5)
+        self.add_button(btn_frame, "Refresh Lists", self.load_lookups, 6)
+        self.add_button(btn_frame, "Refresh Table", self.load_batches_table, 7)
+        self.add_button(btn_frame, "Exit", root.destroy, 8)
+        root.bind("<Escape>", self.cancel_import)
 
         # ===== Table =====
         table_frame = ttk.Frame(container)
@@ -116,7 +135,7 @@ class StockInwardApp:
         table_frame.grid_columnconfigure(0, weight=1)
 
         cols = ("id","drug","batch_no","quantity","manufacture_date","expiry_date","unit_cost","location")
-        self.tree = ttk.Treeview(table_frame, columns=cols, show="headings")
+        self.tree = VirtualTable(table_frame, columns=cols, show="headings", filterable=True)
         for c in cols:
             self.tree.heading(c, text=c)
             self.tree.column(c, anchor="center")
@@ -126,9 +145,22 @@ class StockInwardApp:
         self.tree.configure(yscroll=scroll.set)
         scroll.grid(row=0, column=1, sticky="ns")
 
+        tk.Label(container, textvariable=self.status_var, anchor="w", bg="#ffffff", fg="#2c3e50").grid(
+            row=4, column=0, sticky="ew", padx=12, pady=(0, 6))
+
         # ===== Load data =====
+        # available batches; last_updated catches quantity/status changes made by other counters
+        self.batches_view = DeltaView(
+            "b.id, d.name, b.batch_no, b.quantity, b.manufacture_date, b.expiry_date, b.unit_cost, l.name",
+            "drug_batch b JOIN drugs d ON b.drug_id=d.id LEFT JOIN locations l ON b.location_id=l.id",
+            "b.id", where="b.status='available'", version_col="b.last_updated", order_by="d.name")
+        self.db.submit("schema", lambda _req: (delta_refresh.ensure_indexes(), receiving.ensure_indexes(),
+                                               expiry_sweeper.ensure_indexes(), stock_on_hand.ensure_table()),
+                       lambda _r: None)
         self.load_lookups()
         self.load_batches_table()
+        # expired batches drop out of the table once the sweeper has flagged them
+        expiry_sweeper.schedule(root, self.db, on_done=self.expiry_swept)
 
     # -------- Button helper --------
     def add_button(self, parent, text, command, col):
@@ -155,36 +187,229 @@ class StockInwardApp:
             except: pass
 
     def load_batches_table(self):
-        try:
-            conn = get_connection()
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT b.id, d.name, b.batch_no, b.quantity, b.manufacture_date,
-                       b.expiry_date, b.unit_cost, l.name
-                FROM drug_batch b
-                JOIN drugs d ON b.drug_id=d.id
-                LEFT JOIN locations l ON b.location_id=l.id
-                WHERE b.status='available'
-                ORDER BY d.name
-            """)
-            rows = cur.fetchall()
-            for r in self.tree.get_children():
-                self.tree.delete(r)
-            for r in rows:
-                self.tree.insert("", "end", values=r)
-        except Error as e:
+        """First call loads all available batches; later calls patch in only what changed."""
+        def done(patch):
+            full = not self.batches_view.loaded
+            changed, removed = self.batches_view.apply(self.tree, patch)
+            if full:
+                self.status_var.set(f"{len(self.tree.get_children())} batches loaded")
+            else:
+                self.status_var.set(f"Batches: {changed} new/changed, {removed} removed")
+
+        def failed(e):
+            self.status_var.set("Error loading batches")
             messagebox.showerror("DB Error", str(e))
-        finally:
-            try: cur.close(); conn.close()
-            except: pass
+
+        self.db.submit("batches", self.batches_view.fetcher(self.tree), done, failed, label="Loading batches...")
+
+    def show_on_hand(self, event=None):
+        """Available units of the selected drug at the selected location (one summary-row read)."""
+        drug_id = self.drug_map.get(self.drug_cb.get())
+        location_id = self.loc_map.get(self.loc_cb.get())
+        if drug_id is None or location_id is None:
+            self.on_hand_var.set("-")
+            return
+        self.db.submit("on-hand", lambda _req: stock_on_hand.on_hand(drug_id, location_id),
+                       lambda qty: self.on_hand_var.set(str(qty)), lambda _e: self.on_hand_var.set("?"))
 
     def clear_inputs(self):
         for e in [self.batch_entry, self.mfg_entry, self.exp_entry, self.qty_entry, self.cost_entry, self.remark_entry]:
             e.delete(0, tk.END)
         self.drug_cb.set(""); self.loc_cb.set("")
+        self.on_hand_var.set("-")
+
+    # -------- Goods receipt --------
+    def read_line(self):
+        """The form as a receipt line (drug_id, batch_no, qty, unit_cost, mfg, expiry) plus location_id."""
+        drug_id = self.drug_map.get(self.drug_cb.get())
+        location_id = self.loc_map.get(self.loc_cb.get())
+        batch_no = self.batch_entry.get().strip()
+        if drug_id is None or location_id is None or not batch_no or not self.qty_entry.get().strip():
+            raise ValueError("Drug, location, batch no and quantity are required.")
+        try:
+            qty = int(self.qty_entry.get())
+        except ValueError:
+            raise ValueError("Quantity must be a whole number.")
+        if qty <= 0:
+            raise ValueError("Quantity must be positive.")
+        cost_text = self.cost_entry.get().strip()
+        try:
+            cost = Decimal(cost_text) if cost_text else None
+        except InvalidOperation:
+            raise ValueError("Unit cost must be a number.")
+        try:
+            mfg = receiving.parse_date(self.mfg_entry.get())
+            exp = receiving.parse_date(self.exp_entry.get())
+        except ValueError:
+            raise ValueError("Dates must be in YYYY-MM-DD format.")
+        return (drug_id, batch_no, qty, cost, mfg, exp), location_id
+
+    def add_line(self):
+        try:
+            line, location_id = self.read_line()
+        except ValueError as e:
+            messagebox.showerror("Invalid line", str(e))
+            return
+        if self.lines and location_id != self.lines_location:
+            messagebox.showerror("Invalid line", "All lines of a receipt must be for the same location.")
+            return
+        self.lines_location = location_id
+        iid = self.lines_tree.insert("", "end", values=(self.drug_cb.get(), line[1], line[2],
+                                                        line[3] if line[3] is not None else "",
+                                                        line[4] or "", line[5] or ""))
+        self.lines[iid] = line
+        for e in [self.batch_entry, self.mfg_entry, self.exp_entry, self.qty_entry, self.cost_entry]:
+            e.delete(0, tk.END)
+        self.status_var.set(f"{len(self.lines)} line(s) in receipt")
+
+    def remove_line(self):
+        for iid in self.lines_tree.selection():
+            self.lines_tree.delete(iid)
+            self.lines.pop(iid, None)
+        self.status_var.set(f"{len(self.lines)} line(s) in receipt")
 
     def receive_stock(self):
-        messagebox.showinfo("Info", "Stock receiving logic here (same as your existing one).")
+        """Post the pending lines (or the form, if none were added) as one goods receipt."""
+        if self.db.busy("receive"):
+            return  # previous receipt still committing
+        if self.lines:
+            lines, location_id = list(self.lines.values()), self.lines_location
+        else:
+            try:
+                line, location_id = self.read_line()
+            except ValueError as e:
+                messagebox.showerror("Invalid line", str(e))
+                return
+            lines = [line]
+        remarks = self.remark_entry.get().strip() or None
+
+        def done(result):
+            note_id, elapsed_ms, created, updated = result
+            self.lines_tree.delete(*self.lines_tree.get_children())
+            self.lines.clear()
+            self.clear_inputs()
+            self.status_var.set(f"GRN #{note_id}: {len(lines)} line(s) in {elapsed_ms:.1f} ms "
+                                f"({created} new batch(es), {updated} topped up)")
+            self.load_batches_table()
+
+        def failed(e):
+            self.status_var.set("Receipt not saved")
+            messagebox.showerror("DB Error", str(e))
+
+        self.db.submit("receive", lambda _req: receiving.receive_goods(location_id, lines, remarks=remarks),
+                       done, failed, label=f"Receiving {len(lines)} line(s)...")
+
+    # -------- Manifest import --------
+    def import_manifest(self):
+        """Receive a vendor manifest (CSV/XLSX) at the selected location; offers a dry run first."""
+        location_id = self.loc_map.get(self.loc_cb.get())
+        if location_id is None:
+            messagebox.showerror("Import Manifest", "Select the receiving location first.")
+            return
+        if self.db.busy("import"):
+            return
+        path = filedialog.askopenfilename(title="Delivery manifest", filetypes=manifest_import.FILETYPES)
+        if not path:
+            return
+        choice = messagebox.askyesnocancel("Import Manifest", "Check the manifest with a dry run first?\n\n"
+                                                              "Yes: dry run (nothing is saved)\nNo: import now")
+        if choice is not None:
+            self.run_import(path, location_id, dry_run=choice)
+
+    def run_import(self, path, location_id, dry_run, note_id=None, after_line=0):
+        remarks = self.remark_entry.get().strip() or None
+
+        def done(r):
+            summary = (f"{r.accepted:,} line(s) OK, {r.rejected:,} rejected in {r.secs:.1f}s\n"
+                       f"{r.created:,} new batch(es), {r.updated:,} topped up")
+            if r.rejected_path:
+                summary += f"\n\nRejected rows: {r.rejected_path}"
+            if r.dry_run:
+                self.status_var.set(f"Dry run: {r.accepted:,} OK, {r.rejected:,} rejected")
+                if r.accepted and messagebox.askyesno("Dry run", summary + "\n\nImport the valid lines now?"):
+                    self.run_import(path, location_id, dry_run=False)
+                elif not r.accepted:
+                    messagebox.showwarning("Dry run", summary)
+                return
+            self.status_var.set(f"GRN #{r.note_id}: {r.accepted:,} manifest line(s) received"
+                                if r.note_id else "Nothing imported")
+            messagebox.showinfo("Import Manifest", (f"GRN #{r.note_id}\n" if r.note_id else "") + summary)
+            self.load_batches_table()
+
+        def failed(e):
+            if isinstance(e, manifest_import.ImportStopped) and e.note_id:
+                # the chunks committed before it stopped stay received
+                self.status_var.set(f"GRN #{e.note_id}: manifest received up to line {e.line:,}")
+                self.load_batches_table()
+                if messagebox.askyesno("Import Manifest", f"{e}\n\nLines up to {e.line:,} were received as "
+                                                          f"GRN #{e.note_id}.\nContinue the import after that line?"):
+                    self.run_import(path, location_id, False, note_id=e.note_id, after_line=e.line)
+            elif isinstance(e, manifest_import.ImportCancelled):
+                self.status_var.set("Manifest import cancelled")
+            else:
+                self.status_var.set("Manifest not imported")
+                messagebox.showerror("Import Manifest", str(e))
+
+        self.db.submit("import", lambda req: manifest_import.import_manifest(
+                           path, location_id, dry_run=dry_run, remarks=remarks, request=req,
+                           note_id=note_id, after_line=after_line),
+                       done, failed, label=f"{'Checking' if dry_run else 'Importing'} manifest... (Esc to cancel)")
+
+    def cancel_import(self, event=None):
+        if self.db.busy("import"):
+            # stop rather than cancel: the worker still reports how far it got
+            self.db.stop("import")
+            self.status_var.set("Stopping manifest import...")
+
+    # -------- Expiry --------
+    def expiry_swept(self, expired, report, ms):
+        if expired:
+            self.status_var.set(f"{expired} expired batch(es) flagged")
+            self.load_batches_table()
+
+    def expiry_report(self):
+        """Sweep now and show the batches expiring within 30/60/90 days."""
+        def done(result):
+            expired, report, ms = result
+            self.expiry_swept(expired, report, ms)
+            self.show_expiry_report(expired, report)
+
+        self.db.submit("expiry-report", lambda req: expiry_sweeper.sweep(request=req), done,
+                       lambda e: messagebox.showerror("DB Error", str(e)), label="Checking expiry dates...")
+
+    def show_expiry_report(self, expired, report):
+        dlg = tk.Toplevel(self.root)
+        dlg.title("Near-expiry report")
+        dlg.geometry("900x450")
+        dlg.transient(self.root)
+        counts = expiry_sweeper.summary(report)
+        ttk.Label(dlg, text=f"{expired} batch(es) just marked expired.   Expiring within "
+                            + ",  ".join(f"{days} days: {n}" for days, n in counts.items()),
+                  font=("Segoe UI", 10, "bold")).pack(anchor="w", padx=10, pady=(10, 6))
+        frame = ttk.Frame(dlg)
+        frame.pack(fill="both", expand=True, padx=10)
+        tree = ttk.Treeview(frame, columns=expiry_sweeper.REPORT_COLUMNS, show="headings")
+        for c in expiry_sweeper.REPORT_COLUMNS:
+            tree.heading(c, text=c)
+            tree.column(c, anchor="center", width=100)
+        scroll = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        tree.configure(yscroll=scroll.set)
+        tree.pack(side="left", fill="both", expand=True)
+        scroll.pack(side="right", fill="y")
+        for row in report:
+            tree.insert("", "end", values=["" if v is None else v for v in row])
+
+        def save():
+            path = filedialog.asksaveasfilename(parent=dlg, defaultextension=".csv",
+                                                filetypes=[("CSV files", "*.csv")], initialfile="near_expiry.csv")
+            if path:
+                expiry_sweeper.write_report(report, path)
+                messagebox.showinfo("Near-expiry report", f"Saved to:\n{path}", parent=dlg)
+
+        buttons = ttk.Frame(dlg)
+        buttons.pack(pady=8)
+        ttk.Button(buttons, text="Save CSV", command=save).pack(side="left", padx=4)
+        ttk.Button(buttons, text="Close", command=dlg.destroy).pack(side="left", padx=4)
 
 
 # ---------- Run ----------
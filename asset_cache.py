@@ -0,0 +1,209 @@
+"""
+Shared image cache for every window.
+
+Decoded image files are kept in a small LRU (load()); the scaled copies the
+windows display are PhotoImages kept in an LRU keyed by (path, size, fit),
+so a second window, a second tab or a resize back to an earlier size gets
+the same PhotoImage instead of decoding the PNG again.
+
+When build_assets.py has been run, assets/manifest.json lists pre-scaled
+tiers of each image (matched by file name), and the smallest tier that
+covers the requested size is decoded instead of the full-size original.
+
+    photo = asset_cache.photo(BACKGROUND, (1100, 720))
+    label.configure(image=photo)
+    label.image = photo      # keep a reference while it is shown, as with any PhotoImage
+
+fit is "stretch" (exactly size), "contain" (fit inside size, keep aspect),
+"thumbnail" (like contain but never enlarges) or "cover" (fill size and crop
+the middle).  draft=True is the quick nearest-neighbour version drawn while
+a window is being dragged; drafts are not kept in the cache.  Without Pillow, photo() falls back to a plain Tk PhotoImage of
+the file at its own size.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import tkinter as tk
+
+try:
+    from PIL import Image, ImageTk
+    PIL_AVAILABLE = True
+except Exception:
+    PIL_AVAILABLE = False
+
+MAX_VARIANTS = 48          # scaled PhotoImages kept for reuse
+MAX_SOURCES = 8            # decoded files (original or tier) kept; about one per image the windows use
+MAX_SOURCE_SIDE = 2560     # larger originals are shrunk once on decode; no window is bigger
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+MANIFEST = "manifest.json"
+
+_lock = threading.Lock()
+_manifest = None           # image name -> manifest entry, read on first use
+_sources = OrderedDict()   # file -> decoded Image (None if unreadable), least recently used first
+_variants = OrderedDict()  # (path, size, fit) -> PhotoImage, least recently used first
+_stats = {"decodes": 0, "decode_ms": 0.0, "hits": 0, "misses": 0}
+
+
+def set_asset_dir(path):
+    """Read tiers from another directory (benchmarks); clears the cache."""
+    global ASSET_DIR, _manifest
+    ASSET_DIR, _manifest = path, None
+    clear()
+
+
+def _name(path):
+    return path.replace("\\", "/").rsplit("/", 1)[-1]
+
+
+def _entry(path):
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(os.path.join(ASSET_DIR, MANIFEST), encoding="utf-8") as f:
+                _manifest = json.load(f).get("images", {})
+        except (OSError, ValueError):
+            _manifest = {}
+    return _manifest.get(_name(path)) if path else None
+
+
+def available(path):
+    """True if path (or a built tier of it) can be loaded -- without decoding anything."""
+    return bool(path) and (_entry(path) is not None or os.path.exists(path))
+
+
+def _pick(path, size, fit):
+    """The file to decode for path shown at size: the smallest covering tier, else the original."""
+    entry = _entry(path)
+    if entry is None:
+        return path
+    tiers = entry["tiers"]
+    if size is not None:
+        need, _ = _target(tuple(entry["size"]), size, fit)
+        for tier in tiers:                      # smallest first
+            if tier["size"][0] >= need[0] and tier["size"][1] >= need[1]:
+                return os.path.join(ASSET_DIR, tier["file"])
+        if os.path.exists(path):
+            return path                         # bigger than every tier: use the original
+    return os.path.join(ASSET_DIR, tiers[-1]["file"])
+
+
+def load(path, size=None, fit="stretch"):
+    """
+    The decoded image for path (kept while among the MAX_SOURCES most
+    recently used), or None.  With size, the smallest built tier that covers
+    it is used when there is one.
+    """
+    if not PIL_AVAILABLE or not path:
+        return None
+    source = _pick(path, size, fit)
+    with _lock:
+        if source in _sources:
+            _sources.move_to_end(source)
+            return _sources[source]
+        start = time.perf_counter()
+        try:
+            with Image.open(source) as f:
+                img = f.convert("RGBA" if "A" in f.getbands() or "transparency" in f.info else "RGB")
+            if max(img.size) > MAX_SOURCE_SIDE:
+                img.thumbnail((MAX_SOURCE_SIDE, MAX_SOURCE_SIDE), Image.LANCZOS)
+        except Exception:
+            img = None
+        _stats["decodes"] += 1
+        _stats["decode_ms"] += (time.perf_counter() - start) * 1000
+        _sources[source] = img
+        while len(_sources) > MAX_SOURCES:
+            _sources.popitem(last=False)
+        return img
+
+
+def _target(src_size, size, fit):
+    w, h = src_size
+    tw, th = size
+    if fit == "stretch":
+        return (tw, th), None
+    if fit in ("contain", "thumbnail"):
+        scale = min(tw / w, th / h)
+        if fit == "thumbnail":
+            scale = min(scale, 1.0)
+        return (max(1, int(w * scale)), max(1, int(h * scale))), None
+    # cover
+    scale = max(tw / w, th / h)
+    new = (max(tw, int(w * scale)), max(th, int(h * scale)))
+    left, top = (new[0] - tw) // 2, (new[1] - th) // 2
+    return new, (left, top, left + tw, top + th)
+
+
+def resized(path, size=None, fit="stretch", placeholder=None, draft=False):
+    """
+    PIL image of path scaled to size.  placeholder=(color, (w, h)) -- a plain
+    image of that colour and size -- stands in for a missing file; without
+    one a missing file gives None.
+    """
+    img = load(path, size, fit)
+    if img is None:
+        if placeholder is None or not PIL_AVAILABLE:
+            return None
+        color, placeholder_size = placeholder
+        img = Image.new("RGBA", tuple(placeholder_size), color)
+    if size is None or tuple(size) == img.size:
+        return img
+    new, crop = _target(img.size, size, fit)
+    if new != img.size:
+        # a built tier is at most ~1.25x the target, where bilinear looks the same as Lanczos at a third of the cost
+        if draft:
+            resample = Image.NEAREST
+        else:
+            resample = Image.BILINEAR if img.width <= 1.5 * new[0] else Image.LANCZOS
+        img = img.resize(new, resample)
+    return img.crop(crop) if crop else img
+
+
+def photo(path, size=None, fit="stretch", placeholder=None, draft=False):
+    """Shared PhotoImage of path at size (see module docstring), or None."""
+    size = tuple(size) if size else None
+    if size and (size[0] < 1 or size[1] < 1):
+        return None
+    key = (path, size, fit, None if available(path) else placeholder)
+    with _lock:
+        cached = _variants.get(key)
+        if cached is not None:
+            _variants.move_to_end(key)
+            _stats["hits"] += 1
+            return cached
+        _stats["misses"] += 1
+    if draft and PIL_AVAILABLE:
+        img = resized(path, size, fit, placeholder, draft=True)
+        return ImageTk.PhotoImage(img) if img is not None else None
+    if PIL_AVAILABLE:
+        img = resized(path, size, fit, placeholder)
+        if img is None:
+            return None
+        ph = ImageTk.PhotoImage(img)
+    else:
+        try:
+            ph = tk.PhotoImage(file=path)
+        except Exception:
+            return None
+    with _lock:
+        _variants[key] = ph
+        while len(_variants) > MAX_VARIANTS:
+            _variants.popitem(last=False)   # windows still showing it keep their own reference
+    return ph
+
+
+def stats():
+    """Cache counters plus the pixel memory held (sources and cached variants), in bytes."""
+    with _lock:
+        held = sum(img.width * img.height * len(img.getbands()) for img in _sources.values() if img is not None)
+        held += sum(ph.width() * ph.height() * 4 for ph in _variants.values())
+        return dict(_stats, sources=len(_sources), variants=len(_variants), bytes=held)
+
+
+def clear():
+    with _lock:
+        _sources.clear()
+        _variants.clear()
+        _stats.update(decodes=0, decode_ms=0.0, hits=0, misses=0)
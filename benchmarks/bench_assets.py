@@ -0,0 +1,94 @@
+"""
+Image decode cost when every window loads the shared background itself
+versus through asset_cache.
+
+Writes a noisy --width x --height PNG (about the size of the real
+background.png) and replays what opening the launcher and all four modules
+used to do -- the launcher, seven inventory tabs, Sales, Stock and Patients
+each decoding it -- then the same loads through asset_cache.  Reports
+decode time and the decoded pixel memory each approach holds.
+
+Then times the launcher's cold-start image work (background, logo and four
+tiles at a typical window size) from the repo's original PNGs and from the
+tiers build_assets.py writes.  PIL-level only (no display needed); the
+PhotoImages on top are the same either way.
+
+    python benchmarks/bench_assets.py
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import common
+import asset_cache
+import build_assets
+from PIL import Image
+
+# (window, size it shows the background at; None = native)
+# what LauncherApp draws at 1280x800: (image, size, fit)
+LAUNCHER = [("background.png", (1280, 800), "cover"), ("logo.png", (110, 110), "thumbnail")] + [
+    (name, (560, 230), "contain") for name in ("drug_inventory_image.png", "Sales_image.png", "Stock_image.png",
+                                               "Patient_image.png")]
+LOADS = [("launcher", (1280, 800))] + [(f"inventory tab {i}", None) for i in range(1, 8)] + [
+    ("sales", None), ("stock", None), ("patients", (1100, 720))]
+
+
+def pixel_bytes(images):
+    return sum(img.width * img.height * len(img.getbands()) for img in images)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--width", type=int, default=1920)
+    ap.add_argument("--height", type=int, default=1080)
+    args = ap.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="druginv_assets_"), "background.png")
+    rng = random.Random(1)
+    noise = Image.frombytes("RGB", (args.width // 4, args.height // 4), rng.randbytes(args.width * args.height * 3 // 16))
+    noise.resize((args.width, args.height)).save(path)
+    print(f"background: {args.width}x{args.height}, {os.path.getsize(path) / 2 ** 20:.1f} MB on disk")
+
+    asset_cache.set_asset_dir(tempfile.mkdtemp(prefix="druginv_no_tiers_"))
+    start = time.perf_counter()
+    held = []
+    for _, size in LOADS:
+        img = Image.open(path).convert("RGBA")
+        held.append(img)                      # each window keeps its own decoded copy
+        if size:
+            held.append(img.resize(size, Image.LANCZOS))
+    old_ms = (time.perf_counter() - start) * 1000
+    old_bytes = pixel_bytes(held)
+    del held
+
+    start = time.perf_counter()
+    shown = [asset_cache.resized(path, size) for _, size in LOADS]
+    new_ms = (time.perf_counter() - start) * 1000
+    new_bytes = pixel_bytes({id(img): img for img in shown}.values())
+    stats = asset_cache.stats()
+
+    print(f"per-window decode: {old_ms:,.0f} ms, {old_bytes / 2 ** 20:,.1f} MB of pixels held")
+    print(f"asset_cache:       {new_ms:,.0f} ms, {new_bytes / 2 ** 20:,.1f} MB "
+          f"({stats['decodes']} decode(s), {stats['decode_ms']:.0f} ms decoding)")
+    print(f"decode time {old_ms / new_ms:.1f}x lower, image memory {old_bytes / new_bytes:.1f}x lower")
+    failed = stats["decodes"] != 1 or old_bytes < 3 * new_bytes
+
+    def launcher_images():
+        return [asset_cache.resized(os.path.join(common.ROOT, name), size, fit) for name, size, fit in LAUNCHER]
+
+    asset_cache.clear()
+    _, original_ms = common.timed(launcher_images)
+    tiers_dir = tempfile.mkdtemp(prefix="druginv_tiers_")
+    build_assets.build(out_dir=tiers_dir)
+    asset_cache.set_asset_dir(tiers_dir)
+    _, tier_ms = common.timed(launcher_images)
+    print(f"launcher cold start: {original_ms:,.0f} ms from the original PNGs, {tier_ms:,.1f} ms from tiers "
+          f"({asset_cache.stats()['decode_ms']:.1f} ms of it decoding)")
+    if failed or tier_ms * 5 > original_ms:
+        raise SystemExit("FAIL")
+
+
+if __name__ == "__main__":
+    main()
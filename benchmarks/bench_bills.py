@@ -0,0 +1,57 @@
+"""
+Bulk bill generation throughput (bills/second) for billing.generate_bills().
+
+Seeds a month of checkouts and renders them in-process and with a process
+pool, as individual files and as one merged PDF.  Needs fpdf (and pypdf for
+the pooled merged run).
+
+    python benchmarks/bench_bills.py --bills 3000 --workers 0 4
+"""
+import argparse
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import common
+from database import get_connection
+import billing
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bills", type=int, default=3000)
+    ap.add_argument("--workers", type=int, nargs="+", default=[0, os.cpu_count() or 2])
+    ap.add_argument("--logo", default=None, help="logo image for the page template")
+    args = ap.parse_args()
+
+    common.use_temp_sqlite()
+    conn = get_connection()
+    cur = conn.cursor()
+    common.seed_basics(cur)
+    cur.execute("INSERT INTO drugs (name, code, unit) VALUES (%s,%s,%s)", ("Paracetamol", "D1", "tablet"))
+    cur.execute("INSERT INTO drug_batch (drug_id, location_id, batch_no, quantity) VALUES (1,1,%s,%s)",
+                ("B1", 10 ** 7))
+    start = datetime(2026, 1, 1)
+    rows = []
+    for i in range(args.bills):
+        ts = start + timedelta(minutes=10 * i)
+        rows += [(f"P{i}", f"Patient {i}", 1 + line, ts) for line in range(1 + i % 3)]
+    cur.executemany("""INSERT INTO consumption (drug_id, drug_batch_id, location_id, patient_id, patient_name,
+                                                reason, quantity, dispensed_by, timestamp)
+                       VALUES (1,1,1,%s,%s,'dispense',%s,1,%s)""", rows)
+    conn.commit()
+    conn.close()
+    end = start + timedelta(minutes=10 * args.bills)
+
+    out = tempfile.mkdtemp(prefix="druginv_bills_")
+    for workers in args.workers:
+        for merged in (False, True):
+            target = os.path.join(out, f"all_{workers}.pdf") if merged else out
+            count, secs, rate = billing.generate_bills(target, start, end, merged=merged, workers=workers,
+                                                       logo_path=args.logo)
+            print(f"workers={workers:<2} {'merged' if merged else 'files ':<6}: "
+                  f"{count} bills in {secs:.2f}s ({rate:.0f} bills/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Checkout time vs. cart size for dispense.dispense_cart().
+
+Each checkout runs a fixed number of statements, so the time per cart should
+stay nearly flat as lines are added.
+
+    python benchmarks/bench_cart.py --sizes 1 5 10 15 50 --repeat 50
+"""
+import argparse
+
+import common
+from database import get_connection
+import dispense
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1, 5, 10, 15, 50])
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+
+    common.use_temp_sqlite()
+    lines_max = max(args.sizes)
+    conn = get_connection()
+    cur = conn.cursor()
+    common.seed_basics(cur)
+    cur.executemany("INSERT INTO drugs (name, code, unit) VALUES (%s,%s,%s)",
+                    [(f"Drug {i}", f"D{i}", "tablet") for i in range(1, lines_max + 1)])
+    cur.executemany("INSERT INTO drug_batch (drug_id, location_id, batch_no, quantity) VALUES (%s,1,%s,%s)",
+                    [(i, f"B{i}", 10 ** 7) for i in range(1, lines_max + 1)])
+    conn.commit()
+    conn.close()
+
+    for size in args.sizes:
+        lines = [(i, i, 1) for i in range(1, size + 1)]
+        timings = sorted(common.timed(dispense.dispense_cart, lines, "P1", "Bench", 1)[1]
+                         for _ in range(args.repeat))
+        print(f"{size:>4} lines: median {timings[len(timings) // 2]:.2f} ms  "
+              f"({timings[len(timings) // 2] / size:.3f} ms/line)")
+
+
+if __name__ == "__main__":
+    main()
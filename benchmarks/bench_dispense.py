@@ -0,0 +1,71 @@
+"""
+Contention benchmark for dispense.dispense().
+
+Several threads sell single units from the same batch until it runs dry.
+The run fails if the batch goes negative or more units are sold than stocked.
+
+    python benchmarks/bench_dispense.py --threads 8 --stock 2000
+"""
+import argparse
+import threading
+import time
+
+import common
+from database import get_connection
+import dispense
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--stock", type=int, default=2000)
+    args = ap.parse_args()
+
+    common.use_temp_sqlite(max_pool=args.threads)
+    conn = get_connection()
+    cur = conn.cursor()
+    common.seed_basics(cur)
+    cur.execute("INSERT INTO drugs (name, code, unit) VALUES (%s,%s,%s)", ("Bench Drug", "BENCH-1", "tablet"))
+    cur.execute("INSERT INTO drug_batch (drug_id, location_id, batch_no, quantity) VALUES (1,1,%s,%s)",
+                ("B-1", args.stock))
+    conn.commit()
+    conn.close()
+
+    sold = [0] * args.threads
+
+    def counter(i):
+        while True:
+            try:
+                dispense.dispense(1, 1, 1, patient_id=f"P{i}", dispensed_by=1)
+            except dispense.InsufficientStock:
+                return
+            sold[i] += 1
+
+    threads = [threading.Thread(target=counter, args=(i,)) for i in range(args.threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT quantity FROM drug_batch WHERE id = 1")
+    remaining = cur.fetchone()[0]
+    cur.execute("SELECT COALESCE(SUM(quantity), 0) FROM consumption")
+    logged = cur.fetchone()[0]
+    conn.close()
+
+    total = sum(sold)
+    summary = dispense.stats.summary()
+    print(f"threads={args.threads} sold={total} in {elapsed:.2f}s -> {total / elapsed:.0f} sales/s")
+    print(f"latency mean={summary['mean_ms']:.2f}ms p50={summary['p50_ms']:.2f}ms "
+          f"p95={summary['p95_ms']:.2f}ms max={summary['max_ms']:.2f}ms")
+    print(f"remaining={remaining} logged={logged}")
+    if remaining != 0 or total != args.stock or logged != args.stock:
+        raise SystemExit("FAIL: stock oversold or lost")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Expiry sweep over a large drug_batch table with expiry_sweeper.sweep.
+
+Seeds --batches batches with expiry dates spread over +-3 years, sweeps, and
+checks that exactly the overdue available batches were expired and that a
+second sweep finds nothing left to do.  Reports the longest single chunk
+(the longest any lock is held).
+
+    python benchmarks/bench_expiry.py --batches 200000
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+import common
+import database
+import expiry_sweeper
+from database import get_connection
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batches", type=int, default=200000)
+    ap.add_argument("--chunk", type=int, default=expiry_sweeper.SWEEP_CHUNK)
+    args = ap.parse_args()
+
+    common.use_temp_sqlite()
+    conn = get_connection()
+    cur = conn.cursor()
+    common.seed_basics(cur)
+    cur.executemany("INSERT INTO drugs (name, unit) VALUES (%s,%s)", [(f"Drug {i}", "tablet") for i in range(1, 1001)])
+    rng = random.Random(1)
+    today = date.today()
+    cur.executemany("""INSERT INTO drug_batch (drug_id, location_id, batch_no, quantity, expiry_date, status)
+                       VALUES (%s,1,%s,%s,%s,%s)""",
+                    [(rng.randint(1, 1000), f"B{i}", rng.randint(0, 100),
+                      today + timedelta(days=rng.randint(-1100, 1100)),
+                      "quarantined" if i % 50 == 0 else "available") for i in range(args.batches)])
+    conn.commit()
+    cur.execute("SELECT COUNT(*) FROM drug_batch WHERE status='available' AND expiry_date < %s", (today,))
+    overdue = cur.fetchone()[0]
+    expiry_sweeper.ensure_indexes()
+
+    # time each chunk transaction separately
+    chunk_ms = []
+    run = database.run_transaction
+
+    def timed_transaction(work, *a, **kw):
+        result, ms = common.timed(run, work, *a, **kw)
+        chunk_ms.append(ms)
+        return result
+    expiry_sweeper.run_transaction = timed_transaction
+
+    expired, report, ms = expiry_sweeper.sweep(chunk=args.chunk)
+    print(f"{args.batches:,} batches: {expired:,} expired, {len(report):,} near expiry "
+          f"{expiry_sweeper.summary(report)} in {ms:.0f} ms; {len(chunk_ms)} chunks, "
+          f"longest {max(chunk_ms):.1f} ms")
+    again, _, ms = expiry_sweeper.sweep(chunk=args.chunk)
+    print(f"second sweep: {again} expired in {ms:.0f} ms")
+    cur.execute("SELECT COUNT(*) FROM drug_batch WHERE status='available' AND expiry_date < %s", (today,))
+    left = cur.fetchone()[0]
+    conn.close()
+    if expired != overdue or again or left:
+        raise SystemExit(f"FAIL: {overdue} overdue, {expired} expired, {again} on the second sweep, {left} left")
+
+
+if __name__ == "__main__":
+    main()
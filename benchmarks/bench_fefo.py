@@ -0,0 +1,78 @@
+"""
+FEFO allocation over drugs with thousands of batches.
+
+Seeds --drugs drugs with --batches batches each (random expiry dates, some
+expired or quarantined), then dispenses quantities that span many batches and
+checks that the earliest-expiring available batches were used first.
+
+    python benchmarks/bench_fefo.py --drugs 20 --batches 3000 --qty 500
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+import common
+from database import get_connection
+import dispense
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--drugs", type=int, default=20)
+    ap.add_argument("--batches", type=int, default=3000)
+    ap.add_argument("--qty", type=int, default=500, help="units per dispense (batches hold 1-20)")
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    common.use_temp_sqlite()
+    rng = random.Random(42)
+    today = date.today()
+    conn = get_connection()
+    cur = conn.cursor()
+    common.seed_basics(cur)
+    cur.executemany("INSERT INTO drugs (name, code, unit) VALUES (%s,%s,%s)",
+                    [(f"Drug {i}", f"D{i}", "tablet") for i in range(1, args.drugs + 1)])
+    rows = []
+    for drug_id in range(1, args.drugs + 1):
+        for n in range(args.batches):
+            status = rng.choices(["available", "quarantined", "expired"], [90, 5, 5])[0]
+            expiry = today + timedelta(days=rng.randint(-60, 900))
+            rows.append((drug_id, f"B{drug_id}-{n}", rng.randint(1, 20), expiry, status))
+    cur.executemany("""INSERT INTO drug_batch (drug_id, location_id, batch_no, quantity, expiry_date, status)
+                       VALUES (%s,1,%s,%s,%s,%s)""", rows)
+    conn.commit()
+    conn.close()
+    dispense.ensure_indexes()
+
+    timings = []
+    for i in range(args.repeat):
+        drug_id = 1 + i % args.drugs
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""SELECT MIN(expiry_date) FROM drug_batch
+                       WHERE drug_id=%s AND status='available' AND quantity>0 AND expiry_date >= %s""",
+                    (drug_id, today))
+        earliest = cur.fetchone()[0]
+        conn.close()
+
+        (_, _, dispensed), ms = common.timed(dispense.dispense_fefo, drug_id, 1, args.qty, "P1", "Bench", 1)
+        timings.append(ms)
+        assert sum(line[2] for line in dispensed) == args.qty
+
+        conn = get_connection()
+        cur = conn.cursor()
+        ids = [line[1] for line in dispensed]
+        cur.execute(f"SELECT MIN(expiry_date), MAX(status) FROM drug_batch WHERE id IN ({','.join(['%s'] * len(ids))})", ids)
+        used_earliest, status = cur.fetchone()
+        conn.close()
+        if used_earliest != earliest or status != "available":
+            raise SystemExit(f"FAIL: FEFO order violated for drug {drug_id}")
+
+    timings.sort()
+    print(f"{args.drugs} drugs x {args.batches} batches, {args.qty} units per dispense")
+    print(f"median {timings[len(timings) // 2]:.2f} ms  max {timings[-1]:.2f} ms  "
+          f"(~{len(dispensed)} batches touched per dispense)")
+
+
+if __name__ == "__main__":
+    main()
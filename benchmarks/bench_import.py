@@ -0,0 +1,101 @@
+"""
+Manifest import throughput and memory for manifest_import.import_manifest.
+
+Writes a synthetic --lines manifest (CSV, or XLSX with --xlsx) where about 1%
+of lines are bad, then dry-runs and imports it.  Peak Python memory is
+measured with tracemalloc on a separate dry run (tracing slows the import
+down several times) and must stay flat however long the file is.
+
+    python benchmarks/bench_import.py --lines 100000
+"""
+import argparse
+import csv
+import os
+import random
+import tempfile
+import tracemalloc
+
+import common
+from database import get_connection
+from manifest_import import import_manifest
+from receiving import ensure_indexes
+
+MAX_PEAK_MB = 32
+
+
+def write_manifest(path, lines, drugs, rng):
+    rows = ([f"SKU{rng.randint(1, drugs):06d}", f"LOT{i // 3}", rng.randint(1, 500), "1.25",
+             "2025-01-01", rng.choice(["2028-06-30", "2029-01-31", "2027-12-31"])] for i in range(lines))
+    rows = (r if i % 100 else [r[0], r[1], "ten"] + r[3:] for i, r in enumerate(rows))
+    header = ["Code", "Batch No", "Qty", "Unit Cost", "Mfg", "Expiry"]
+    if path.endswith(".xlsx"):
+        from openpyxl import Workbook
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(header)
+        for r in rows:
+            ws.append(r)
+        wb.save(path)
+    else:
+        with open(path, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(header)
+            w.writerows(rows)
+
+
+def run(path, dry_run):
+    result = import_manifest(path, 1, dry_run=dry_run)
+    print(f"{'dry run' if dry_run else 'import '}: {result.accepted:,} ok, {result.rejected:,} rejected, "
+          f"{result.created:,} batches created, {result.updated:,} topped up in {result.secs:.1f}s "
+          f"({result.accepted / result.secs:,.0f} lines/s)")
+    return result
+
+
+def check_memory(path):
+    tracemalloc.start()
+    import_manifest(path, 1, dry_run=True)
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    print(f"peak Python memory of a dry run: {peak:.1f} MB")
+    if peak > MAX_PEAK_MB:
+        raise SystemExit(f"FAIL: peak memory {peak:.1f} MB over {MAX_PEAK_MB} MB")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lines", type=int, default=100000)
+    ap.add_argument("--drugs", type=int, default=20000)
+    ap.add_argument("--xlsx", action="store_true")
+    args = ap.parse_args()
+
+    common.use_temp_sqlite()
+    conn = get_connection()
+    cur = conn.cursor()
+    common.seed_basics(cur)
+    cur.executemany("INSERT INTO drugs (name, code, unit) VALUES (%s,%s,%s)",
+                    [(f"Drug {i}", f"SKU{i:06d}", "tablet") for i in range(1, args.drugs + 1)])
+    conn.commit()
+    ensure_indexes()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="druginv_manifest_"), "manifest.xlsx" if args.xlsx else "manifest.csv")
+    write_manifest(path, args.lines, args.drugs, random.Random(1))
+    print(f"manifest: {args.lines:,} lines, {os.path.getsize(path) / 1e6:.1f} MB")
+
+    checked = run(path, True)
+    cur.execute("SELECT COUNT(*) FROM receive_items")
+    if cur.fetchone()[0]:
+        raise SystemExit("FAIL: dry run wrote receive_items")
+    imported = run(path, False)
+    cur.execute("SELECT COUNT(*), COALESCE(SUM(quantity), 0) FROM receive_items")
+    items, _ = cur.fetchone()
+    cur.execute("SELECT COUNT(*) FROM drug_batch")
+    batches = cur.fetchone()[0]
+    conn.close()
+    if items != imported.accepted or checked.accepted != imported.accepted or batches != imported.created:
+        raise SystemExit(f"FAIL: {items} items / {batches} batches for {imported}")
+    print(f"rejected rows: {imported.rejected_path}")
+    check_memory(path)
+
+
+if __name__ == "__main__":
+    main()
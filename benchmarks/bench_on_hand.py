@@ -0,0 +1,84 @@
+"""
+stock_on_hand consistency and lookup cost.
+
+Seeds --drugs drugs with a few batches each, rebuilds the summary, then runs
+counters that sell (single lines and FEFO carts) next to a receiving thread
+and an expiry sweep.  Afterwards stock_on_hand.verify() must find no drift.
+Finally times an on-hand lookup against the SUM over drug_batch it replaces.
+
+    python benchmarks/bench_on_hand.py --threads 4 --sales 500
+"""
+import argparse
+import random
+import threading
+from datetime import date, timedelta
+
+import common
+import dispense
+import expiry_sweeper
+import receiving
+import stock_on_hand
+from database import get_connection
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--drugs", type=int, default=2000)
+    ap.add_argument("--batches", type=int, default=20, help="batches per drug")
+    ap.add_argument("--threads", type=int, default=4)
+    ap.add_argument("--sales", type=int, default=500, help="sales per thread")
+    args = ap.parse_args()
+
+    common.use_temp_sqlite(max_pool=args.threads + 2)
+    conn = get_connection()
+    cur = conn.cursor()
+    common.seed_basics(cur, locations=2)
+    cur.executemany("INSERT INTO drugs (name, unit) VALUES (%s,%s)",
+                    [(f"Drug {i}", "tablet") for i in range(1, args.drugs + 1)])
+    rng = random.Random(1)
+    today = date.today()
+    cur.executemany("""INSERT INTO drug_batch (drug_id, location_id, batch_no, quantity, expiry_date)
+                       VALUES (%s,%s,%s,%s,%s)""",
+                    [(d, 1 + n % 2, f"B{d}-{n}", rng.randint(0, 50), today + timedelta(days=rng.randint(-30, 700)))
+                     for d in range(1, args.drugs + 1) for n in range(args.batches)])
+    conn.commit()
+    pairs, ms = common.timed(stock_on_hand.rebuild)
+    print(f"rebuilt {pairs} pairs in {ms:.0f} ms")
+
+    def counter(seed):
+        r = random.Random(seed)
+        for _ in range(args.sales):
+            drug_id, location_id = r.randint(1, 50), r.randint(1, 2)
+            try:
+                if r.random() < 0.5:
+                    dispense.dispense_fefo(drug_id, location_id, r.randint(1, 5))
+                else:
+                    dispense.dispense_cart([(drug_id, None, 1), (drug_id + 50, None, 2)], location_id=location_id)
+            except dispense.InsufficientStock:
+                pass
+
+    def receiver():
+        for n in range(args.sales // 10):
+            receiving.receive_goods(1 + n % 2, [(d, f"GRN{n}-{d}", 10, None, None, None) for d in range(1, 101)])
+
+    threads = [threading.Thread(target=counter, args=(i,)) for i in range(args.threads)]
+    threads += [threading.Thread(target=receiver), threading.Thread(target=expiry_sweeper.sweep)]
+    _, ms = common.timed(lambda: ([t.start() for t in threads], [t.join() for t in threads]))
+    drift, verify_ms = common.timed(stock_on_hand.verify)
+    print(f"{args.threads} counters x {args.sales} sales + receipts + sweep in {ms:.0f} ms; "
+          f"verify: {len(drift)} drifted pair(s) in {verify_ms:.0f} ms")
+
+    def summed():
+        cur.execute("SELECT COALESCE(SUM(quantity), 0) FROM drug_batch "
+                    "WHERE drug_id = %s AND location_id = %s AND status = 'available'", (7, 1))
+        return cur.fetchone()[0]
+    total, sum_ms = common.timed(summed)
+    held, soh_ms = common.timed(stock_on_hand.on_hand, 7, 1)
+    print(f"drug 7 @ location 1: SUM over batches {total} ({sum_ms:.2f} ms), stock_on_hand {held} ({soh_ms:.2f} ms)")
+    conn.close()
+    if drift or total != held:
+        raise SystemExit(f"FAIL: stock_on_hand drifted: {drift[:5]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Module open time: a new interpreter per click versus in-process windows.
+
+For each module, times what subprocess.Popen paid on every click before a
+widget was built (interpreter start plus importing the module and its
+dependencies), then what ModuleHost pays once the launcher has preloaded
+the modules.  With a display it also times ModuleHost.open() for each
+window -- first open and a second click -- against a throwaway SQLite
+database.
+
+    python benchmarks/bench_open.py --runs 3
+"""
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import time
+
+import common
+from module_host import MODULES
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def time_windows():
+    import tkinter as tk
+    from module_host import ModuleHost
+
+    common.use_temp_sqlite()
+    root = tk.Tk()
+    host = ModuleHost(root)
+    for title in MODULES:
+        _, first, _ = host.open(title)
+        root.update()
+        _, again, created = host.open(title)
+        print(f"  {title:<15} window built in {first:,.0f} ms; second click {again:.1f} ms "
+              f"({'new window!' if created else 'focused the open one'})")
+    root.destroy()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=common.ROOT)
+    worst = 0.0
+    for title, (name, _) in MODULES.items():
+        spawn = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", f"import {name}"], env=env, check=True, cwd=common.ROOT)
+            spawn.append((time.perf_counter() - start) * 1000)
+        importlib.import_module(name)           # what preload() does in the background
+        _, cached = common.timed(importlib.import_module, name)
+        worst = max(worst, cached)
+        print(f"{title:<15} new interpreter + imports: {median(spawn):,.0f} ms; in-process (preloaded): {cached:.3f} ms")
+
+    if os.environ.get("DISPLAY") or os.name == "nt":
+        print("in-process windows:")
+        time_windows()
+    else:
+        print("no display: window build timings skipped")
+    if worst > 5:
+        raise SystemExit("FAIL")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Type-ahead latency of drug_index.DrugIndex over a synthetic catalogue, plus
+one bulk batch prefetch for the drugs a search returns.
+
+    python benchmarks/bench_picker.py --drugs 40000
+"""
+import argparse
+import random
+
+import common
+from database import get_connection
+from drug_index import BatchPrefetcher, load_index
+
+SYLLABLES = ["para", "ceta", "mol", "amo", "xi", "cillin", "ibu", "pro", "fen", "met", "for", "min",
+             "ator", "va", "statin", "lo", "sar", "tan", "pan", "to", "pra", "zole", "cef", "tri"]
+QUERIES = ["p", "pa", "para", "paracet", "cetamol", "sku0123", "500mg", "tablet", "mol 500", "statin"]
+
+
+def word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--drugs", type=int, default=40000)
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+
+    rng = random.Random(1)
+    common.use_temp_sqlite()
+    conn = get_connection()
+    cur = conn.cursor()
+    common.seed_basics(cur)
+    cur.executemany("INSERT INTO drugs (name, generic_name, code, unit) VALUES (%s,%s,%s,%s)",
+                    [(f"{word(rng)} {rng.choice([100, 250, 500])}mg {rng.choice(['Tablet', 'Syrup'])}",
+                      word(rng), f"SKU{i:06d}", "tablet") for i in range(1, args.drugs + 1)])
+    cur.executemany("INSERT INTO drug_batch (drug_id, location_id, batch_no, quantity) VALUES (%s,1,%s,%s)",
+                    [(i, f"B{i}-{n}", 100) for i in range(1, args.drugs + 1) for n in range(3)])
+    conn.commit()
+    conn.close()
+
+    index, build_ms = common.timed(load_index)
+    print(f"index of {len(index)} drugs built in {build_ms:.0f} ms")
+    for q in QUERIES:
+        timings = sorted(index.timed_search(q)[1] for _ in range(args.repeat))
+        print(f"{q!r:>12}: {len(index.search(q)):>3} hits  median {timings[len(timings) // 2]:.3f} ms  "
+              f"max {timings[-1]:.3f} ms")
+
+    shown = [row[0] for row in index.search("para")]
+    batches = BatchPrefetcher()
+    _, ms = common.timed(batches.prefetch, 1, shown)
+    print(f"prefetched batches of {len(shown)} drugs in {ms:.1f} ms "
+          f"({len(batches.get(1, shown[0]))} for the first)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Goods receipt throughput for receiving.receive_goods.
+
+Posts one receipt of --lines lines against a catalogue that already has some
+of the batches, then receives the same lines again and checks that every
+batch was topped up rather than duplicated.
+
+    python benchmarks/bench_receive.py --lines 500
+"""
+import argparse
+from datetime import date
+
+import common
+from database import get_connection
+from receiving import ensure_indexes, receive_goods
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lines", type=int, default=500)
+    ap.add_argument("--drugs", type=int, default=20000)
+    args = ap.parse_args()
+
+    common.use_temp_sqlite()
+    conn = get_connection()
+    cur = conn.cursor()
+    common.seed_basics(cur)
+    cur.executemany("INSERT INTO drugs (name, code, unit) VALUES (%s,%s,%s)",
+                    [(f"Drug {i}", f"SKU{i:06d}", "tablet") for i in range(1, args.drugs + 1)])
+    # every other drug already has the batch the delivery brings
+    cur.executemany("INSERT INTO drug_batch (drug_id, location_id, batch_no, quantity) VALUES (%s,1,%s,%s)",
+                    [(i, f"GRN-{i}", 10) for i in range(1, args.lines + 1, 2)])
+    conn.commit()
+    ensure_indexes()
+
+    lines = [(i, f"GRN-{i}", 100, "2.50", date(2025, 1, 1), date(2028, 1, 1)) for i in range(1, args.lines + 1)]
+    note_id, ms, created, updated = receive_goods(1, lines, remarks="bench")
+    print(f"GRN #{note_id}: {len(lines)} lines in {ms:.1f} ms ({created} created, {updated} topped up)")
+    note_id, ms, created, updated = receive_goods(1, lines, remarks="bench again")
+    print(f"GRN #{note_id}: {len(lines)} lines in {ms:.1f} ms ({created} created, {updated} topped up)")
+
+    cur.execute("SELECT COUNT(*), MIN(quantity), MAX(quantity) FROM drug_batch WHERE batch_no LIKE 'GRN-%'")
+    batches, low, high = cur.fetchone()
+    conn.close()
+    if batches != args.lines or created or low != 200 or high != 210:
+        raise SystemExit(f"FAIL: {batches} batches, quantities {low}..{high}")
+    if ms >= 1000:
+        raise SystemExit(f"FAIL: {ms:.0f} ms for {len(lines)} lines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Reorder-alert evaluation cost with a large catalogue.
+
+Seeds --drugs drugs (each with a reorder level) stocked at two locations,
+then sells --sales times, re-evaluating just the sold drug after each sale
+with reorder_alerts.check().  Also times the full first load of the
+"Below reorder level" list, the incremental poll after those sales, and
+drafting purchase orders for the alerts.
+
+    python benchmarks/bench_reorder.py --drugs 50000 --sales 500
+"""
+import argparse
+import random
+import time
+
+import common
+import dispense
+import reorder_alerts
+import stock_on_hand
+from database import get_connection
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--drugs", type=int, default=50000)
+    ap.add_argument("--sales", type=int, default=500)
+    args = ap.parse_args()
+
+    common.use_temp_sqlite()
+    conn = get_connection()
+    cur = conn.cursor()
+    common.seed_basics(cur, locations=2)
+    cur.executemany("INSERT INTO drugs (name, unit, reorder_level) VALUES (%s,%s,%s)",
+                    [(f"Drug {i}", "tablet", 20) for i in range(1, args.drugs + 1)])
+    rng = random.Random(1)
+    cur.executemany("INSERT INTO drug_batch (drug_id, location_id, batch_no, quantity) VALUES (%s,%s,%s,%s)",
+                    [(d, loc, f"B{d}-{loc}", rng.randint(10, 40)) for d in range(1, args.drugs + 1) for loc in (1, 2)])
+    conn.commit()
+    conn.close()
+    stock_on_hand.rebuild()
+    reorder_alerts.ensure_indexes()
+    time.sleep(1.1)     # last_updated has 1 s resolution; keep the sales out of the rebuild's second
+
+    alerts = reorder_alerts.ReorderAlerts()
+    (changed, _, ms), total_ms = common.timed(lambda: alerts.apply(alerts.fetcher()()))
+    print(f"{args.drugs:,} drugs x 2 locations: {len(alerts.below):,} below reorder level, "
+          f"full load {total_ms:.0f} ms")
+
+    timings, raised = [], 0
+    for _ in range(args.sales):
+        drug_id, location_id = rng.randint(1, args.drugs), rng.randint(1, 2)
+        try:
+            dispense.dispense_fefo(drug_id, location_id, 5)
+        except dispense.InsufficientStock:
+            continue
+        found, ms = reorder_alerts.check([drug_id], location_id)
+        timings.append(ms)
+        raised += bool(found)
+    print(f"check after {len(timings)} sales: median {median(timings):.2f} ms, max {max(timings):.2f} ms "
+          f"({raised} sales left the drug below its reorder level)")
+
+    (changed, cleared, _), ms = common.timed(lambda: alerts.apply(alerts.fetcher()()))
+    print(f"incremental poll: {len(changed)} new/changed alert(s), {len(cleared)} cleared in {ms:.1f} ms; "
+          f"{len(alerts.below):,} below now")
+
+    batch = sorted(alerts.below.values())[:200]
+    (drafted, skipped), ms = common.timed(reorder_alerts.draft_purchase_orders, batch)
+    again, _ = common.timed(reorder_alerts.draft_purchase_orders, batch)
+    print(f"drafted {len(drafted)} PO(s) with {sum(d[3] for d in drafted)} line(s) in {ms:.0f} ms; "
+          f"re-drafting skipped {again[1]} line(s) already on order")
+    if max(timings) > 50 or again[0]:
+        raise SystemExit("FAIL")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Image work during a window-edge drag, per event versus through ResizeScheduler.
+
+Replays a --secs drag of the launcher's right edge at --rate <Configure>
+events a second (each a few pixels wider).  The old handler rescaled the
+full-size background (copy + LANCZOS cover) on every event; the scheduler
+draws a nearest-neighbour draft from the nearest tier at most once a frame
+and one full-quality render when the drag stops.  Timers run on a simulated
+clock, but every render does its real PIL work (no display needed).
+
+    python benchmarks/bench_resize.py --secs 1.5 --rate 120
+"""
+import argparse
+import heapq
+import itertools
+import os
+import time
+
+import common
+import asset_cache
+from PIL import Image
+from resize_scheduler import ResizeScheduler
+
+BACKGROUND = os.path.join(common.ROOT, "background.png")
+
+
+class DragWindow:
+    """Just enough of a toplevel for ResizeScheduler: bind, after, after_cancel on a simulated clock."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.timers = []
+        self.cancelled = set()
+        self.ids = itertools.count()
+        self.handler = None
+
+    def bind(self, _sequence, func, add=None):
+        self.handler = func
+
+    def after(self, ms, func):
+        timer = next(self.ids)
+        heapq.heappush(self.timers, (self.now + ms / 1000, timer, func))
+        return timer
+
+    def after_cancel(self, timer):
+        self.cancelled.add(timer)
+
+    def run_until(self, t):
+        while self.timers and self.timers[0][0] <= t:
+            self.now, timer, func = heapq.heappop(self.timers)
+            if timer not in self.cancelled:
+                func()
+        self.now = t
+
+
+class Event:
+    def __init__(self, widget, width, height):
+        self.widget, self.width, self.height = widget, width, height
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--secs", type=float, default=1.5)
+    ap.add_argument("--rate", type=int, default=120)
+    args = ap.parse_args()
+    sizes = [(1000 + 3 * i, 700) for i in range(int(args.secs * args.rate))]
+
+    original = Image.open(BACKGROUND).convert("RGBA")
+    start = time.perf_counter()
+    for w, h in sizes:
+        img = original.copy()
+        scale = max(w / img.width, h / img.height)
+        img = img.resize((int(img.width * scale) + 1, int(img.height * scale) + 1), Image.LANCZOS)
+        img.crop((0, 0, w, h))
+    old_ms = (time.perf_counter() - start) * 1000
+    print(f"per event:         {len(sizes)} renders, {old_ms:,.0f} ms of image work "
+          f"({old_ms / len(sizes):.1f} ms each)")
+
+    window = DragWindow()
+    timings = {False: [], True: []}
+
+    def render(w, h, final):
+        _, ms = common.timed(asset_cache.resized, BACKGROUND, (w, h), "cover", None, not final)
+        timings[final].append(ms)
+
+    scheduler = ResizeScheduler(window, render)
+    for i, (w, h) in enumerate(sizes):
+        window.run_until(i / args.rate)
+        scheduler.on_configure(Event(window, w, h))
+        scheduler.on_configure(Event(window, w, h))          # repeated size: ignored
+        scheduler.on_configure(Event(object(), 300, 200))    # a child widget's event: ignored
+    window.run_until(args.secs + 1)
+    drafts, finals = timings[False], timings[True]
+    new_ms = sum(drafts) + sum(finals)
+    print(f"ResizeScheduler:   {len(drafts)} draft + {len(finals)} final render(s), {new_ms:,.0f} ms of image work "
+          f"(draft {max(drafts):.1f} ms max, final {max(finals):.1f} ms)")
+    print(f"{old_ms / new_ms:.1f}x less image work during the drag")
+    if len(finals) != 1 or len(drafts) > args.secs * 1000 / scheduler.frame_ms + 1:
+        raise SystemExit("FAIL")
+
+
+if __name__ == "__main__":
+    main()
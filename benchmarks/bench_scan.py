@@ -0,0 +1,73 @@
+"""
+Scan-to-dispense resolution latency for scan_index.ScanIndex.
+
+Loads the index once, then resolves random codes with no database access
+(checked against the pool's checkout count).  Also times one incremental sync
+after stock changes elsewhere, once the seeded rows are older than
+delta_refresh.VERSION_OVERLAP (until then every sync re-reads them).
+
+    python benchmarks/bench_scan.py --drugs 40000 --scans 20000
+"""
+import argparse
+import random
+import time
+
+import common
+import database
+from database import get_connection
+from delta_refresh import VERSION_OVERLAP
+from scan_index import ScanIndex
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--drugs", type=int, default=40000)
+    ap.add_argument("--batches", type=int, default=3, help="batches per drug")
+    ap.add_argument("--scans", type=int, default=20000)
+    args = ap.parse_args()
+
+    common.use_temp_sqlite()
+    conn = get_connection()
+    cur = conn.cursor()
+    common.seed_basics(cur)
+    cur.executemany("INSERT INTO drugs (name, code, unit) VALUES (%s,%s,%s)",
+                    [(f"Drug {i}", f"890{i:09d}", "tablet") for i in range(1, args.drugs + 1)])
+    cur.executemany("""INSERT INTO drug_batch (drug_id, location_id, batch_no, quantity, expiry_date)
+                       VALUES (%s,1,%s,%s,%s)""",
+                    [(i, f"B{i}-{n}", 50, f"{2030 + n}-01-01")
+                     for i in range(1, args.drugs + 1) for n in range(args.batches)])
+    conn.commit()
+
+    scans = ScanIndex()
+    _, ms = common.timed(lambda: scans.apply(scans.fetcher()()))
+    print(f"index loaded in {ms:.0f} ms ({len(scans.by_code)} codes)")
+
+    rng = random.Random(1)
+    codes = [f"890{rng.randint(1, args.drugs):09d}" for _ in range(args.scans)]
+    checkouts = database.pool_stats().get("checkouts")
+    timings = []
+    for code in codes:
+        start = time.perf_counter()
+        scans.resolve(code, 1)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"{args.scans} scans: median {timings[len(timings) // 2] * 1000:.1f} us  "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1000:.1f} us  max {timings[-1] * 1000:.1f} us")
+    if database.pool_stats().get("checkouts") != checkouts:
+        raise SystemExit("FAIL: resolve() touched the database")
+
+    # let the seed age past the overlap and the marks catch up with it
+    time.sleep(VERSION_OVERLAP.total_seconds() + 1.1)
+    scans.apply(scans.fetcher()())
+    # another counter empties the first batch of drug 1
+    time.sleep(1.1)     # last_updated has 1 s resolution
+    cur.execute("UPDATE drug_batch SET quantity = 0 WHERE drug_id = 1 AND batch_no = 'B1-0'")
+    conn.commit()
+    conn.close()
+    changed, ms = common.timed(lambda: scans.apply(scans.fetcher()()))
+    print(f"incremental sync: {changed} change(s) in {ms:.1f} ms; drug 1 now resolves to "
+          f"{scans.resolve('890000000001', 1)[3]}")
+
+
+if __name__ == "__main__":
+    main()
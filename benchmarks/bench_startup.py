@@ -0,0 +1,50 @@
+"""
+Cold-start import time of the launcher and each module window, against a budget.
+
+Imports every module --runs times in a fresh interpreter (python -X
+importtime, see import_profile.py) and compares the median with BUDGET_MS.
+Fails when a module goes over its budget or imports one of the packages
+that are only needed for exports and bills (pandas, fpdf, openpyxl, ...) at
+startup.  --scale multiplies every budget, for slow machines.
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+
+import common  # noqa: F401  (puts the repo on sys.path)
+from import_profile import PROFILED, heavy_imports, profile
+
+# ~2x what each took on a laptop without the MySQL driver; fpdf at import alone added ~280 ms
+BUDGET_MS = {
+    "Main": 150,
+    "Drug_Inventory_UI_4": 150,
+    "Sales_ui_4": 200,
+    "Stock_ui_2": 150,
+    "PAtient_Data_2": 150,
+}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--scale", type=float, default=1.0)
+    args = ap.parse_args()
+
+    failed = []
+    for module in PROFILED:
+        total, deps = profile(module, args.runs)
+        budget = BUDGET_MS[module] * args.scale
+        heavy = heavy_imports(deps)
+        largest = sorted(((ms, package) for package, (ms, _) in deps.items() if package != module), reverse=True)[:3]
+        print(f"{module:<20} {total:6,.0f} ms / {budget:,.0f} ms budget  "
+              f"(largest: {', '.join(f'{package} {ms:,.0f}' for ms, package in largest)})")
+        if heavy:
+            print(f"  imports {', '.join(heavy)} at startup")
+        if total > budget or heavy:
+            failed.append(module)
+    if failed:
+        raise SystemExit(f"FAIL: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
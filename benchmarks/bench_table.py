@@ -0,0 +1,112 @@
+"""
+Virtualized table cost with a large result set.
+
+Loads --rows sale-history-shaped rows into a RowStore the way DeltaView and
+the sales history do (one insert per row), then times a window read, a
+column sort, a text filter and a small delta patch, and measures the
+backing store's memory in a separate tracemalloc pass.  With a display the
+same load also goes into a plain ttk.Treeview and a VirtualTable, timed up
+to the first paint.
+
+    python benchmarks/bench_table.py --rows 100000
+"""
+import argparse
+import os
+import random
+import tracemalloc
+from datetime import datetime, timedelta
+
+import common
+from virtual_table import RowStore
+
+WINDOW = 30
+
+
+def make_rows(n):
+    rng = random.Random(1)
+    start = datetime(2024, 1, 1)
+    return [(i, f"Drug {rng.randrange(5000)}", f"B{rng.randrange(10 ** 6):06d}", rng.randrange(1, 9999),
+             f"Patient {rng.randrange(20000)}", rng.randrange(1, 50), "bench", start + timedelta(minutes=i))
+            for i in range(1, n + 1)]
+
+
+def load(store, rows):
+    for r in rows:
+        store.insert("end", str(r[0]), r)
+
+
+def time_widgets(rows):
+    import tkinter as tk
+    from tkinter import ttk
+    from virtual_table import VirtualTable
+
+    root = tk.Tk()
+    cols = ("ID", "Drug", "Batch", "Patient ID", "Patient Name", "Quantity", "Dispensed By", "Date")
+    for name, make in (("ttk.Treeview", ttk.Treeview), ("VirtualTable", VirtualTable)):
+        tree = make(root, columns=cols, show="headings")
+        tree.pack(fill="both", expand=True)
+
+        def fill(tree=tree):
+            for r in rows:
+                tree.insert("", "end", iid=str(r[0]), values=r)
+            root.update()
+        _, ms = common.timed(fill)
+        print(f"{name}: {len(rows):,} rows loaded and painted in {ms:,.0f} ms")
+        tree.destroy()
+    root.destroy()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100000)
+    args = ap.parse_args()
+    rows = make_rows(args.rows)
+
+    store = RowStore()
+    _, load_ms = common.timed(load, store, rows)
+    print(f"RowStore: {len(store):,} rows loaded in {load_ms:,.0f} ms")
+
+    _, ms = common.timed(lambda: store.view()[5000:5000 + WINDOW])
+    print(f"window of {WINDOW} rows: {ms:.3f} ms")
+
+    store.sort(1)
+    _, sort_ms = common.timed(store.view)
+    store.sort(7, descending=True)
+    _, date_ms = common.timed(store.view)
+    print(f"sort by drug: {sort_ms:.0f} ms, by date (desc): {date_ms:.0f} ms")
+
+    store.set_filter("drug 42")
+    view, filter_ms = common.timed(store.view)
+    print(f"filter 'drug 42': {len(view):,} rows in {filter_ms:.0f} ms")
+    store.set_filter("")
+    store.sort(None)
+
+    def patch():
+        for i in range(1, 51):
+            store.insert(0, f"new{i}", rows[i])
+        for r in rows[100:150]:
+            store.update(str(r[0]), r[:5] + (0,) + r[6:])
+        store.delete([str(r[0]) for r in rows[200:250]])
+        return store.view()[:WINDOW]
+    _, patch_ms = common.timed(patch)
+    print(f"delta patch (50 new, 50 changed, 50 deleted): {patch_ms:.1f} ms")
+
+    del store
+    tracemalloc.start()
+    store = RowStore()
+    load(store, rows)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"backing store: {size / 2 ** 20:.1f} MB ({size / len(store):.0f} bytes/row)")
+
+    if os.environ.get("DISPLAY") or os.name == "nt":
+        time_widgets(rows)
+    else:
+        print("no display: widget timings skipped")
+
+    if max(sort_ms, date_ms, filter_ms) > 2000 or patch_ms > 100:
+        raise SystemExit("FAIL")
+
+
+if __name__ == "__main__":
+    main()
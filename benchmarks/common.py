@@ -0,0 +1,34 @@
+"""Helpers shared by the benchmark scripts: a throwaway SQLite database with seed data."""
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import database  # noqa: E402
+
+
+def use_temp_sqlite(max_pool=8):
+    """Point the shared pool at a fresh SQLite file and return its path."""
+    path = os.path.join(tempfile.mkdtemp(prefix="druginv_bench_"), "bench.db")
+    os.environ["DRUGINV_POOL_MAX_SIZE"] = str(max_pool)
+    database.configure(backend="sqlite", path=path)
+    return path
+
+
+def seed_basics(cur, locations=1):
+    """Insert the role/user/location rows most benchmarks need."""
+    cur.execute("INSERT INTO roles (name) VALUES (%s)", ("bench",))
+    cur.execute("INSERT INTO users (username, email, password_hash, role_id) VALUES (%s,%s,%s,%s)",
+                ("bench", "bench@example.com", "x", 1))
+    for i in range(locations):
+        cur.execute("INSERT INTO locations (name, type) VALUES (%s,%s)", (f"Counter {i + 1}", "hospital"))
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
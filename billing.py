@@ -0,0 +1,266 @@
+"""
+Bill PDFs, one at a time or in bulk (e.g. month-end reissue).
+
+A bill is one checkout: the consumption rows sharing a timestamp and patient.
+Bulk runs stream the bills from the database and render them in a process
+pool.  Each worker builds the page template -- logo, title and fonts --
+once in its initializer and deep-copies it per bill, so image decoding and
+font setup are not repeated for every document.  Output is either one file
+per bill or one merged PDF: workers render chunks of pages, and the chunks
+are concatenated with pypdf, or rendered by a single process when pypdf is
+not installed.
+"""
+import copy
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from database import get_connection
+from sales_history import build_filters
+
+LOGO_PATH = "C:\\Users\\muska\\Downloads\\logo.png"
+TITLE = "Pharmacy Bill"
+BILLS_PER_TASK = 50
+FETCH_ROWS = 2000
+
+BILL_SQL = """
+    SELECT c.id, c.timestamp, c.patient_id, c.patient_name, c.dispensed_by, d.name, b.batch_no, c.quantity
+    FROM consumption c
+    JOIN drugs d ON c.drug_id=d.id
+    JOIN drug_batch b ON c.drug_batch_id=b.id
+    WHERE {where}
+    ORDER BY c.timestamp, c.id
+"""
+
+
+class BillsCancelled(Exception):
+    """Bulk generation was cancelled."""
+
+
+# ----------------- SELECTION -----------------
+def iter_bills(date_from=None, date_to=None, sale_ids=None, chunk=BILLS_PER_TASK):
+    """
+    Yield lists of up to chunk bills for a date range or a set of consumption
+    ids.  A bill is (bill_no, sale_time, patient_id, patient_name,
+    dispensed_by, [(drug, batch_no, qty), ...]) and bill_no is its first sale id.
+    """
+    where, params = build_filters(date_from=date_from, date_to=date_to)
+    if sale_ids is not None:
+        sale_ids = [int(i) for i in sale_ids]
+        if not sale_ids:
+            return
+        where += f" AND c.id IN ({','.join(['%s'] * len(sale_ids))})"
+        params += sale_ids
+    conn = get_connection()
+    try:
+        cur = conn.cursor(buffered=False)
+        cur.execute(BILL_SQL.format(where=where), params)
+        bills, current, key = [], None, None
+        while True:
+            rows = cur.fetchmany(FETCH_ROWS)
+            if not rows:
+                break
+            for sale_id, ts, patient_id, patient_name, dispensed_by, drug, batch_no, qty in rows:
+                if (ts, patient_id, patient_name) != key:
+                    key = (ts, patient_id, patient_name)
+                    current = (sale_id, ts, patient_id, patient_name, dispensed_by, [])
+                    bills.append(current)
+                    if len(bills) > chunk:
+                        yield bills[:-1]
+                        bills = bills[-1:]
+                current[5].append((drug, batch_no, qty))
+        if bills:
+            yield bills
+    except BaseException:
+        conn.discard()
+        raise
+    else:
+        conn.close()
+
+
+# ----------------- RENDERING -----------------
+_template = None    # per-process page template, built by _init_worker
+
+
+def _draw_header(pdf, logo_path):
+    if logo_path and os.path.exists(logo_path):
+        pdf.image(logo_path, 10, 8, 16)
+    pdf.set_font("Arial","B",16)
+    pdf.cell(0,10,TITLE,ln=True,align="C")
+    pdf.ln(6)
+
+
+def _draw_body(pdf, bill):
+    bill_no, sale_time, patient_id, patient_name, dispensed_by, lines = bill
+    pdf.set_font("Arial","",12)
+    for label, value in (("Bill No", bill_no), ("Patient ID", patient_id or ""),
+                         ("Patient Name", patient_name or ""), ("Dispensed By", dispensed_by or ""),
+                         ("Date", sale_time.strftime("%Y-%m-%d %H:%M:%S"))):
+        pdf.cell(50,8,f"{label}:",border=0)
+        pdf.cell(0,8,str(value),ln=True)
+    pdf.ln(4)
+    pdf.set_font("Arial","B",12)
+    for head, width in (("Drug",90),("Batch",60),("Quantity",30)):
+        pdf.cell(width,8,head,border=1)
+    pdf.ln()
+    pdf.set_font("Arial","",12)
+    for drug, batch_no, qty in lines:
+        pdf.cell(90,8,str(drug),border=1)
+        pdf.cell(60,8,str(batch_no),border=1)
+        pdf.cell(30,8,str(qty),border=1,ln=True)
+
+
+def _init_worker(logo_path=LOGO_PATH):
+    """Build the one-page template (logo decoded, fonts set up) for this process."""
+    global _template
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.add_page()
+    _draw_header(pdf, logo_path)
+    _template = (pdf, logo_path)
+
+
+def bill_filename(bill):
+    return f"bill_{bill[0]}_{bill[1].strftime('%Y%m%d_%H%M%S')}.pdf"
+
+
+def _render_files(bills, out_dir):
+    """One PDF per bill, each a copy of the template page."""
+    if _template is None:
+        _init_worker()
+    for bill in bills:
+        pdf = copy.deepcopy(_template[0])
+        _draw_body(pdf, bill)
+        pdf.output(os.path.join(out_dir, bill_filename(bill)))
+    return len(bills)
+
+
+def _add_pages(pdf, bills, check=None):
+    """Append bills to pdf as consecutive pages; check() runs before each bill."""
+    logo_path = _template[1]
+    for bill in bills:
+        if check is not None:
+            check()
+        pdf.add_page()
+        _draw_header(pdf, logo_path)
+        _draw_body(pdf, bill)
+    return len(bills)
+
+
+def _render_merged(bills, path):
+    """All bills as consecutive pages of one PDF (the logo is embedded once)."""
+    if _template is None:
+        _init_worker()
+    from fpdf import FPDF
+    pdf = FPDF()
+    _add_pages(pdf, bills)
+    pdf.output(path)
+    return len(bills)
+
+
+def write_bill(bill, path, logo_path=LOGO_PATH):
+    """Render a single bill in this process."""
+    if _template is None or _template[1] != logo_path:
+        _init_worker(logo_path)
+    pdf = copy.deepcopy(_template[0])
+    _draw_body(pdf, bill)
+    pdf.output(path)
+
+
+def _merge(parts, path):
+    from pypdf import PdfWriter
+    writer = PdfWriter()
+    for part in parts:
+        writer.append(part)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def _can_merge_parts():
+    try:
+        import pypdf  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+# ----------------- BULK -----------------
+def generate_bills(out, date_from=None, date_to=None, sale_ids=None, merged=False, workers=None,
+                   request=None, logo_path=LOGO_PATH):
+    """
+    Render every bill in the selection.  out is a directory (one file per
+    bill) or, with merged=True, the path of the combined PDF.  workers=0
+    renders in this process.  request (a db_executor.Request) receives
+    progress and can cancel.  Returns (bills, seconds, bills_per_second).
+    """
+    start = time.perf_counter()
+    workers = (os.cpu_count() or 2) if workers is None else workers
+    chunks = iter_bills(date_from, date_to, sale_ids)
+    if merged and not _can_merge_parts():
+        workers = 0     # a single document has to come from a single renderer
+    done = 0
+
+    def report():
+        if request is not None:
+            secs = time.perf_counter() - start
+            request.progress(f"Generated {done:,} bills ({done / secs if secs else 0:.0f} bills/s)...")
+
+    def check_cancel():
+        if request is not None and request.cancelled:
+            raise BillsCancelled()
+
+    parts = []
+    try:
+        if workers == 0:
+            if _template is None or _template[1] != logo_path:
+                _init_worker(logo_path)
+            if merged:
+                # each chunk goes onto the document as it arrives; no bill list is kept
+                from fpdf import FPDF
+                pdf = FPDF()
+                for chunk in chunks:
+                    done += _add_pages(pdf, chunk, check_cancel)
+                    report()
+                if done:
+                    pdf.output(out + ".part")
+                    os.replace(out + ".part", out)
+            else:
+                for chunk in chunks:
+                    check_cancel()
+                    done += _render_files(chunk, out)
+                    report()
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(logo_path,)) as pool:
+                pending = set()
+                try:
+                    for n, chunk in enumerate(chunks):
+                        check_cancel()
+                        if merged:
+                            parts.append(f"{out}.part{n}")
+                            pending.add(pool.submit(_render_merged, chunk, parts[-1]))
+                        else:
+                            pending.add(pool.submit(_render_files, chunk, out))
+                        # bounded queue: never hold more than a few chunks of bills in memory
+                        if len(pending) >= workers * 2:
+                            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            done += sum(f.result() for f in finished)
+                            report()
+                    for f in pending:
+                        done += f.result()
+                        check_cancel()
+                except BaseException:
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    raise
+            if merged and parts:
+                _merge(parts, out)
+    except BaseException:
+        if os.path.exists(out + ".part"):
+            os.remove(out + ".part")
+        raise
+    finally:
+        for part in parts:
+            if os.path.exists(part):
+                os.remove(part)
+    secs = time.perf_counter() - start
+    return done, secs, (done / secs if secs else 0.0)
@@ -0,0 +1,111 @@
+"""
+Offline asset pipeline: pre-scaled, quick-to-decode copies of the UI images.
+
+For each image in SOURCES this writes a few resolution tiers (longest side
+TIERS, never larger than the original) into assets/ -- JPEG for opaque
+images, PNG for ones with transparency -- and records them in
+assets/manifest.json.  asset_cache then decodes the smallest tier that
+covers the size a window shows instead of the multi-megabyte original.
+
+    python build_assets.py            # rebuild images that changed since the last build
+    python build_assets.py --force    # rebuild everything
+
+Run it again after replacing any of the source images.
+"""
+import hashlib
+import json
+import os
+import time
+
+from PIL import Image
+
+import asset_cache
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SOURCES = ("background.png", "logo.png", "drug_inventory_image.png", "Sales_image.png", "Stock_image.png",
+           "Patient_image.png")
+TIERS = (256, 512, 1024, 1280, 1600, 1920)   # close steps near window sizes keep the runtime resize small
+JPEG_QUALITY = 88
+
+
+def _digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _has_alpha(img):
+    if img.mode in ("RGBA", "LA") or "transparency" in img.info:
+        return img.convert("RGBA").getextrema()[3][0] < 255
+    return False
+
+
+def tier_sizes(size):
+    """(w, h) of each tier for an image of this size, smallest first."""
+    longest = max(size)
+    sides = sorted({t for t in TIERS if t < longest} | {min(longest, TIERS[-1])})
+    return [(max(1, round(size[0] * side / longest)), max(1, round(size[1] * side / longest))) for side in sides]
+
+
+def build_one(src, out_dir):
+    """Write the tiers of one source image; returns its manifest entry."""
+    stem = os.path.splitext(os.path.basename(src))[0]
+    with Image.open(src) as f:
+        alpha = _has_alpha(f)
+        img = f.convert("RGBA" if alpha else "RGB")
+    tiers = []
+    for size in tier_sizes(img.size):
+        name = f"{stem}_{max(size)}.{'png' if alpha else 'jpg'}"
+        out = img if size == img.size else img.resize(size, Image.LANCZOS)
+        tmp = os.path.join(out_dir, name + ".part")
+        if alpha:
+            out.save(tmp, "PNG", compress_level=6)
+        else:
+            out.save(tmp, "JPEG", quality=JPEG_QUALITY, optimize=True)
+        os.replace(tmp, os.path.join(out_dir, name))
+        tiers.append({"file": name, "size": list(size)})
+    return {"size": list(img.size), "source_bytes": os.path.getsize(src), "source_sha1": _digest(src),
+            "tiers": tiers}
+
+
+def build(sources=SOURCES, src_dir=ROOT, out_dir=None, force=False):
+    """Build changed (or all) images.  Returns (manifest images, rebuilt names, elapsed_ms)."""
+    out_dir = out_dir or asset_cache.ASSET_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, asset_cache.MANIFEST)
+    try:
+        with open(path, encoding="utf-8") as f:
+            images = json.load(f).get("images", {})
+    except (OSError, ValueError):
+        images = {}
+    start = time.perf_counter()
+    rebuilt = []
+    for name in sources:
+        src = os.path.join(src_dir, name)
+        if not os.path.exists(src):
+            print(f"skipped {name}: not found")
+            continue
+        old = images.get(name)
+        if (not force and old and old.get("source_sha1") == _digest(src)
+                and all(os.path.exists(os.path.join(out_dir, t["file"])) for t in old["tiers"])):
+            continue
+        images[name] = build_one(src, out_dir)
+        rebuilt.append(name)
+    with open(path + ".part", "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "tiers": list(TIERS), "images": images}, f, indent=2, sort_keys=True)
+    os.replace(path + ".part", path)
+    return images, rebuilt, (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Pre-scale the UI images into assets/ and write the manifest.")
+    ap.add_argument("--force", action="store_true", help="rebuild every image, changed or not")
+    ap.add_argument("--out", help=f"output directory (default {asset_cache.ASSET_DIR})")
+    args = ap.parse_args()
+    images, rebuilt, ms = build(out_dir=args.out, force=args.force)
+    for name in rebuilt:
+        entry = images[name]
+        print(f"{name} {entry['source_bytes'] // 1024} KB -> "
+              + ", ".join(f"{t['size'][0]}x{t['size'][1]}" for t in entry["tiers"]))
+    print(f"{len(rebuilt)} image(s) rebuilt, {len(images) - len(rebuilt)} up to date ({ms:.0f} ms)")
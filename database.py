@@ -0,0 +1,385 @@
+"""
+Shared database access for all UI modules.
+
+Connections come from one bounded, health-checked pool that is configured once
+from ``db_config.ini`` (or the file named by DRUGINV_DB_CONFIG) and environment
+variables.  ``get_connection()`` hands out a pooled connection; calling
+``close()`` on it returns it to the pool instead of tearing down the socket, so
+existing ``conn = get_connection() ... conn.close()`` code keeps working.
+
+Two storage backends are available, selected with ``backend`` in the
+[database] section: ``mysql`` (default) and ``sqlite`` (see sqlite_backend.py).
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+import configparser
+from collections import deque
+
+# ----------------- CONFIG -----------------
+CONFIG_PATH = os.environ.get(
+    "DRUGINV_DB_CONFIG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "db_config.ini"),
+)
+
+DEFAULT_DB_CONFIG = {
+    "backend": "mysql",
+    "path": "",               # sqlite only; defaults to drug_inventory.db next to this file
+    "host": "localhost",
+    "port": 3306,
+    "user": "root",
+    "password": "muskan",
+    "database": "drug_inventory",
+}
+
+DEFAULT_POOL_CONFIG = {
+    "max_size": 5,            # hard cap on open connections
+    "idle_timeout": 300,      # seconds an idle connection may sit before eviction
+    "ping_after": 30,         # health-check connections idle longer than this
+    "checkout_timeout": 10,   # seconds to wait for a free connection
+}
+
+
+def load_config(path=CONFIG_PATH):
+    """
+    Return (db_config, pool_config) built from defaults, then the ini file
+    (sections [database] and [pool]), then DRUGINV_DB_* / DRUGINV_POOL_* env vars.
+    """
+    db_cfg = dict(DEFAULT_DB_CONFIG)
+    pool_cfg = dict(DEFAULT_POOL_CONFIG)
+
+    parser = configparser.ConfigParser()
+    if path and os.path.exists(path):
+        parser.read(path)
+    for section, cfg in (("database", db_cfg), ("pool", pool_cfg)):
+        if parser.has_section(section):
+            cfg.update(parser.items(section))
+        prefix = "DRUGINV_DB_" if section == "database" else "DRUGINV_POOL_"
+        for key, value in os.environ.items():
+            if key.startswith(prefix):
+                cfg[key[len(prefix):].lower()] = value
+
+    db_cfg.update(_overrides)
+    db_cfg["port"] = int(db_cfg["port"])
+    for key in ("max_size", "checkout_timeout"):
+        pool_cfg[key] = int(pool_cfg[key])
+    for key in ("idle_timeout", "ping_after"):
+        pool_cfg[key] = float(pool_cfg[key])
+    return db_cfg, pool_cfg
+
+
+# ----------------- ERRORS -----------------
+# Tuples usable in ``except`` clauses whichever backend is active.
+try:
+    import mysql.connector as _mysql
+    Error = (_mysql.Error, sqlite3.Error)
+    IntegrityError = (_mysql.IntegrityError, sqlite3.IntegrityError)
+except ImportError:  # sqlite-only install
+    Error = (sqlite3.Error,)
+    IntegrityError = (sqlite3.IntegrityError,)
+
+
+# ----------------- POOL -----------------
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within checkout_timeout."""
+
+
+class PooledConnection:
+    """Thin proxy around a driver connection; close() returns it to the pool."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get("_raw")
+        if raw is None:
+            raise AttributeError(f"connection already returned to pool ({name})")
+        return getattr(raw, name)
+
+    def close(self):
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool.release(raw)
+
+    def discard(self):
+        """Drop the underlying connection instead of reusing it (e.g. after a broken stream)."""
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool.release(raw, discard=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # safety net for code paths that forget close() on an exception
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Bounded LIFO pool.  Idle connections older than idle_timeout are closed,
+    and connections idle for longer than ping_after are health-checked (and
+    transparently replaced) before being handed out.
+    """
+
+    def __init__(self, connect, max_size=5, idle_timeout=300, ping_after=30,
+                 checkout_timeout=10, ping=None):
+        self._connect = connect
+        self._ping = ping or _default_ping
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self.checkout_timeout = checkout_timeout
+        self._idle = deque()        # (raw_conn, last_returned_at)
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {
+            "created": 0, "reused": 0, "reconnected": 0, "evicted": 0,
+            "discarded": 0, "checkouts": 0, "waits": 0, "timeouts": 0,
+        }
+
+    def checkout(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("connection pool is closed")
+                self._evict_idle_locked()
+                if self._idle:
+                    raw, last_used = self._idle.pop()
+                    break
+                if self._in_use < self.max_size:
+                    raw, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(f"no free DB connection after {self.checkout_timeout}s "
+                                      f"(max_size={self.max_size})")
+                self._stats["waits"] += 1
+                self._cond.wait(remaining)
+            self._in_use += 1
+            self._stats["checkouts"] += 1
+
+        # connect / health-check outside the lock so other threads are not blocked
+        try:
+            if raw is None:
+                raw = self._connect()
+                self._count("created")
+            elif time.monotonic() - last_used > self.ping_after and not self._ping(raw):
+                _close_quietly(raw)
+                raw = self._connect()
+                self._count("reconnected")
+            else:
+                self._count("reused")
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, raw)
+
+    def release(self, raw, discard=False):
+        if not discard:
+            try:
+                if getattr(raw, "unread_result", False):
+                    discard = True
+                elif getattr(raw, "in_transaction", False):
+                    # never leak an open transaction (or a stale snapshot) to the next user
+                    raw.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                self._stats["discarded"] += 1
+            else:
+                self._idle.append((raw, time.monotonic()))
+                raw = None
+            self._cond.notify()
+        if raw is not None:
+            _close_quietly(raw)
+
+    def stats(self):
+        with self._cond:
+            data = dict(self._stats)
+            data.update(in_use=self._in_use, idle=len(self._idle), max_size=self.max_size)
+        return data
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._cond.notify_all()
+        for raw, _ in idle:
+            _close_quietly(raw)
+
+    def _evict_idle_locked(self):
+        # oldest connections sit at the left end of the deque
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._idle and self._idle[0][1] < cutoff:
+            raw, _ = self._idle.popleft()
+            self._stats["evicted"] += 1
+            _close_quietly(raw)
+
+    def _count(self, key):
+        with self._cond:
+            self._stats[key] += 1
+
+
+def _default_ping(raw):
+    try:
+        return raw.is_connected()
+    except Exception:
+        return False
+
+
+def _close_quietly(raw):
+    try:
+        raw.close()
+    except Exception:
+        pass
+
+
+# ----------------- BACKENDS -----------------
+def _mysql_factory(db_cfg):
+    import mysql.connector
+    params = {k: db_cfg[k] for k in ("host", "port", "user", "password", "database")}
+    return lambda: mysql.connector.connect(**params)
+
+
+def _sqlite_factory(db_cfg):
+    import sqlite_backend
+    path = db_cfg.get("path") or sqlite_backend.DEFAULT_PATH
+    if path != ":memory:":
+        sqlite_backend.bootstrap(path)
+    return lambda: sqlite_backend.connect(path)
+
+
+BACKENDS = {
+    "mysql": _mysql_factory,
+    "sqlite": _sqlite_factory,
+}
+
+
+# ----------------- MODULE API -----------------
+_pool = None
+_backend = None
+_overrides = {}
+_pool_lock = threading.Lock()
+
+
+def configure(**overrides):
+    """
+    Override [database] settings in code (e.g. backend="sqlite", path="bench.db")
+    before first use.  Closes any existing pool so the next checkout reconnects.
+    """
+    _overrides.update(overrides)
+    close_pool()
+
+
+def get_pool():
+    """Return the process-wide pool, creating it from config on first use."""
+    global _pool, _backend
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                db_cfg, pool_cfg = load_config()
+                backend = db_cfg["backend"].lower()
+                if backend not in BACKENDS:
+                    raise ValueError(f"unknown database backend {backend!r}; "
+                                     f"expected one of {sorted(BACKENDS)}")
+                _backend = backend
+                _pool = ConnectionPool(BACKENDS[backend](db_cfg), **pool_cfg)
+    return _pool
+
+
+def backend_name():
+    """Name of the active backend ('mysql' or 'sqlite')."""
+    get_pool()
+    return _backend
+
+
+def get_connection():
+    """Check out a pooled connection. Call close() on it to return it."""
+    return get_pool().checkout()
+
+
+# MySQL: 1213 = deadlock, 1205 = lock wait timeout; SQLite: "database is locked"
+RETRYABLE_ERRNOS = {1213, 1205}
+
+
+def is_retryable(exc):
+    if getattr(exc, "errno", None) in RETRYABLE_ERRNOS:
+        return True
+    return isinstance(exc, sqlite3.OperationalError) and "locked" in str(exc)
+
+
+def run_transaction(work, retries=3, isolation_level="READ COMMITTED"):
+    """
+    Run work(cursor) inside one short transaction on a pooled connection and
+    commit.  Deadlocks / lock timeouts roll back and retry with jittered backoff;
+    any other exception rolls back and propagates.  Returns work's result.
+    """
+    for attempt in range(retries + 1):
+        conn = get_connection()
+        try:
+            conn.start_transaction(isolation_level=isolation_level)
+            cur = conn.cursor()
+            result = work(cur)
+            conn.commit()
+            return result
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                conn.discard()
+            if attempt < retries and is_retryable(e):
+                time.sleep(random.uniform(0.005, 0.02) * (2 ** attempt))
+                continue
+            raise
+        finally:
+            conn.close()
+
+
+def ensure_index(table, name, columns, unique=False):
+    """Create index `name` on table(columns) unless it already exists (both backends)."""
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        if backend_name() == "sqlite":
+            cur.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name=%s", (name,))
+        else:
+            cur.execute("""SELECT 1 FROM information_schema.statistics
+                           WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+                           LIMIT 1""", (table, name))
+        if cur.fetchone():
+            return False
+        cur.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({columns})")
+        conn.commit()
+        return True
+    finally:
+        conn.close()
+
+
+def pool_stats():
+    """Counters for the shared pool (created/reused/evicted/... plus in_use/idle)."""
+    return get_pool().stats() if _pool is not None else {}
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
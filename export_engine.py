@@ -0,0 +1,228 @@
+"""
+Streaming export of query results to XLSX, CSV or gzip-compressed CSV.
+
+Rows are read from an unbuffered (server-side) cursor CHUNK_ROWS at a time and
+written straight out, so memory stays flat however large the table is: XLSX
+goes through openpyxl's write-only workbook (continuing on a new sheet, with
+the header repeated, when one reaches Excel's row limit), CSV through the csv
+module.  The
+file is written next to the target as ``<name>.part`` and only renamed into
+place when the export finishes, so a cancelled or failed export never leaves
+a truncated file behind.
+
+start_export() runs an export on a window's DBExecutor and shows a small
+progress dialog with a Cancel button.
+"""
+import csv
+import gzip
+import itertools
+import os
+import time
+from datetime import date, datetime
+
+from database import get_connection
+
+CHUNK_ROWS = 2000
+XLSX_SHEET_ROWS = 1048575    # data rows per sheet: Excel's 1,048,576-row limit less the header
+
+FILETYPES = [("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("Compressed CSV", "*.csv.gz"),
+             ("All files", "*.*")]
+_dialogs = itertools.count(1)    # numbers the per-dialog DBExecutor view keys
+
+
+class ExportCancelled(Exception):
+    """The export was cancelled; no output file was written."""
+
+
+# ----------------- WRITERS -----------------
+def _text(v):
+    if v is None:
+        return ""
+    if isinstance(v, datetime):
+        return v.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(v, date):
+        return v.isoformat()
+    return v
+
+
+class _CsvWriter:
+    def __init__(self, path, compress=False):
+        if compress:
+            self._f = gzip.open(path, "wt", newline="", encoding="utf-8", compresslevel=6)
+        else:
+            self._f = open(path, "w", newline="", encoding="utf-8")
+        self._w = csv.writer(self._f)
+
+    def header(self, cols):
+        self._w.writerow(cols)
+
+    def rows(self, rows):
+        self._w.writerows([_text(v) for v in row] for row in rows)
+
+    def close(self):
+        self._f.close()
+
+
+class _XlsxWriter:
+    def __init__(self, path):
+        from openpyxl import Workbook
+        self._path = path
+        self._wb = Workbook(write_only=True)   # rows are flushed to a temp file, not kept
+        self._ws = self._wb.create_sheet()
+        self._cols = None
+        self._left = XLSX_SHEET_ROWS           # data rows the current sheet still takes
+
+    def header(self, cols):
+        self._cols = list(cols)
+        self._ws.append(self._cols)
+
+    def rows(self, rows):
+        for row in rows:
+            if not self._left:
+                self._ws = self._wb.create_sheet(f"Sheet{len(self._wb.worksheets) + 1}")
+                if self._cols is not None:
+                    self._ws.append(self._cols)
+                self._left = XLSX_SHEET_ROWS
+            self._ws.append(row)
+            self._left -= 1
+
+    def close(self):
+        self._wb.save(self._path)
+
+
+def output_format(path):
+    """'xlsx', 'csv' or 'csv.gz' from the file name (defaults to csv)."""
+    name = path.lower()
+    if name.endswith(".gz"):
+        return "csv.gz"
+    if name.endswith(".xlsx"):
+        return "xlsx"
+    return "csv"
+
+
+def _open_writer(path, fmt):
+    if fmt == "xlsx":
+        return _XlsxWriter(path)
+    return _CsvWriter(path, compress=(fmt == "csv.gz"))
+
+
+def resolve_path(path):
+    """
+    Final output path: like the old pandas exports, an .xlsx request falls
+    back to CSV (same name, .csv) when openpyxl is not installed.
+    """
+    if output_format(path) == "xlsx":
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            return os.path.splitext(path)[0] + ".csv"
+    return path
+
+
+# ----------------- ENGINE -----------------
+def export_query(sql, path, params=(), headers=None, request=None, chunk_rows=CHUNK_ROWS):
+    """
+    Stream the rows of sql into path.  headers defaults to the cursor's column
+    names.  request (a db_executor.Request) receives progress and is polled
+    for cancellation between chunks.  Returns (row_count, path, seconds).
+    """
+    path = resolve_path(path)
+    fmt = output_format(path)
+    part = path + ".part"
+    start = time.perf_counter()
+    written = 0
+    conn = get_connection()
+    writer = None
+    try:
+        cur = conn.cursor(buffered=False)
+        cur.execute(sql, params)
+        writer = _open_writer(part, fmt)
+        writer.header(headers or [d[0] for d in cur.description])
+        while True:
+            if request is not None and request.cancelled:
+                raise ExportCancelled()
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                break
+            writer.rows(rows)
+            written += len(rows)
+            if request is not None:
+                request.progress(f"Exported {written:,} rows...")
+        writer.close()
+        writer = None
+        os.replace(part, path)
+    except BaseException:
+        # an unfinished unbuffered result cannot go back to the pool
+        conn.discard()
+        if writer is not None:
+            try:
+                writer.close()
+            except Exception:
+                pass
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    else:
+        conn.close()
+    return written, path, time.perf_counter() - start
+
+
+# ----------------- UI -----------------
+def start_export(parent, db, sql, path, params=(), headers=None, title="Export", view="export"):
+    """
+    Run export_query on db (a DBExecutor) with a progress dialog that can
+    cancel it.  Shows a message box when the export finishes or fails.
+    Each dialog runs under its own view key (view#n), so starting another
+    export never supersedes one that is still running.
+    """
+    import tkinter as tk
+    from tkinter import ttk, messagebox
+
+    view = f"{view}#{next(_dialogs)}"
+
+    dlg = tk.Toplevel(parent)
+    dlg.title(title)
+    dlg.resizable(False, False)
+    dlg.transient(parent)
+    text = tk.StringVar(value="Starting export...")
+    ttk.Label(dlg, textvariable=text, width=40).pack(padx=16, pady=(14, 8))
+    progress = {"text": None}
+
+    def poll():
+        if dlg.winfo_exists():
+            if progress["text"]:
+                text.set(progress["text"])
+            dlg.after(200, poll)
+
+    def close():
+        if dlg.winfo_exists():
+            dlg.destroy()
+
+    def cancel():
+        db.cancel(view)
+        close()
+        messagebox.showinfo(title, "Export cancelled.", parent=parent)
+
+    ttk.Button(dlg, text="Cancel", command=cancel).pack(pady=(0, 14))
+    dlg.protocol("WM_DELETE_WINDOW", cancel)
+
+    def work(req):
+        report = req.progress
+
+        def progress_hook(msg):
+            progress["text"] = msg
+            report(msg)
+        req.progress = progress_hook
+        return export_query(sql, path, params, headers, request=req)
+
+    def done(result):
+        count, out, secs = result
+        close()
+        messagebox.showinfo(title, f"Exported {count:,} rows in {secs:.1f}s to:\n{out}", parent=parent)
+
+    def failed(e):
+        close()
+        messagebox.showerror(title, f"Export failed:\n{e}", parent=parent)
+
+    db.submit(view, work, done, failed, label="Exporting...")
+    poll()
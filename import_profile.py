@@ -0,0 +1,118 @@
+"""
+Import-time profile of the launcher and the four module windows.
+
+Each module is imported in a fresh interpreter with ``python -X importtime``,
+so the numbers are what a cold start pays.  The report gives the module's
+total import time and, per dependency (top-level package: tkinter, PIL,
+fpdf, fontTools, database, ...), the time spent importing that package's own
+code and which repo module pulled it in.
+
+Heavy packages that are only needed for exports and bills (HEAVY) must not
+appear here at all: the modules import them inside the functions that use
+them.
+
+    python import_profile.py                          # every module
+    python import_profile.py Sales_ui_4 --top 15 --runs 5
+"""
+import os
+import subprocess
+import sys
+
+from module_host import MODULES
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PROFILED = ("Main",) + tuple(name for name, _ in MODULES.values())
+HEAVY = ("pandas", "numpy", "fpdf", "fontTools", "openpyxl", "pypdf")
+STDLIB = getattr(sys, "stdlib_module_names", ())
+
+
+def _is_repo_module(name):
+    return "." not in name and os.path.exists(os.path.join(ROOT, name + ".py"))
+
+
+def _parse(stderr, module):
+    """
+    (total_ms, deps) from -X importtime output for ``import module``;
+    deps maps top-level package -> [self_ms, set of repo modules that imported it].
+    """
+    pending = []            # (level, name, self_us, [via]) awaiting their parent
+    total = 0.0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative, text = line.split(":", 1)[1].split("|")
+        text = text.rstrip()
+        level = (len(text) - len(text.lstrip()) - 1) // 2     # one space after "|", two per nesting level
+        name = text.strip()
+        entry = (level, name, int(self_us), [None])
+        children = []
+        while pending and pending[-1][0] > level:
+            children.append(pending.pop())
+        if _is_repo_module(name):
+            for child in children:
+                if child[3][0] is None:
+                    child[3][0] = name
+        if level == 0 and name == module:
+            total = int(cumulative) / 1000
+            deps = {}
+            for lvl, dep, us, via in children + [entry]:
+                package = dep.split(".")[0]
+                slot = deps.setdefault(package, [0.0, set()])
+                slot[0] += us / 1000
+                if via[0] is not None:
+                    slot[1].add(via[0])
+            return total, deps
+        pending.extend(reversed(children))
+        pending.append(entry)
+    return total, {}
+
+
+def profile(module, runs=1):
+    """Import module in runs fresh interpreters; (total_ms, deps) of the median run."""
+    samples = []
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                              capture_output=True, text=True)
+        if proc.returncode:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+        samples.append(_parse(proc.stderr, module))
+    samples.sort(key=lambda s: s[0])
+    return samples[len(samples) // 2]
+
+
+def heavy_imports(deps):
+    """The HEAVY packages a module pulls in at import time."""
+    return [package for package in HEAVY if package in deps]
+
+
+def report(modules=PROFILED, runs=1, top=8):
+    for module in modules:
+        total, deps = profile(module, runs)
+        print(f"{module}: {total:,.1f} ms cold import")
+        ranked = sorted(deps.items(), key=lambda item: -item[1][0])
+        for package, (ms, via) in ranked[:top]:
+            if package == module:
+                kind = "own code"
+            elif _is_repo_module(package):
+                kind = "repo"
+            else:
+                kind = "stdlib" if package in STDLIB else "third-party"
+            imported_by = f"  via {', '.join(sorted(via))}" if via and package != module else ""
+            print(f"  {package:<22} {ms:8,.1f} ms  {kind:<11}{imported_by}")
+        rest = sum(ms for _, (ms, _) in ranked[top:])
+        if rest:
+            print(f"  {f'({len(ranked) - top} more)':<22} {rest:8,.1f} ms")
+        heavy = heavy_imports(deps)
+        if heavy:
+            print(f"  ! imported at startup, should be deferred to first use: {', '.join(heavy)}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Per-module, per-dependency import times (fresh interpreter each).")
+    ap.add_argument("modules", nargs="*", default=PROFILED, help=f"default: {' '.join(PROFILED)}")
+    ap.add_argument("--runs", type=int, default=1, help="report the median of this many imports")
+    ap.add_argument("--top", type=int, default=8, help="dependencies listed per module")
+    args = ap.parse_args()
+    report(args.modules, args.runs, args.top)
@@ -0,0 +1,372 @@
+"""
+Streaming import of vendor delivery manifests (CSV, gzip CSV or XLSX) into
+one goods receipt.
+
+The file is read CHUNK_ROWS lines at a time (csv module, or openpyxl's
+read-only workbook for .xlsx) and never held in memory as a whole.  Each
+chunk is validated column by column -- quantities, costs and dates are parsed
+through small memo tables, since a manifest repeats the same few dates
+thousands of times -- and its drug codes are resolved against ``drugs`` with
+one IN query for the codes not seen yet.  Valid lines go through
+receiving.receive_lines, i.e. a fixed handful of batched statements per
+chunk; invalid ones are streamed to a rejected-rows CSV with the line number
+and the reason.
+
+Every chunk is received in its own short transaction under the one goods
+receipt, so stock_on_hand and drug_batch rows are only locked for a chunk's
+worth of statements, a deadlock retries just that chunk, and DeltaView picks
+the new batches up as they commit.  When an import stops part-way (cancelled
+or failed) the lines already committed stay received: ImportStopped carries
+the receipt and the last line received, and passing those back as note_id /
+after_line continues the file from there into the same receipt.  A dry run does all of the reading, validation and code
+lookups and reports how many batches would be created or topped up, but
+writes nothing to the database; it runs on a plain read connection and locks
+no rows, so counters keep selling while a large file is checked.
+
+Recognised columns (header names are case-insensitive): code or drug_id,
+batch_no, quantity, and optionally unit_cost, manufacture_date, expiry_date.
+"""
+import csv
+import gzip
+import os
+import time
+from collections import namedtuple
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+import stock_on_hand
+from database import get_connection, run_transaction
+from receiving import LOOKUP_CHUNK, _existing_batches, ensure_indexes, receive_lines
+
+CHUNK_ROWS = 2000
+DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%Y/%m/%d")
+
+FILETYPES = [("Manifests", "*.csv *.xlsx *.csv.gz"), ("CSV files", "*.csv"), ("Excel files", "*.xlsx"),
+             ("All files", "*.*")]
+
+# field -> accepted header names
+COLUMNS = {
+    "code": ("code", "drug_code", "sku", "barcode"),
+    "drug_id": ("drug_id",),
+    "batch_no": ("batch_no", "batch", "lot", "lot_no"),
+    "quantity": ("quantity", "qty"),
+    "unit_cost": ("unit_cost", "cost", "price"),
+    "manufacture_date": ("manufacture_date", "mfg", "mfg_date"),
+    "expiry_date": ("expiry_date", "exp", "expiry", "exp_date"),
+}
+
+ImportResult = namedtuple("ImportResult", "note_id accepted rejected created updated secs rejected_path dry_run")
+
+
+class ManifestError(ValueError):
+    """The file cannot be imported at all (unknown format, missing columns)."""
+
+
+class ImportStopped(Exception):
+    """
+    The import ended early.  Lines up to ``line`` are received under GRN
+    ``note_id`` (None: nothing was); everything after it was not.
+    """
+
+    def __init__(self, message, note_id=None, line=0):
+        super().__init__(message)
+        self.note_id = note_id
+        self.line = line
+
+
+class ImportCancelled(ImportStopped):
+    """The import was cancelled between two chunks."""
+
+
+# ----------------- READING -----------------
+def _read_csv(path):
+    opener = gzip.open if path.lower().endswith(".gz") else open
+    with opener(path, "rt", newline="", encoding="utf-8-sig") as f:
+        yield from csv.reader(f)
+
+
+def _read_xlsx(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ManifestError("Reading .xlsx manifests needs openpyxl; save the manifest as CSV instead.")
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in wb.active.iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        wb.close()
+
+
+def read_rows(path):
+    """Header row, then data rows, lazily."""
+    name = path.lower()
+    if name.endswith(".xlsx"):
+        return _read_xlsx(path)
+    if name.endswith((".csv", ".csv.gz", ".txt")):
+        return _read_csv(path)
+    raise ManifestError(f"Unsupported manifest type: {os.path.basename(path)}")
+
+
+def column_map(header):
+    """{field: column index} for the fields present in header."""
+    names = [str(h or "").strip().lower().replace(" ", "_") for h in header]
+    found = {}
+    for field, aliases in COLUMNS.items():
+        for alias in aliases:
+            if alias in names:
+                found[field] = names.index(alias)
+                break
+    missing = [f for f in ("batch_no", "quantity") if f not in found]
+    if "code" not in found and "drug_id" not in found:
+        missing.insert(0, "code")
+    if missing:
+        raise ManifestError(f"Manifest is missing column(s): {', '.join(missing)}")
+    return found
+
+
+# ----------------- VALIDATION -----------------
+def _blank(v):
+    return v is None or (isinstance(v, str) and not v.strip())
+
+
+def _text(v):
+    """Cell as a stripped string (Excel turns numeric codes into floats)."""
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    return str(v).strip()
+
+
+def _parse_qty(v):
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    qty = int(v) if isinstance(v, int) else int(str(v).strip())
+    if qty <= 0:
+        raise ValueError
+    return qty
+
+
+def _parse_cost(v):
+    cost = Decimal(str(v).strip())
+    if cost < 0 or not cost.is_finite():
+        raise ValueError
+    return cost
+
+
+def _parse_date(v):
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    text = str(v).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError
+
+
+def _column(rows, idx, parse, memo, required, errors, label):
+    """Parse one column of a chunk; failures are recorded in errors (row position -> reason)."""
+    out = []
+    for pos, row in enumerate(rows):
+        v = row[idx] if idx is not None and idx < len(row) else None
+        if _blank(v):
+            if required:
+                errors.setdefault(pos, f"{label} missing")
+            out.append(None)
+            continue
+        key = v if isinstance(v, (str, int, float)) else None
+        if key is not None and key in memo:
+            parsed = memo[key]
+        else:
+            try:
+                parsed = parse(v)
+            except (ValueError, TypeError, InvalidOperation):
+                parsed = ValueError
+            if key is not None and len(memo) < 10000:
+                memo[key] = parsed
+        if parsed is ValueError:
+            errors.setdefault(pos, f"bad {label}: {v}")
+            out.append(None)
+        else:
+            out.append(parsed)
+    return out
+
+
+def _resolve(cur, field, values, known):
+    """Fill known[value] with the drug id (or None) for values not looked up yet: one IN query per 500."""
+    if field == "code":
+        todo = list({v for v in values if v is not None and v.upper() not in known})
+        col = "code"
+    else:
+        todo = list({v for v in values if v is not None and v not in known})
+        col = "id"
+    for i in range(0, len(todo), LOOKUP_CHUNK):
+        chunk = todo[i:i + LOOKUP_CHUNK]
+        cur.execute(f"SELECT id, {col} FROM drugs WHERE {col} IN ({','.join(['%s'] * len(chunk))})", chunk)
+        found = {(str(v).upper() if field == "code" else v): drug_id for drug_id, v in cur.fetchall()}
+        for v in chunk:
+            key = v.upper() if field == "code" else v
+            known[key] = found.get(key)
+
+
+class _Validator:
+    """Validates chunks of one manifest; memo tables persist across chunks."""
+
+    def __init__(self, header, today=None):
+        self.cols = column_map(header)
+        self.field = "code" if "code" in self.cols else "drug_id"
+        self.today = today or date.today()
+        self.known = {}
+        self._memo = {"quantity": {}, "unit_cost": {}, "date": {}, "drug_id": {}}
+
+    def chunk(self, cur, rows):
+        """(lines, rejects): lines are receiving tuples, rejects are (position, reason)."""
+        cols, errors = self.cols, {}
+        if self.field == "code":
+            drugs = [None if _blank(v) else _text(v)
+                     for v in (row[cols["code"]] if cols["code"] < len(row) else None for row in rows)]
+            for pos, v in enumerate(drugs):
+                if v is None:
+                    errors[pos] = "code missing"
+        else:
+            drugs = _column(rows, cols["drug_id"], _parse_qty, self._memo["drug_id"], True, errors, "drug_id")
+        batches = [None if _blank(v) else _text(v)
+                   for v in (row[cols["batch_no"]] if cols["batch_no"] < len(row) else None for row in rows)]
+        qtys = _column(rows, cols["quantity"], _parse_qty, self._memo["quantity"], True, errors, "quantity")
+        costs = _column(rows, cols.get("unit_cost"), _parse_cost, self._memo["unit_cost"], False, errors,
+                        "unit_cost")
+        mfgs = _column(rows, cols.get("manufacture_date"), _parse_date, self._memo["date"], False, errors,
+                       "manufacture_date")
+        exps = _column(rows, cols.get("expiry_date"), _parse_date, self._memo["date"], False, errors, "expiry_date")
+
+        _resolve(cur, self.field, [d for pos, d in enumerate(drugs) if pos not in errors], self.known)
+
+        lines, rejects = [], []
+        for pos in range(len(rows)):
+            reason = errors.get(pos)
+            if reason is None:
+                drug_id = self.known.get(drugs[pos].upper() if self.field == "code" else drugs[pos])
+                if drug_id is None:
+                    reason = f"unknown drug {drugs[pos]}"
+                elif not batches[pos]:
+                    reason = "batch_no missing"
+                elif len(batches[pos]) > 128:
+                    reason = "batch_no longer than 128 characters"
+                elif exps[pos] is not None and exps[pos] < self.today:
+                    reason = f"already expired ({exps[pos]})"
+                elif mfgs[pos] and exps[pos] and mfgs[pos] > exps[pos]:
+                    reason = "manufacture_date after expiry_date"
+            if reason is None:
+                lines.append((drug_id, batches[pos], qtys[pos], costs[pos], mfgs[pos], exps[pos]))
+            else:
+                rejects.append((pos, reason))
+        return lines, rejects
+
+
+# ----------------- IMPORT -----------------
+def default_rejected_path(path):
+    base = path[:-3] if path.lower().endswith(".gz") else path
+    return os.path.splitext(base)[0] + ".rejected.csv"
+
+
+def import_manifest(path, location_id, dry_run=False, received_by=None, remarks=None, rejected_path=None,
+                    request=None, chunk_rows=CHUNK_ROWS, today=None, note_id=None, after_line=0):
+    """
+    Receive the manifest at path into location_id as one goods receipt (or
+    just check it when dry_run).  Rejected lines are written to
+    rejected_path (default: <manifest>.rejected.csv; removed when nothing
+    is rejected).  request is an optional db_executor request for
+    progress/cancel/stop.  To continue an import that stopped, pass its
+    ImportStopped note_id and line as note_id / after_line: the whole file is
+    validated again but only lines after after_line are received.  Returns
+    an ImportResult; created/updated count this run's writes only.
+    """
+    rejected_path = rejected_path or default_rejected_path(path)
+    tmp = rejected_path + ".part"
+    stock_on_hand.ensure_table()
+    ensure_indexes()
+    start = time.perf_counter()
+
+    def receive_chunk(cur, note_id, lines):
+        if note_id is None:
+            cur.execute("""INSERT INTO receive_notes (received_by, location_id, received_at, remarks)
+                           VALUES (%s,%s,%s,%s)""",
+                        (received_by, location_id, datetime.now(), remarks or f"Manifest {os.path.basename(path)}"))
+            note_id = cur.lastrowid
+        return (note_id,) + receive_lines(cur, note_id, location_id, lines)
+
+    received = after_line      # last line number committed, reported when the import stops early
+
+    def work(cur):
+        nonlocal note_id, received
+        rows = read_rows(path)
+        header = next(rows, None)
+        if header is None:
+            raise ManifestError("Manifest is empty")
+        validator = _Validator(header, today)
+        counts = {"accepted": 0, "rejected": 0, "created": 0, "updated": 0}
+        seen, line_no = set(), 1     # seen: batch keys a dry run has counted
+        with open(tmp, "w", newline="", encoding="utf-8") as rej:
+            out = csv.writer(rej)
+            out.writerow(["line", "reason"] + [str(h or "") for h in header])
+            while True:
+                if request is not None and (request.cancelled or request.stopping):
+                    raise ImportCancelled("Manifest import cancelled", note_id, received)
+                raw = list(islice(rows, chunk_rows))
+                if not raw:
+                    break
+                numbers = [line_no + 1 + i for i, row in enumerate(raw) if any(not _blank(v) for v in row)]
+                chunk = [raw[n - line_no - 1] for n in numbers]
+                line_no += len(raw)
+                if not chunk:
+                    received = max(received, line_no)
+                    continue
+                lines, rejects = validator.chunk(cur, chunk)
+                out.writerows([numbers[pos], reason] + ["" if v is None else v for v in chunk[pos]]
+                              for pos, reason in rejects)
+                counts["accepted"] += len(lines)
+                counts["rejected"] += len(rejects)
+                if lines and dry_run:
+                    keys = list({(l[0], l[1]) for l in lines} - seen)
+                    existing = _existing_batches(cur, location_id, keys, lock=False)
+                    seen.update(keys)
+                    for key in keys:
+                        counts["updated" if key in existing else "created"] += 1
+                elif not dry_run:
+                    rejected = {pos for pos, _ in rejects}
+                    accepted = [n for pos, n in enumerate(numbers) if pos not in rejected]
+                    todo = [line for line, n in zip(lines, accepted) if n > after_line]
+                    if todo:
+                        note_id, created, updated = run_transaction(lambda wcur: receive_chunk(wcur, note_id, todo))
+                        counts["created"] += created
+                        counts["updated"] += updated
+                    received = max(received, line_no)
+                if request is not None:
+                    request.progress(f"{'Checking' if dry_run else 'Importing'} manifest: "
+                                     f"{counts['accepted']:,} ok, {counts['rejected']:,} rejected")
+        return counts
+
+    # validation and dry-run lookups read on a plain connection (no locks);
+    # each chunk's writes run in their own transaction on another
+    conn = get_connection()
+    try:
+        counts = work(conn.cursor())
+    except BaseException as e:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        if note_id is None or dry_run or isinstance(e, ImportStopped) or not isinstance(e, Exception):
+            raise
+        raise ImportStopped(f"Manifest import stopped after line {received:,}: {e}", note_id, received) from e
+    finally:
+        conn.close()
+    if counts["rejected"]:
+        os.replace(tmp, rejected_path)
+    else:
+        os.remove(tmp)
+        rejected_path = None
+    return ImportResult(note_id, counts["accepted"], counts["rejected"], counts["created"], counts["updated"],
+                        time.perf_counter() - start, rejected_path, dry_run)
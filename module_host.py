@@ -0,0 +1,89 @@
+"""
+Runs the four module windows inside the launcher's process.
+
+Each module opens as a Toplevel of the launcher instead of a new Python
+interpreter, so opening one costs building its widgets, not a fresh import
+of PIL / fpdf / the database driver plus a new connection pool.  Every
+window shares the process-wide pieces: the connection pool (database.py),
+the image cache (asset_cache) and whatever the modules cache at module
+level.  Opening a module that is already open brings its window to the
+front instead of making a second one.
+
+preload() imports the modules on a background thread once the launcher is
+up, so even the first click only builds widgets.
+"""
+import importlib
+import threading
+import time
+
+import tkinter as tk
+
+
+def _open_inventory(module, root):
+    win = tk.Toplevel(root)
+    win.app = module.DrugInventoryApp(win)
+    return win
+
+
+def _open_sales(module, root):
+    return module.open_patient_sales_window(root, close_root=False)
+
+
+def _open_stock(module, root):
+    win = tk.Toplevel(root)
+    win.app = module.StockInwardApp(win)
+    return win
+
+
+def _open_patients(module, root):
+    win = tk.Toplevel(root)
+    win.app = module.PatientModule(win)
+    return win
+
+
+# launcher tile title -> (module, opener(module, root) returning the module's Toplevel)
+MODULES = {
+    "Drug Inventory": ("Drug_Inventory_UI_4", _open_inventory),
+    "Sales UI": ("Sales_ui_4", _open_sales),
+    "Stock UI": ("Stock_ui_2", _open_stock),
+    "Patient Data": ("PAtient_Data_2", _open_patients),
+}
+
+
+class ModuleHost:
+    def __init__(self, root, modules=None):
+        self.root = root
+        self.modules = modules or MODULES
+        self.windows = {}           # title -> open Toplevel
+
+    def hosts(self, title):
+        return title in self.modules
+
+    def open(self, title):
+        """
+        Show the module's window, creating it on first use.  Returns
+        (window, elapsed_ms, created); import or construction errors propagate.
+        """
+        start = time.perf_counter()
+        win = self.windows.get(title)
+        if win is not None and win.winfo_exists():
+            win.deiconify()
+            win.lift()
+            win.focus_force()
+            return win, (time.perf_counter() - start) * 1000, False
+        name, opener = self.modules[title]
+        win = opener(importlib.import_module(name), self.root)
+        self.windows[title] = win
+        win.bind("<Destroy>", lambda e: self.windows.pop(title, None) if e.widget is win else None, add="+")
+        win.lift()
+        return win, (time.perf_counter() - start) * 1000, True
+
+    def preload(self):
+        """Import every module on a background thread (no Tk calls happen at import time)."""
+        def work():
+            for name, _ in self.modules.values():
+                try:
+                    importlib.import_module(name)
+                except Exception:
+                    pass    # reported properly when the tile is clicked
+        threading.Thread(target=work, name="module-preload", daemon=True).start()
@@ -0,0 +1,144 @@
+"""
+Goods receipt (GRN) engine used by the Stock Inward window.
+
+A receipt is one transaction with a fixed number of statements however many
+lines it has: insert the receive_notes row, ``executemany`` the
+receive_items, then one ``executemany`` upsert of the batches keyed on the
+unique (drug, location, batch_no) index -- a new batch is inserted, an
+existing one topped up, and two receipts of the same new batch at once
+cannot both insert it.  stock_on_hand goes up in the same transaction, for
+the batches that are available once written.  Deadlocks and lock timeouts
+are retried by database.run_transaction.
+"""
+import threading
+import time
+from datetime import datetime
+
+import stock_on_hand
+from database import backend_name, ensure_index, run_transaction
+
+# one batch per (drug_id, location_id, batch_no): the key receipts upsert on.
+# Creating it fails while a database still holds duplicate batches; merge those first.
+BATCH_KEY_INDEX = ("drug_batch", "uq_batch_receive_key", "drug_id, location_id, batch_no")
+LOOKUP_CHUNK = 500
+
+_UPSERT_BATCH = {
+    "mysql": """INSERT INTO drug_batch (drug_id, location_id, batch_no, quantity, unit_cost,
+                                        manufacture_date, expiry_date, status)
+                VALUES (%s,%s,%s,%s,%s,%s,%s,'available')
+                ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)""",
+    "sqlite": """INSERT INTO drug_batch (drug_id, location_id, batch_no, quantity, unit_cost,
+                                         manufacture_date, expiry_date, status)
+                 VALUES (%s,%s,%s,%s,%s,%s,%s,'available')
+                 ON CONFLICT (drug_id, location_id, batch_no) DO UPDATE SET quantity = quantity + excluded.quantity""",
+}
+
+_ready = False
+_ready_lock = threading.Lock()
+
+
+def ensure_indexes():
+    """Create the unique batch key (the upsert needs it).  Cheap after the first call; never inside a transaction."""
+    global _ready
+    if _ready:
+        return
+    with _ready_lock:
+        if not _ready:
+            ensure_index(*BATCH_KEY_INDEX, unique=True)
+            _ready = True
+
+
+def parse_date(text):
+    """'YYYY-MM-DD' -> date, None for blank input (raises ValueError otherwise)."""
+    text = (text or "").strip()
+    return datetime.strptime(text, "%Y-%m-%d").date() if text else None
+
+
+def _existing_batches(cur, location_id, keys, lock=True):
+    """
+    {(drug_id, batch_no): (batch_id, status)} for keys that already have a
+    batch at location_id (rows locked unless lock is False).
+    """
+    found = {}
+    for i in range(0, len(keys), LOOKUP_CHUNK):
+        chunk = keys[i:i + LOOKUP_CHUNK]
+        pairs = " OR ".join(["(drug_id = %s AND batch_no = %s)"] * len(chunk))
+        cur.execute(f"SELECT id, drug_id, batch_no, status FROM drug_batch WHERE location_id = %s AND ({pairs}) "
+                    f"ORDER BY id{' FOR UPDATE' if lock else ''}",
+                    [location_id] + [v for key in chunk for v in key])
+        for batch_id, drug_id, batch_no, status in cur.fetchall():
+            found.setdefault((drug_id, batch_no), (batch_id, status))
+    return found
+
+
+def receive_lines(cur, note_id, location_id, lines):
+    """
+    Insert the items of note_id and top up / create their batches, inside
+    the caller's transaction.  lines are (drug_id, batch_no, quantity,
+    unit_cost, manufacture_date, expiry_date).  Returns (created, updated).
+    """
+    cur.executemany(
+        """INSERT INTO receive_items (receive_note_id, drug_id, batch_no, quantity, unit_cost,
+                                      manufacture_date, expiry_date)
+           VALUES (%s,%s,%s,%s,%s,%s,%s)""",
+        [(note_id,) + tuple(line) for line in lines])
+
+    # several lines of the same batch collapse into one increment, in key order so
+    # concurrent receipts lock the batch index in the same order
+    totals, first = {}, {}
+    for line in lines:
+        key = (line[0], line[1])
+        totals[key] = totals.get(key, 0) + line[2]
+        first.setdefault(key, line)
+    keys = sorted(totals)
+    backend = backend_name()
+    if backend == "sqlite":
+        # writers are serialised (BEGIN IMMEDIATE): what exists now is what the upsert finds
+        before = _existing_batches(cur, location_id, keys, lock=False)
+    rows = [(drug_id, location_id, batch_no, totals[(drug_id, batch_no)]) + tuple(first[(drug_id, batch_no)][3:])
+            for drug_id, batch_no in keys]
+    cur.executemany(_UPSERT_BATCH[backend], rows)
+    if backend == "sqlite":
+        updated = len(before)
+    else:
+        updated = cur.rowcount - len(rows)     # MySQL counts 1 affected row per insert, 2 per update
+
+    # the rows as written (and now locked by this transaction): a top-up of a
+    # quarantined / expired batch is not available stock
+    written = _existing_batches(cur, location_id, keys, lock=False)
+    deltas = {}
+    for key, qty in totals.items():
+        if written[key][1] == "available":
+            deltas[(key[0], location_id)] = deltas.get((key[0], location_id), 0) + qty
+    stock_on_hand.apply(cur, deltas)
+    return len(rows) - updated, updated
+
+
+def receive_goods(location_id, lines, received_by=None, remarks=None, shipment_id=None):
+    """
+    Record one delivery of lines (drug_id, batch_no, quantity, unit_cost,
+    manufacture_date, expiry_date) at location_id.  All or nothing.
+    Returns (note_id, elapsed_ms, created_batches, updated_batches).
+    """
+    if not lines:
+        raise ValueError("Receipt has no lines")
+    for line in lines:
+        if not line[1]:
+            raise ValueError("Every line needs a batch number")
+        if line[2] <= 0:
+            raise ValueError("Quantity must be positive")
+
+    stock_on_hand.ensure_table()
+    ensure_indexes()
+
+    def work(cur):
+        cur.execute("""INSERT INTO receive_notes (shipment_id, received_by, location_id, received_at, remarks)
+                       VALUES (%s,%s,%s,%s,%s)""",
+                    (shipment_id, received_by, location_id, datetime.now(), remarks))
+        note_id = cur.lastrowid
+        created, updated = receive_lines(cur, note_id, location_id, lines)
+        return note_id, created, updated
+
+    start = time.perf_counter()
+    note_id, created, updated = run_transaction(work)
+    return note_id, (time.perf_counter() - start) * 1000, created, updated
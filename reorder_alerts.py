@@ -0,0 +1,189 @@
+"""
+Reorder-level alerts: drug/location pairs whose on-hand stock has fallen
+below drugs.reorder_level.
+
+Nothing here rescans the catalogue after the first load.  Available stock
+lives in stock_on_hand (one row per drug and location, maintained by every
+stock transaction), so
+
+* check() re-evaluates just the drugs a sale touched -- a primary-key read
+  per drug, a few milliseconds whatever the catalogue size -- and
+* ReorderAlerts keeps the "Below reorder level" list current by re-reading
+  only the stock_on_hand rows whose last_updated moved since its last poll
+  (sales, receipts and sweeps from every counter).  As in DeltaView, the
+  mark never moves past delta_refresh.version_horizon(), so a transaction
+  that commits after a poll is still picked up by the next one.
+
+The poll watches stock_on_hand only.  A change to drugs.reorder_level (which
+has no last_updated column) shows up when that drug's stock next moves, or
+after a full reload (ReorderAlerts.reset(), the Refresh button); a drug with
+no stock_on_hand row at all -- never stocked anywhere -- is not listed.
+
+draft_purchase_orders() turns alert rows into one CREATED purchase order per
+location, skipping drugs that already have an open order there.
+"""
+import time
+from datetime import datetime
+
+import stock_on_hand
+from database import ensure_index, get_connection, run_transaction
+from delta_refresh import version_horizon
+
+SOH_VERSION_INDEX = ("stock_on_hand", "idx_soh_last_updated", "last_updated")
+POLL_MS = 5000
+ORDER_UP_TO = 2     # drafts order enough to bring stock to twice the reorder level
+OPEN_PO_STATUSES = ("CREATED", "APPROVED", "SENT", "PARTIAL_RECEIVED")
+
+_SELECT = """
+    SELECT s.drug_id, s.location_id, d.name, l.name, s.quantity, d.reorder_level, s.last_updated
+    FROM stock_on_hand s JOIN drugs d ON d.id = s.drug_id LEFT JOIN locations l ON l.id = s.location_id
+"""
+
+
+def ensure_indexes():
+    stock_on_hand.ensure_table()
+    ensure_index(*SOH_VERSION_INDEX)
+
+
+def is_below(quantity, reorder_level):
+    return bool(reorder_level) and quantity < reorder_level
+
+
+def _alert(row):
+    """(drug_id, location_id, drug, location, on_hand, reorder_level, shortfall)"""
+    drug_id, location_id, drug, location, qty, level = row[:6]
+    return drug_id, location_id, drug, location, qty, level, level - qty
+
+
+def _fetch(cur, where, params):
+    cur.execute(f"{_SELECT} WHERE {where}", params)
+    return cur.fetchall()
+
+
+def _by_drugs(cur, drug_ids, location_id=None):
+    drug_ids = list(dict.fromkeys(drug_ids))
+    rows = []
+    for i in range(0, len(drug_ids), 500):
+        chunk = drug_ids[i:i + 500]
+        where = f"s.drug_id IN ({','.join(['%s'] * len(chunk))})"
+        if location_id is not None:
+            where += " AND s.location_id = %s"
+            chunk = chunk + [location_id]
+        rows += _fetch(cur, where, chunk)
+    return rows
+
+
+def check(drug_ids, location_id=None):
+    """
+    Alerts for just these drugs (at location_id, or everywhere) -- run after
+    a sale.  Returns (alert rows, elapsed_ms).
+    """
+    start = time.perf_counter()
+    conn = get_connection()
+    try:
+        rows = _by_drugs(conn.cursor(), drug_ids, location_id)
+    finally:
+        conn.close()
+    alerts = [_alert(r) for r in rows if is_below(r[4], r[5])]
+    return alerts, (time.perf_counter() - start) * 1000
+
+
+class ReorderAlerts:
+    """The current below-reorder-level pairs, refreshed from stock_on_hand changes."""
+
+    def __init__(self):
+        self.below = {}         # (drug_id, location_id) -> alert row
+        self.loaded = False
+        self.mark = None        # newest stock_on_hand.last_updated seen
+
+    def reset(self):
+        """Make the next fetch a full evaluation (picks up reorder_level changes)."""
+        self.loaded = False
+
+    def fetcher(self):
+        """Worker function: a full evaluation the first time, afterwards only what changed."""
+        loaded, mark = self.loaded, self.mark
+        return lambda _req=None: self.fetch(loaded, mark)
+
+    @staticmethod
+    def fetch(loaded, mark):
+        start = time.perf_counter()
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            horizon = version_horizon(cur)
+            if not loaded or mark is None:
+                # read the mark first so a change made during the load is picked up next time
+                cur.execute("SELECT last_updated FROM stock_on_hand ORDER BY last_updated DESC LIMIT 1")
+                newest = cur.fetchone()
+                mark = min(newest[0], horizon) if newest and newest[0] is not None else None
+                rows = _fetch(cur, "d.reorder_level > 0 AND s.quantity < d.reorder_level", ())
+                kind = "full"
+            else:
+                # last_updated has 1 s resolution and a row can change twice within the
+                # mark's second, so that second is always re-read; apply() drops alerts
+                # that did not change
+                rows = _fetch(cur, "s.last_updated >= %s", (mark,))
+                newest = max((r[6] for r in rows if r[6] is not None), default=None)
+                if newest is not None:
+                    mark = max(mark, min(newest, horizon))
+                kind = "delta"
+        finally:
+            conn.close()
+        return kind, rows, mark, (time.perf_counter() - start) * 1000
+
+    def apply(self, result):
+        """Apply a fetcher() result on the Tk thread.  Returns (changed alerts, cleared pairs, ms)."""
+        kind, rows, mark, ms = result
+        if kind == "full":
+            self.below.clear()
+        changed, cleared = [], []
+        for row in rows:
+            key = (row[0], row[1])
+            if is_below(row[4], row[5]):
+                alert = _alert(row)
+                if self.below.get(key) != alert:
+                    self.below[key] = alert
+                    changed.append(alert)
+            elif self.below.pop(key, None) is not None:
+                cleared.append(key)
+        self.loaded, self.mark = True, mark
+        return changed, cleared, ms
+
+
+# ----------------- PURCHASE ORDER DRAFTS -----------------
+def draft_purchase_orders(alerts, created_by=None):
+    """
+    One CREATED purchase order per location for these alert rows, ordering up
+    to ORDER_UP_TO x reorder level.  Drugs already on an open order for that
+    location are skipped.  Returns ([(po_id, po_number, location_id, items)], skipped).
+    """
+    by_location = {}
+    for alert in alerts:
+        by_location.setdefault(alert[1], {})[alert[0]] = alert
+
+    def work(cur):
+        drafted, skipped = [], 0
+        for location_id, wanted in sorted(by_location.items(), key=lambda kv: (kv[0] is None, kv[0] or 0)):
+            marks = ",".join(["%s"] * len(wanted))
+            cur.execute(f"""SELECT DISTINCT i.drug_id FROM po_items i JOIN purchase_orders p ON p.id = i.po_id
+                            WHERE p.location_id = %s AND p.status IN ({','.join(['%s'] * len(OPEN_PO_STATUSES))})
+                              AND i.drug_id IN ({marks})""",
+                        [location_id, *OPEN_PO_STATUSES, *wanted])
+            on_order = {r[0] for r in cur.fetchall()}
+            skipped += len(on_order)
+            items = [(drug_id, a[5] * ORDER_UP_TO - a[4]) for drug_id, a in sorted(wanted.items())
+                     if drug_id not in on_order]
+            if not items:
+                continue
+            cur.execute("""INSERT INTO purchase_orders (created_by, location_id, status, total_amount, created_at)
+                           VALUES (%s,%s,'CREATED',0,%s)""", (created_by, location_id, datetime.now()))
+            po_id = cur.lastrowid
+            po_number = f"AUTO-{po_id:06d}"
+            cur.execute("UPDATE purchase_orders SET po_number = %s WHERE id = %s", (po_number, po_id))
+            cur.executemany("INSERT INTO po_items (po_id, drug_id, quantity) VALUES (%s,%s,%s)",
+                            [(po_id, drug_id, qty) for drug_id, qty in items])
+            drafted.append((po_id, po_number, location_id, len(items)))
+        return drafted, skipped
+
+    return run_transaction(work)
@@ -0,0 +1,66 @@
+"""
+Coalesced, throttled redraws for windows that rescale images on resize.
+
+Dragging a window edge fires dozens of <Configure> events a second -- plus
+one for every child widget that moves, since a binding on a toplevel sees
+its children's events too.  ResizeScheduler listens only to the window's
+own events and calls render(width, height, final):
+
+* at most once per FRAME_MS while the size keeps changing, with
+  final=False (draw a cheap, low-quality version);
+* once more SETTLE_MS after the last change, with final=True (the proper
+  high-quality render);
+* never for a size that has already been drawn at that quality (moving the
+  window, or a child resizing, costs nothing).
+"""
+
+FRAME_MS = 33        # ~30 draft renders a second while dragging
+SETTLE_MS = 150      # quiet time before the high-quality render
+
+
+class ResizeScheduler:
+    def __init__(self, widget, render, frame_ms=FRAME_MS, settle_ms=SETTLE_MS):
+        self.widget = widget
+        self.render = render
+        self.frame_ms = frame_ms
+        self.settle_ms = settle_ms
+        self.size = None          # latest size seen
+        self.drawn = None         # (size, final) of the last render
+        self.renders = 0
+        self._frame_id = None
+        self._settle_id = None
+        widget.bind("<Configure>", self.on_configure, add="+")
+
+    def on_configure(self, event):
+        if event.widget is not self.widget:
+            return
+        size = (event.width, event.height)
+        if size == self.size:
+            return
+        self.size = size
+        if self._frame_id is None:
+            self._frame_id = self.widget.after(self.frame_ms, self._frame)
+        if self._settle_id is not None:
+            self.widget.after_cancel(self._settle_id)
+        self._settle_id = self.widget.after(self.settle_ms, self._settle)
+
+    def render_now(self):
+        """Full-quality render at the window's current size (first layout)."""
+        self.size = (self.widget.winfo_width(), self.widget.winfo_height())
+        self._draw(True)
+
+    def _frame(self):
+        self._frame_id = None
+        if self._settle_id is not None:       # still changing: draft pass
+            self._draw(False)
+
+    def _settle(self):
+        self._settle_id = None
+        self._draw(True)
+
+    def _draw(self, final):
+        if self.size is None or self.drawn in ((self.size, final), (self.size, True)):
+            return
+        self.drawn = (self.size, final)
+        self.renders += 1
+        self.render(self.size[0], self.size[1], final)
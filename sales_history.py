@@ -0,0 +1,123 @@
+"""
+Server-side filtered, keyset-paginated sales history.
+
+Pages are ordered by (timestamp, id) descending and the next page starts
+strictly after the last row seen, so fetching page N costs the same as page 1
+(no OFFSET scan).  Each filter has a matching composite index on consumption
+whose trailing columns are (reason, timestamp), so the database can walk the
+index in order and stop after one page.
+
+Dispense rows are append-only, so an open history view refreshes by asking
+only for rows past the highest id it has shown (fetch_new_sales) -- a primary
+key range scan whose cost follows the number of new sales, not the table size.
+"""
+from datetime import datetime, timedelta
+
+from database import ensure_index, get_connection
+
+PAGE_SIZE = 200
+
+SALES_INDEXES = [
+    ("consumption", "idx_consumption_reason_ts", "reason, timestamp, id"),
+    ("consumption", "idx_consumption_drug_ts", "drug_id, reason, timestamp, id"),
+    ("consumption", "idx_consumption_patient_ts", "patient_id, reason, timestamp, id"),
+    ("consumption", "idx_consumption_user_ts", "dispensed_by, reason, timestamp, id"),
+]
+
+SALES_COLUMNS = """c.id,d.name,b.batch_no,c.patient_id,c.patient_name,c.quantity,c.dispensed_by,c.timestamp"""
+
+
+def ensure_indexes():
+    for table, name, columns in SALES_INDEXES:
+        ensure_index(table, name, columns)
+
+
+def parse_day(text):
+    """'YYYY-MM-DD' -> datetime at midnight, or None for blank input (raises ValueError otherwise)."""
+    text = (text or "").strip()
+    return datetime.strptime(text, "%Y-%m-%d") if text else None
+
+
+def build_filters(date_from=None, date_to=None, drug_id=None, patient_id=None, dispensed_by=None):
+    """Return (where_sql, params) for the non-keyset part of the query; date_to is inclusive."""
+    where, params = ["c.reason='dispense'"], []
+    if date_from:
+        where.append("c.timestamp >= %s")
+        params.append(date_from)
+    if date_to:
+        where.append("c.timestamp < %s")
+        params.append(date_to + timedelta(days=1))
+    if drug_id:
+        where.append("c.drug_id = %s")
+        params.append(int(drug_id))
+    if patient_id:
+        where.append("c.patient_id = %s")
+        params.append(patient_id)
+    if dispensed_by:
+        where.append("c.dispensed_by = %s")
+        params.append(int(dispensed_by))
+    return " AND ".join(where), params
+
+
+def _select(where):
+    return f"""
+        SELECT {SALES_COLUMNS}
+        FROM consumption c
+        JOIN drugs d ON c.drug_id=d.id
+        JOIN drug_batch b ON c.drug_batch_id=b.id
+        WHERE {where}
+        ORDER BY c.timestamp DESC, c.id DESC
+        LIMIT %s
+    """
+
+
+def _fetch(sql, params):
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        cur.close()
+    finally:
+        conn.close()
+    return rows
+
+
+def fetch_sales_page(filters=None, after=None, limit=PAGE_SIZE):
+    """
+    One page of dispense rows matching filters (kwargs for build_filters).
+    after is the (timestamp, id) of the last row already shown.
+    Returns (rows, next_after) -- next_after is None when there are no more rows.
+    """
+    where, params = build_filters(**(filters or {}))
+    if after is not None:
+        where += " AND (c.timestamp < %s OR (c.timestamp = %s AND c.id < %s))"
+        params += [after[0], after[0], after[1]]
+    rows = _fetch(_select(where), params + [limit])
+    next_after = (rows[-1][7], rows[-1][0]) if len(rows) == limit else None
+    return rows, next_after
+
+
+def export_query(filters=None):
+    """(sql, params) selecting every sale matching filters, newest first, for export_engine."""
+    where, params = build_filters(**(filters or {}))
+    sql = f"""
+        SELECT c.id, d.name AS Drug, b.batch_no AS Batch, c.patient_id, c.patient_name AS Patient, c.quantity,
+               c.dispensed_by AS Dispensed_By, c.timestamp AS Date
+        FROM consumption c
+        JOIN drugs d ON c.drug_id=d.id
+        JOIN drug_batch b ON c.drug_batch_id=b.id
+        WHERE {where}
+        ORDER BY c.timestamp DESC, c.id DESC
+    """
+    return sql, params
+
+
+def fetch_new_sales(filters=None, since_id=0, limit=PAGE_SIZE):
+    """
+    Dispense rows matching filters with id > since_id, newest first.
+    Returns None when there are more than limit of them (reload from page one instead).
+    """
+    where, params = build_filters(**(filters or {}))
+    rows = _fetch(_select(where + " AND c.id > %s"), params + [since_id, limit + 1])
+    return None if len(rows) > limit else rows
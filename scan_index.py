@@ -0,0 +1,138 @@
+"""
+Barcode scan resolution: drugs.code -> drug -> FEFO batch, entirely in memory.
+
+ScanIndex holds a hash map from the (case-folded) drug code to the drug and,
+per (location_id, drug_id), the available batches in first-expiry-first-out
+order.  resolve() is a couple of dict lookups and a walk over one drug's
+batches, so a scan never waits for the database.
+
+The index is kept warm by change notifications:
+
+* the Sales window polls every SYNC_MS through two delta_refresh.DeltaViews
+  (new drugs by id, batch changes by drug_batch.last_updated), so stock
+  received or sold at other counters appears within seconds, and
+* this window's own sales are applied immediately with consume().
+
+Dispensing still goes through the guarded decrement, so a briefly stale
+quantity can never oversell; at worst the sale is refused.
+"""
+import bisect
+from datetime import date
+
+from delta_refresh import DeltaView
+from dispense import InsufficientStock
+
+SYNC_MS = 3000
+
+
+class UnknownCode(KeyError):
+    """No drug has this code."""
+
+
+def _norm(code):
+    return (code or "").strip().upper()
+
+
+def _fefo_key(batch):
+    # batch = [drug_id, location_id, batch_no, quantity, expiry_date, batch_id]
+    return (batch[4] is None, batch[4] or date.min, batch[5])
+
+
+class ScanIndex:
+    def __init__(self):
+        self._drugs_view = DeltaView("id, name, code", "drugs", "id")
+        self._batches_view = DeltaView("id, drug_id, location_id, batch_no, quantity, expiry_date", "drug_batch",
+                                       "id", where="status='available' AND quantity>0",
+                                       version_col="last_updated")
+        self.by_code = {}       # code -> (drug_id, name)
+        self._code_of = {}      # drug_id -> code
+        self._batches = {}      # batch_id -> [drug_id, location_id, batch_no, quantity, expiry_date, batch_id]
+        self._fefo = {}         # (location_id, drug_id) -> batches in FEFO order
+
+    @property
+    def loaded(self):
+        return self._drugs_view.loaded and self._batches_view.loaded
+
+    # -------- change notifications --------
+    def fetcher(self):
+        """Worker function returning the changes since the last sync (a full load the first time)."""
+        drugs, batches = self._drugs_view.fetcher(), self._batches_view.fetcher()
+        return lambda _req=None: (drugs(), batches())
+
+    def apply(self, patches):
+        """Apply a fetcher() result on the Tk thread.  Returns the number of changed rows."""
+        drug_patch, batch_patch = patches
+        if drug_patch[0] == "full":
+            self.by_code.clear()
+            self._code_of.clear()
+        for drug_id, name, code in drug_patch[1]:
+            self._drop_drug(drug_id)
+            if code:
+                self.by_code[_norm(code)] = (drug_id, name)
+                self._code_of[drug_id] = _norm(code)
+        for drug_id in drug_patch[2]:
+            self._drop_drug(drug_id)
+        self._drugs_view.advance(drug_patch)
+
+        if batch_patch[0] == "full":
+            self._batches.clear()
+            self._fefo.clear()
+            for batch_id, drug_id, location_id, batch_no, qty, expiry in batch_patch[1]:
+                batch = [drug_id, location_id, batch_no, qty, expiry, batch_id]
+                self._batches[batch_id] = batch
+                self._fefo.setdefault((location_id, drug_id), []).append(batch)
+            for batches in self._fefo.values():
+                batches.sort(key=_fefo_key)
+        else:
+            for batch_id, drug_id, location_id, batch_no, qty, expiry in batch_patch[1]:
+                self._drop_batch(batch_id)
+                batch = [drug_id, location_id, batch_no, qty, expiry, batch_id]
+                self._batches[batch_id] = batch
+                bisect.insort(self._fefo.setdefault((location_id, drug_id), []), batch, key=_fefo_key)
+            for batch_id in batch_patch[2]:
+                self._drop_batch(batch_id)
+        self._batches_view.advance(batch_patch)
+        return len(drug_patch[1]) + len(drug_patch[2]) + len(batch_patch[1]) + len(batch_patch[2])
+
+    def consume(self, dispensed):
+        """Apply this window's own sales right away: dispensed is [(drug_id, batch_id, qty, ...)]."""
+        for line in dispensed:
+            batch = self._batches.get(line[1])
+            if batch is not None:
+                batch[3] -= line[2]
+                if batch[3] <= 0:
+                    self._drop_batch(line[1])
+
+    def _drop_drug(self, drug_id):
+        code = self._code_of.pop(drug_id, None)
+        if code is not None:
+            self.by_code.pop(code, None)
+
+    def _drop_batch(self, batch_id):
+        batch = self._batches.pop(batch_id, None)
+        if batch is not None:
+            batches = self._fefo.get((batch[1], batch[0]), [])
+            if batch in batches:
+                batches.remove(batch)
+
+    # -------- lookup --------
+    def resolve(self, code, location_id, qty=1, reserved=None, today=None):
+        """
+        Map a scanned code to (drug_id, drug_name, batch_id, batch_no): the
+        earliest-expiring unexpired batch at location_id with qty units left
+        after `reserved` ({batch_id: qty} already in the cart).
+        Raises UnknownCode or InsufficientStock.
+        """
+        entry = self.by_code.get(_norm(code))
+        if entry is None:
+            raise UnknownCode(code)
+        drug_id, name = entry
+        today = today or date.today()
+        reserved = reserved or {}
+        for batch in self._fefo.get((location_id, drug_id), ()):
+            expiry = batch[4]
+            if expiry is not None and expiry < today:
+                continue
+            if batch[3] - reserved.get(batch[5], 0) >= qty:
+                return drug_id, name, batch[5], batch[2]
+        raise InsufficientStock(f"No stock of {name} left at this location")
@@ -0,0 +1,264 @@
+"""
+Embedded SQLite storage backend.
+
+Runs the MySQL schema in drug_inventory.sql (and any CREATE TABLE issued at
+runtime, e.g. ensure_patients_table) by translating MySQL-only DDL:
+ENUM -> TEXT + CHECK, AUTO_INCREMENT -> INTEGER PRIMARY KEY AUTOINCREMENT,
+DEFAULT CURRENT_TIMESTAMP -> local time, ON UPDATE CURRENT_TIMESTAMP -> trigger,
+inline KEY/INDEX -> CREATE INDEX.  Connections are wrapped so the UI modules'
+MySQL-style queries (``%s`` placeholders, ``cursor(dictionary=True)``) run
+unchanged.
+"""
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "drug_inventory.sql")
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "drug_inventory.db")
+
+NOW_LOCAL = "(datetime('now','localtime'))"
+
+
+# ----------------- TYPE ADAPTERS -----------------
+def _convert_datetime(raw):
+    return datetime.fromisoformat(raw.decode())
+
+
+def _convert_date(raw):
+    return date.fromisoformat(raw.decode()[:10])
+
+
+def _convert_decimal(raw):
+    return Decimal(raw.decode())
+
+
+sqlite3.register_adapter(datetime, lambda v: v.isoformat(" "))
+sqlite3.register_adapter(date, lambda v: v.isoformat())
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter("DATETIME", _convert_datetime)
+sqlite3.register_converter("DATE", _convert_date)
+sqlite3.register_converter("DECIMAL", _convert_decimal)
+
+
+# ----------------- DDL TRANSLATION -----------------
+_CREATE_RE = re.compile(
+    r"^\s*CREATE\s+TABLE\s+(?P<ine>IF\s+NOT\s+EXISTS\s+)?(?P<name>`?\w+`?)\s*\((?P<body>.*)\)(?P<opts>[^()]*)$",
+    re.IGNORECASE | re.DOTALL,
+)
+_ENUM_RE = re.compile(r"\bENUM\s*\((?P<vals>[^)]*)\)", re.IGNORECASE)
+_AUTO_PK_RE = re.compile(r"\b(?:BIG|SMALL|TINY|MEDIUM)?INT\b(?:\(\d+\))?(?P<rest>.*)\bAUTO_INCREMENT\b", re.IGNORECASE)
+_INDEX_RE = re.compile(r"^(?P<unique>UNIQUE\s+)?(?:KEY|INDEX)\s+`?(?P<name>\w+)`?\s*\((?P<cols>[^)]*)\)", re.IGNORECASE)
+
+
+_FOR_UPDATE_RE = re.compile(r"\s+FOR\s+UPDATE\s*$", re.IGNORECASE)
+
+
+def _strip_comments(sql):
+    return re.sub(r"--[^\n]*", "", sql)
+
+
+def _split_top_level(text, sep=","):
+    """Split on sep outside of parentheses and quotes."""
+    parts, depth, quote, buf = [], 0, None, []
+    for ch in text:
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"', "`"):
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == sep and depth == 0:
+            parts.append("".join(buf).strip())
+            buf = []
+            continue
+        buf.append(ch)
+    if "".join(buf).strip():
+        parts.append("".join(buf).strip())
+    return parts
+
+
+def split_statements(script):
+    """Split a .sql script into individual statements."""
+    return [s for s in _split_top_level(_strip_comments(script), sep=";") if s]
+
+
+def translate_create_table(sql):
+    """Translate one MySQL CREATE TABLE into a list of SQLite statements."""
+    m = _CREATE_RE.match(_strip_comments(sql).strip().rstrip(";"))
+    if not m:
+        return [sql]
+    table = m.group("name").strip("`")
+    if_not_exists = "IF NOT EXISTS " if m.group("ine") else ""
+    columns, extra = [], []
+    pk = None
+    for item in _split_top_level(m.group("body")):
+        idx = _INDEX_RE.match(item)
+        if idx:
+            unique = "UNIQUE " if idx.group("unique") else ""
+            extra.append(f"CREATE {unique}INDEX IF NOT EXISTS {idx.group('name')} "
+                         f"ON {table} ({idx.group('cols')})")
+            continue
+        head = item.split(None, 1)[0].upper()
+        if head in ("CONSTRAINT", "FOREIGN", "PRIMARY", "UNIQUE", "CHECK"):
+            columns.append(item)
+            continue
+
+        col = item.split(None, 1)[0].strip("`")
+        definition = item
+        checks = ""
+        enum = _ENUM_RE.search(definition)
+        if enum:
+            definition = _ENUM_RE.sub("TEXT", definition, count=1)
+            checks = f" CHECK ({col} IN ({enum.group('vals')}))"
+        if _AUTO_PK_RE.search(definition):
+            definition = f"{col} INTEGER PRIMARY KEY AUTOINCREMENT"
+            pk = col
+        if re.search(r"\bON\s+UPDATE\s+CURRENT_TIMESTAMP\b", definition, re.IGNORECASE):
+            definition = re.sub(r"\s*\bON\s+UPDATE\s+CURRENT_TIMESTAMP\b", "", definition, flags=re.IGNORECASE)
+            key = pk or "rowid"
+            extra.append(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{col}_on_update "
+                f"AFTER UPDATE ON {table} FOR EACH ROW WHEN NEW.{col} IS OLD.{col} "
+                f"BEGIN UPDATE {table} SET {col} = {NOW_LOCAL} WHERE {key} = NEW.{key}; END"
+            )
+        definition = re.sub(r"\bDEFAULT\s+CURRENT_TIMESTAMP\b", f"DEFAULT {NOW_LOCAL}",
+                            definition, flags=re.IGNORECASE)
+        columns.append(definition + checks)
+
+    create = f"CREATE TABLE {if_not_exists}{table} (\n  " + ",\n  ".join(columns) + "\n)"
+    return [create] + extra
+
+
+@lru_cache(maxsize=512)
+def translate(sql):
+    """Translate one MySQL statement into a tuple of SQLite statements."""
+    stripped = sql.lstrip()
+    if re.match(r"CREATE\s+TABLE\b", stripped, re.IGNORECASE):
+        return tuple(translate_create_table(stripped))
+    # %s placeholders -> ?, %% -> %
+    out = re.sub(r"%(s|%)", lambda mm: "?" if mm.group(1) == "s" else "%", sql)
+    # row locks: the writer already holds the database lock (BEGIN IMMEDIATE)
+    out = _FOR_UPDATE_RE.sub("", out)
+    return (out,)
+
+
+# ----------------- CONNECTION WRAPPERS -----------------
+class SQLiteCursor:
+    """mysql.connector-like cursor over sqlite3."""
+
+    def __init__(self, conn, dictionary=False):
+        self._cur = conn.cursor()
+        self._dictionary = dictionary
+
+    def execute(self, sql, params=()):
+        statements = translate(sql)
+        for stmt in statements[:-1]:
+            self._cur.execute(stmt)
+        self._cur.execute(statements[-1], tuple(params or ()))
+
+    def executemany(self, sql, seq_params):
+        self._cur.executemany(translate(sql)[-1], [tuple(p) for p in seq_params])
+
+    def _wrap(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {d[0]: v for d, v in zip(self._cur.description, row)}
+
+    def fetchone(self):
+        return self._wrap(self._cur.fetchone())
+
+    def fetchmany(self, size=None):
+        rows = self._cur.fetchmany(size) if size else self._cur.fetchmany()
+        return [self._wrap(r) for r in rows]
+
+    def fetchall(self):
+        return [self._wrap(r) for r in self._cur.fetchall()]
+
+    def __iter__(self):
+        for row in self._cur:
+            yield self._wrap(row)
+
+    @property
+    def description(self):
+        return self._cur.description
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cur.lastrowid
+
+    def close(self):
+        self._cur.close()
+
+
+class SQLiteConnection:
+    """mysql.connector-like connection over sqlite3."""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._open = True
+
+    def cursor(self, dictionary=False, buffered=None, **_ignored):
+        return SQLiteCursor(self._raw, dictionary=dictionary)
+
+    def start_transaction(self, isolation_level=None, readonly=False):
+        # take the write lock up front so concurrent writers queue instead of deadlocking
+        self._raw.execute("BEGIN" if readonly else "BEGIN IMMEDIATE")
+
+    @property
+    def in_transaction(self):
+        return self._raw.in_transaction
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def is_connected(self):
+        return self._open
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        if not self._open:
+            raise sqlite3.ProgrammingError("connection closed")
+
+    def close(self):
+        self._open = False
+        self._raw.close()
+
+
+# ----------------- PUBLIC API -----------------
+def connect(path=DEFAULT_PATH, timeout=5.0):
+    raw = sqlite3.connect(path, timeout=timeout, detect_types=sqlite3.PARSE_DECLTYPES,
+                          check_same_thread=False)
+    raw.execute("PRAGMA foreign_keys = ON")
+    raw.execute("PRAGMA synchronous = NORMAL")
+    if path != ":memory:":
+        raw.execute("PRAGMA journal_mode = WAL")
+    return SQLiteConnection(raw)
+
+
+def bootstrap(path=DEFAULT_PATH, schema_path=SCHEMA_PATH):
+    """Create the drug_inventory schema in an empty database file."""
+    conn = connect(path)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='drugs'")
+        if cur.fetchone():
+            return
+        with open(schema_path, encoding="utf-8") as f:
+            statements = split_statements(f.read())
+        for stmt in statements:
+            cur.execute(stmt)
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,168 @@
+"""
+Maintained on-hand stock per (drug_id, location_id).
+
+stock_on_hand.quantity is the sum of drug_batch.quantity over the pair's
+'available' batches.  It is never recomputed on the fly: every transaction
+that changes available stock -- dispense / dispense_cart, goods receipts and
+manifest imports, the expiry sweeper -- calls apply() with its per-pair
+deltas inside that same transaction, so the summary commits or rolls back
+with the batches.  A stock question is then one primary-key read.
+
+``python stock_on_hand.py --verify`` compares the table with drug_batch and
+lists any pair that drifted; ``--rebuild`` recomputes it from scratch.
+"""
+import threading
+
+from database import backend_name, get_connection, run_transaction
+
+TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS stock_on_hand (
+  drug_id INT NOT NULL,
+  location_id INT NOT NULL,
+  quantity INT NOT NULL DEFAULT 0,
+  last_updated DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (drug_id, location_id),
+  CONSTRAINT fk_soh_drug FOREIGN KEY (drug_id) REFERENCES drugs(id),
+  CONSTRAINT fk_soh_location FOREIGN KEY (location_id) REFERENCES locations(id)
+)
+"""
+
+_UPSERT = {
+    "mysql": """INSERT INTO stock_on_hand (drug_id, location_id, quantity) VALUES (%s,%s,%s)
+                ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)""",
+    "sqlite": """INSERT INTO stock_on_hand (drug_id, location_id, quantity) VALUES (%s,%s,%s)
+                 ON CONFLICT (drug_id, location_id) DO UPDATE SET quantity = quantity + excluded.quantity""",
+}
+
+_BATCH_TOTALS = """
+    SELECT drug_id, location_id, SUM(quantity) AS quantity FROM drug_batch
+    WHERE status = 'available' GROUP BY drug_id, location_id
+"""
+
+_ready = False
+_ready_lock = threading.Lock()
+
+
+def _table_exists(cur):
+    if backend_name() == "sqlite":
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='stock_on_hand'")
+    else:
+        cur.execute("""SELECT 1 FROM information_schema.tables
+                       WHERE table_schema = DATABASE() AND table_name = 'stock_on_hand'""")
+    return cur.fetchone() is not None
+
+
+def ensure_table():
+    """
+    Create stock_on_hand (filled from drug_batch) in databases that predate
+    it.  Cheap after the first call; run before any transaction that calls
+    apply(), never inside one (DDL commits implicitly on MySQL).
+    """
+    global _ready
+    if _ready:
+        return
+    with _ready_lock:
+        if _ready:
+            return
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            created = not _table_exists(cur)
+            if created:
+                cur.execute(TABLE_SQL)
+                conn.commit()
+        finally:
+            conn.close()
+        if created:
+            rebuild()
+        _ready = True
+
+
+# ----------------- MAINTENANCE -----------------
+def apply(cur, deltas):
+    """Add {(drug_id, location_id): quantity change} inside the caller's transaction."""
+    rows = [(drug_id, location_id, delta) for (drug_id, location_id), delta in sorted(deltas.items()) if delta]
+    if rows:
+        cur.executemany(_UPSERT[backend_name()], rows)
+
+
+def rebuild():
+    """Recompute the whole table from drug_batch in one transaction.  Returns the number of pairs."""
+    def work(cur):
+        cur.execute("DELETE FROM stock_on_hand")
+        cur.execute(f"INSERT INTO stock_on_hand (drug_id, location_id, quantity) {_BATCH_TOTALS}")
+        return cur.rowcount
+    return run_transaction(work)
+
+
+def verify():
+    """[(drug_id, location_id, batch_total, on_hand)] for every pair where the two disagree."""
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT b.drug_id, b.location_id, b.quantity, COALESCE(s.quantity, 0)
+            FROM ({_BATCH_TOTALS}) b
+            LEFT JOIN stock_on_hand s ON s.drug_id = b.drug_id AND s.location_id = b.location_id
+            WHERE COALESCE(s.quantity, 0) <> b.quantity
+            UNION ALL
+            SELECT s.drug_id, s.location_id, 0, s.quantity FROM stock_on_hand s
+            WHERE s.quantity <> 0 AND NOT EXISTS (
+                SELECT 1 FROM drug_batch b
+                WHERE b.drug_id = s.drug_id AND b.location_id = s.location_id AND b.status = 'available')
+        """)
+        return cur.fetchall()
+    finally:
+        conn.close()
+
+
+# ----------------- LOOKUP -----------------
+def on_hand(drug_id, location_id):
+    """Available units of drug_id at location_id (0 if it never had stock there)."""
+    ensure_table()
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT quantity FROM stock_on_hand WHERE drug_id = %s AND location_id = %s",
+                    (drug_id, location_id))
+        row = cur.fetchone()
+        return row[0] if row else 0
+    finally:
+        conn.close()
+
+
+def on_hand_many(pairs):
+    """{(drug_id, location_id): quantity} for many pairs, one query per 500."""
+    ensure_table()
+    pairs = list(dict.fromkeys(pairs))
+    found = dict.fromkeys(pairs, 0)
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        for i in range(0, len(pairs), 500):
+            chunk = pairs[i:i + 500]
+            cond = " OR ".join(["(drug_id = %s AND location_id = %s)"] * len(chunk))
+            cur.execute(f"SELECT drug_id, location_id, quantity FROM stock_on_hand WHERE {cond}",
+                        [v for pair in chunk for v in pair])
+            for drug_id, location_id, qty in cur.fetchall():
+                found[(drug_id, location_id)] = qty
+    finally:
+        conn.close()
+    return found
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Check or rebuild the stock_on_hand summary table.")
+    ap.add_argument("--verify", action="store_true", help="compare stock_on_hand with drug_batch (the default)")
+    ap.add_argument("--rebuild", action="store_true", help="recompute stock_on_hand from drug_batch, then verify")
+    args = ap.parse_args()
+    ensure_table()
+    if args.rebuild:
+        print(f"stock_on_hand rebuilt: {rebuild()} drug/location pair(s)")
+    drift = verify()
+    for drug_id, location_id, batches, summary in drift:
+        print(f"drug {drug_id} @ location {location_id}: batches {batches}, stock_on_hand {summary}")
+    print(f"{len(drift)} pair(s) out of step" if drift else "stock_on_hand matches drug_batch")
+    raise SystemExit(1 if drift else 0)
@@ -0,0 +1,450 @@
+"""
+Virtualized table: a drop-in replacement for a ``show="headings"`` Treeview
+that stays fast with hundreds of thousands of rows.
+
+Rows live in a RowStore -- a dict of iid -> values tuple plus a list giving
+their order -- and the Treeview inside VirtualTable only ever holds the rows
+that fit on screen.  Scrolling, sorting (click a heading) and filtering work
+on the store and re-render that window, so the cost of a refresh depends on
+the window height, not on the row count.
+
+VirtualTable keeps the Treeview methods the windows use (insert, delete,
+item, exists, get_children, selection, focus, heading, column, yview,
+configure(yscroll=...), bind("<<TreeviewSelect>>"), tree["columns"]), so
+DeltaView.apply and the existing load/export code work unchanged.
+"""
+import itertools
+import tkinter as tk
+from datetime import date, datetime, time
+from decimal import Decimal
+from tkinter import ttk
+
+FILTER_DELAY_MS = 200
+_CTRL_SHIFT = 0x0001 | 0x0004
+
+
+def _cell(v):
+    """Cell value as the Treeview would show it (dates and decimals become text, None blank)."""
+    if v is None:
+        return ""
+    if isinstance(v, (datetime, date, Decimal)):
+        return str(v)
+    return v
+
+
+def _text(values):
+    # str() matches the display for every cell type but None
+    return " ".join(["" if v is None else str(v) for v in values]).lower()
+
+
+def _sort_key(v):
+    # on the raw value: numbers (Decimal too), then dates, then text, blanks last;
+    # never compares values of different kinds
+    if isinstance(v, (int, float, Decimal)) and not isinstance(v, bool):
+        return (0, v)
+    if isinstance(v, date):
+        return (1, v if isinstance(v, datetime) else datetime.combine(v, time.min))
+    if v == "" or v is None:
+        return (3, 0)
+    return (2, str(v).lower())
+
+
+class RowStore:
+    """Ordered rows with an optional sort and filter applied on top (no Tk needed)."""
+
+    def __init__(self):
+        self.rows = {}          # iid -> values tuple, raw (sorting needs the numbers and dates)
+        self.order = []         # iids in insertion order
+        self.sort_col = None    # column index
+        self.descending = False
+        self.filter_text = ""
+        self._view = None       # sorted/filtered iids, rebuilt lazily
+        self._text = {}         # iid -> lowercased row text, built by the first filter
+        self._auto = itertools.count(1)
+
+    def __len__(self):
+        return len(self.rows)
+
+    # -------- editing --------
+    def insert(self, index, iid, values):
+        iid = f"I{next(self._auto):06X}" if iid is None else str(iid)
+        if iid in self.rows:
+            raise tk.TclError(f'Item {iid} already exists')
+        self.rows[iid] = tuple(values)
+        if index == "end":
+            self.order.append(iid)
+        else:
+            self.order.insert(int(index), iid)
+        self._dirty()
+        return iid
+
+    def update(self, iid, values):
+        self.rows[str(iid)] = tuple(values)
+        self._text.pop(str(iid), None)
+        if self.sort_col is not None or self.filter_text:
+            self._dirty()
+
+    def delete(self, iids):
+        gone = {str(i) for i in iids} & self.rows.keys()
+        if not gone:
+            return gone
+        for iid in gone:
+            del self.rows[iid]
+            self._text.pop(iid, None)
+        if len(gone) == len(self.order):
+            self.order = []
+        elif len(gone) == 1:
+            self.order.remove(next(iter(gone)))
+        else:
+            self.order = [i for i in self.order if i not in gone]
+        self._dirty()
+        return gone
+
+    # -------- view --------
+    def sort(self, col, descending=False):
+        self.sort_col, self.descending = col, descending
+        self._dirty()
+
+    def set_filter(self, text):
+        self.filter_text = (text or "").strip().lower()
+        self._dirty()
+
+    def view(self):
+        """iids in display order (filtered and sorted)."""
+        if self._view is None:
+            if self.sort_col is None and not self.filter_text:
+                return self.order
+            ids = self.order
+            if self.filter_text:
+                needle, rows, text = self.filter_text, self.rows, self._text
+                for i in ids:
+                    if i not in text:
+                        text[i] = _text(rows[i])
+                ids = [i for i in ids if needle in text[i]]
+            if self.sort_col is not None:
+                col, rows = self.sort_col, self.rows
+                ids = sorted(ids, key=lambda i: _sort_key(rows[i][col] if col < len(rows[i]) else ""),
+                             reverse=self.descending)
+            self._view = ids
+        return self._view
+
+    def _dirty(self):
+        self._view = None
+
+
+class VirtualTable(ttk.Frame):
+    """Treeview look-alike that renders only the visible rows of a RowStore."""
+
+    def __init__(self, parent, columns=(), show="headings", selectmode="browse", height=10, filterable=False,
+                 **kw):
+        super().__init__(parent, **kw)
+        self.store = RowStore()
+        self._columns = tuple(columns)
+        self._titles = {c: str(c) for c in self._columns}
+        self._offset = 0
+        self._rows_shown = height
+        self._header = 26
+        self._selected = {}          # ordered set of selected iids (also those scrolled away)
+        self._focus = ""
+        self._plain_click = False
+        self._yscroll = None
+        self._select_callbacks = []
+        self._render_id = None
+        self._filter_id = None
+
+        self.rowconfigure(1, weight=1)
+        self.columnconfigure(0, weight=1)
+        if filterable:
+            bar = ttk.Frame(self)
+            bar.grid(row=0, column=0, sticky="ew", pady=(0, 4))
+            ttk.Label(bar, text="Filter:").pack(side="left")
+            self.filter_var = tk.StringVar()
+            ttk.Entry(bar, textvariable=self.filter_var, width=30).pack(side="left", padx=4)
+            self.filter_var.trace_add("write", lambda *_: self._filter_later())
+        self._tv = ttk.Treeview(self, columns=self._columns, show=show, selectmode=selectmode, height=height)
+        self._tv.grid(row=1, column=0, sticky="nsew")
+        for c in self._columns:
+            self._tv.heading(c, text=self._titles[c], command=lambda c=c: self.sort_by(c))
+
+        tv = self._tv
+        tv.bind("<Configure>", self._on_resize)
+        tv.bind("<<TreeviewSelect>>", self._on_select)
+        tv.bind("<ButtonPress-1>", self._on_click)
+        tv.bind("<KeyPress>", lambda e: setattr(self, "_plain_click", not e.state & _CTRL_SHIFT), add="+")
+        tv.bind("<MouseWheel>", lambda e: self._scroll_units(-1 if e.delta > 0 else 1, 3))
+        tv.bind("<Button-4>", lambda e: self._scroll_units(-1, 3))
+        tv.bind("<Button-5>", lambda e: self._scroll_units(1, 3))
+        tv.bind("<Up>", lambda e: self._step(-1, e))
+        tv.bind("<Down>", lambda e: self._step(1, e))
+        tv.bind("<Prior>", lambda e: self._scroll_units(-1, self._rows_shown))
+        tv.bind("<Next>", lambda e: self._scroll_units(1, self._rows_shown))
+        tv.bind("<Home>", lambda e: self._jump(0))
+        tv.bind("<End>", lambda e: self._jump(len(self.store)))
+
+    # -------- Treeview API --------
+    def insert(self, parent, index, iid=None, values=(), **_ignored):
+        iid = self.store.insert(index, iid, values)
+        self._render_later()
+        return iid
+
+    def delete(self, *items):
+        gone = self.store.delete(items)
+        if gone:
+            for iid in gone:
+                self._selected.pop(iid, None)
+            if self._focus in gone:
+                self._focus = ""
+            self._render_later()
+
+    def exists(self, item):
+        return str(item) in self.store.rows
+
+    def get_children(self, item=""):
+        return tuple(self.store.order) if not item else ()
+
+    def item(self, item, option=None, **kw):
+        item = str(item)
+        if item not in self.store.rows:
+            raise tk.TclError(f"Item {item} not found")
+        if "values" in kw:
+            self.store.update(item, kw["values"])
+            self._render_later()
+            return None
+        values = tuple(map(_cell, self.store.rows[item]))
+        if option == "values":
+            return values
+        info = {"text": "", "image": "", "values": values, "open": 0, "tags": ""}
+        return info[option] if option else info
+
+    def set(self, item, column, value=None):
+        values = list(self.store.rows[str(item)])
+        idx = self._columns.index(column)
+        if value is None:
+            return values[idx]
+        values[idx] = value
+        self.item(item, values=values)
+
+    def selection(self):
+        return tuple(self._selected)
+
+    def selection_set(self, *items):
+        self._selected = dict.fromkeys(str(i) for it in items for i in (it if isinstance(it, (list, tuple)) else (it,)))
+        self._sync_selection()
+
+    def selection_remove(self, *items):
+        for it in items:
+            for i in (it if isinstance(it, (list, tuple)) else (it,)):
+                self._selected.pop(str(i), None)
+        self._sync_selection()
+
+    def focus(self, item=None):
+        if item is None:
+            return self._focus
+        self._focus = str(item)
+        if self._tv.exists(self._focus):
+            self._tv.focus(self._focus)
+
+    def see(self, item):
+        view = self.store.view()
+        try:
+            pos = view.index(str(item))
+        except ValueError:
+            return
+        if not self._offset <= pos < self._offset + self._rows_shown:
+            self._offset = max(0, pos - self._rows_shown // 2)
+            self._render()
+
+    def heading(self, column, option=None, **kw):
+        if "text" in kw:
+            self._titles[column] = kw["text"]
+            kw["text"] = self._heading_text(column)
+        return self._tv.heading(column, option, **kw)
+
+    def column(self, column, option=None, **kw):
+        return self._tv.column(column, option, **kw)
+
+    def yview(self, *args):
+        if not args:
+            return self._fractions()
+        total = len(self.store.view())
+        if args[0] == "moveto":
+            self._offset = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            step = self._rows_shown if args[2].startswith("page") else 1
+            self._offset += int(args[1]) * step
+        self._render()
+
+    def configure(self, cnf=None, **kw):
+        kw = dict(cnf or {}, **kw)
+        for key in ("yscroll", "yscrollcommand"):
+            if key in kw:
+                self._yscroll = kw.pop(key)
+                self._report_scroll()
+        tree_opts = {k: kw.pop(k) for k in ("selectmode", "height", "show", "displaycolumns") if k in kw}
+        if tree_opts:
+            self._tv.configure(**tree_opts)
+        return super().configure(**kw) if kw else None
+
+    config = configure
+
+    def cget(self, key):
+        if key == "columns":
+            return self._columns
+        if key in ("selectmode", "height", "show", "displaycolumns"):
+            return self._tv.cget(key)
+        return super().cget(key)
+
+    __getitem__ = cget
+
+    def bind(self, sequence=None, func=None, add=None):
+        if sequence == "<<TreeviewSelect>>":
+            if not add:
+                self._select_callbacks = []
+            if func is not None:
+                self._select_callbacks.append(func)
+            return None
+        return self._tv.bind(sequence, func, add)
+
+    def identify_row(self, y):
+        return self._tv.identify_row(y)
+
+    # -------- sort / filter --------
+    def sort_by(self, column, descending=None):
+        """Sort the rows by column (clicking a heading toggles the direction)."""
+        idx = self._columns.index(column)
+        if descending is None:
+            descending = self.store.sort_col == idx and not self.store.descending
+        self.store.sort(idx, descending)
+        for c in self._columns:
+            self._tv.heading(c, text=self._heading_text(c))
+        self._offset = 0
+        self._render()
+
+    def set_filter(self, text):
+        self.store.set_filter(text)
+        self._offset = 0
+        self._render()
+
+    def _heading_text(self, column):
+        store = self.store
+        if store.sort_col is not None and self._columns[store.sort_col] == column:
+            return f"{self._titles[column]} {'▼' if store.descending else '▲'}"
+        return self._titles[column]
+
+    def _filter_later(self):
+        if self._filter_id is not None:
+            self.after_cancel(self._filter_id)
+        self._filter_id = self.after(FILTER_DELAY_MS, self._apply_filter)
+
+    def _apply_filter(self):
+        self._filter_id = None
+        self.set_filter(self.filter_var.get())
+
+    # -------- rendering --------
+    def _render_later(self):
+        # many inserts in a row (a full load) end in one render
+        if self._render_id is None:
+            self._render_id = self.after_idle(self._render)
+
+    def _render(self):
+        if self._render_id is not None:
+            self.after_cancel(self._render_id)
+            self._render_id = None
+        view = self.store.view()
+        self._offset = max(0, min(self._offset, len(view) - self._rows_shown))
+        window = view[self._offset:self._offset + self._rows_shown]
+        tv, rows = self._tv, self.store.rows
+        if tuple(window) != tv.get_children():
+            tv.delete(*tv.get_children())
+            for iid in window:
+                tv.insert("", "end", iid=iid, values=tuple(map(_cell, rows[iid])))
+        else:
+            for iid in window:
+                tv.item(iid, values=tuple(map(_cell, rows[iid])))
+        self._sync_selection()
+        self._report_scroll()
+        if window:
+            box = tv.bbox(window[0])
+            if box:
+                self._header = box[1]
+
+    def _sync_selection(self):
+        tv = self._tv
+        shown = [i for i in tv.get_children() if i in self._selected]
+        if tuple(shown) != tv.selection():
+            tv.selection_set(shown)
+        if self._focus and tv.exists(self._focus):
+            tv.focus(self._focus)
+
+    def _fractions(self):
+        total = len(self.store.view())
+        if not total:
+            return 0.0, 1.0
+        return self._offset / total, min(1.0, (self._offset + self._rows_shown) / total)
+
+    def _report_scroll(self):
+        if self._yscroll is not None:
+            self._yscroll(*self._fractions())
+
+    def _on_resize(self, event):
+        style = ttk.Style(self)
+        rowheight = int(style.lookup(self._tv.cget("style") or "Treeview", "rowheight") or 20)
+        rows = max(1, (event.height - self._header) // rowheight)
+        if rows != self._rows_shown:
+            self._rows_shown = rows
+            self._render()
+
+    def _scroll_units(self, direction, n):
+        self._offset += direction * n
+        self._render()
+        return "break"
+
+    def _jump(self, offset):
+        self._offset = offset
+        self._render()
+        return "break"
+
+    def _step(self, direction, event):
+        """Arrow keys past the first/last visible row scroll the window by one."""
+        shown = self._tv.get_children()
+        if not shown or self._tv.focus() != shown[0 if direction < 0 else -1]:
+            return None
+        view = self.store.view()
+        pos = self._offset + (0 if direction < 0 else len(shown) - 1) + direction
+        if not 0 <= pos < len(view):
+            return "break"
+        iid = view[pos]
+        self._offset += direction
+        if event.state & _CTRL_SHIFT and str(self._tv.cget("selectmode")) == "extended":
+            self._selected[iid] = None
+        else:
+            self._selected = {iid: None}
+        self._focus = iid
+        self._render()
+        self._fire_select()
+        return "break"
+
+    # -------- selection --------
+    def _on_click(self, event):
+        # a plain click on a row replaces the selection, including rows scrolled out of view
+        if self._tv.identify_region(event.x, event.y) == "cell":
+            self._plain_click = not event.state & _CTRL_SHIFT
+
+    def _on_select(self, event):
+        tv = self._tv
+        shown, picked = set(tv.get_children()), tv.selection()
+        if self._plain_click:
+            selected = dict.fromkeys(picked)
+        else:
+            selected = {i: None for i in self._selected if i not in shown}
+            selected.update(dict.fromkeys(picked))
+        self._plain_click = False
+        if tv.focus():
+            self._focus = tv.focus()
+        if selected.keys() != self._selected.keys():
+            self._selected = selected
+            self._fire_select(event)
+
+    def _fire_select(self, event=None):
+        for func in list(self._select_callbacks):
+            func(event)
@@ -0,0 +1,224 @@
+"""
+Pre-forked launcher for running each module window in its own process.
+
+For crash isolation the launcher can keep every module in a separate
+process (``python Main.py --isolated``).  Instead of cold-starting Python
+per click, it starts one "zygote" process up front that imports the heavy
+dependencies (tkinter, PIL, mysql.connector, pandas, fpdf, openpyxl) and
+the four modules, then waits.  Each tile click is a line on the zygote's
+stdin; the zygote forks, and the child -- which already has everything
+imported -- builds the window and runs its own mainloop.  No Tk interpreter,
+thread or connection exists in the zygote, so forking it is safe.
+
+Every child reports back when its window has first painted, measured from
+the click on a clock shared by all processes, so the fork path can be
+compared with a plain Popen per click (``--isolated=popen``, or
+``python zygote.py --compare "Sales UI"``).  Without os.fork (Windows) the
+fork mode falls back to Popen.
+"""
+import importlib
+import json
+import os
+import queue
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from module_host import MODULES
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PRELOAD = ("tkinter", "tkinter.ttk", "tkinter.messagebox", "tkinter.filedialog", "PIL.Image", "PIL.ImageTk",
+           "mysql.connector", "pandas", "fpdf", "openpyxl")
+FORK_AVAILABLE = hasattr(os, "fork")
+POLL_MS = 50
+
+
+def _report(**event):
+    # one short write per line, so lines from concurrent children never interleave
+    os.write(1, (json.dumps(event) + "\n").encode())
+
+
+# ----------------- CHILD (one module window) -----------------
+def run_window(title, t0):
+    """Build title's window in this process, report its first paint, run until it closes."""
+    import tkinter as tk
+
+    name, opener = MODULES[title]
+    module = importlib.import_module(name)
+    root = tk.Tk()
+    root.withdraw()
+    win = opener(module, root)
+    win.bind("<Destroy>", lambda e: root.destroy() if e.widget is win else None, add="+")
+
+    def painted():
+        _report(event="ready", title=title, pid=os.getpid(), ms=(time.monotonic() - t0) * 1000)
+    root.after_idle(lambda: root.after(0, painted))
+    root.mainloop()
+
+
+def _run_child(title, t0):
+    try:
+        run_window(title, t0)
+    except Exception as e:
+        _report(event="error", title=title, pid=os.getpid(), error=f"{type(e).__name__}: {e}")
+        return 1
+    return 0
+
+
+# ----------------- ZYGOTE -----------------
+def preload():
+    """Import the heavy dependencies and the modules.  Returns (loaded, missing, ms)."""
+    start = time.perf_counter()
+    loaded, missing = [], []
+    for name in PRELOAD + tuple(name for name, _ in MODULES.values()):
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except Exception:
+            missing.append(name)
+    return loaded, missing, (time.perf_counter() - start) * 1000
+
+
+def serve():
+    """Zygote main loop: preload, then fork a window process per request line on stdin."""
+    loaded, missing, ms = preload()
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)     # children are reaped automatically
+    _report(event="up", pid=os.getpid(), preload_ms=ms, loaded=len(loaded), missing=missing)
+    for line in sys.stdin:
+        try:
+            request = json.loads(line)
+            title, t0 = request["title"], request["t0"]
+        except (ValueError, KeyError):
+            continue
+        pid = os.fork()
+        if pid == 0:
+            sys.stdin.close()
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            os._exit(_run_child(title, t0))
+        _report(event="forked", title=title, pid=pid)
+
+
+# ----------------- LAUNCHER SIDE -----------------
+class Launcher:
+    """
+    Opens module windows as separate processes, through the zygote (mode
+    "fork") or a new interpreter per click (mode "popen").  on_event(dict)
+    is called on the Tk thread for every report ("up", "ready", "error").
+    """
+
+    def __init__(self, root, on_event, mode="fork"):
+        self.root = root
+        self.on_event = on_event
+        self.mode = mode if FORK_AVAILABLE else "popen"
+        self.events = queue.Queue()
+        self.zygote = None
+        if self.mode == "fork":
+            self._start_zygote()
+        root.after(POLL_MS, self._poll)
+
+    def _start_zygote(self):
+        self.zygote = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve"], cwd=ROOT,
+                                       stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1)
+        self._read(self.zygote.stdout)
+
+    def _read(self, stream):
+        def pump():
+            for line in stream:
+                try:
+                    self.events.put(json.loads(line))
+                except ValueError:
+                    pass
+        threading.Thread(target=pump, name="launch-reports", daemon=True).start()
+
+    def launch(self, title):
+        """Start title's window process; its "ready" report carries the launch-to-first-window time."""
+        t0 = time.monotonic()
+        if self.mode == "fork":
+            if self.zygote.poll() is None:
+                self.zygote.stdin.write(json.dumps({"title": title, "t0": t0}) + "\n")
+                self.zygote.stdin.flush()
+                return "fork"
+            self._start_zygote()    # it died; this click goes through Popen while the new one warms up
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--run", title, "--t0", repr(t0)],
+                                cwd=ROOT, stdout=subprocess.PIPE, text=True, bufsize=1)
+        self._read(proc.stdout)
+        return "popen"
+
+    def _poll(self):
+        try:
+            while True:
+                self.on_event(self.events.get_nowait())
+        except queue.Empty:
+            pass
+        try:
+            self.root.after(POLL_MS, self._poll)
+        except Exception:
+            pass        # launcher closed
+
+    def close(self):
+        if self.zygote is not None and self.zygote.poll() is None:
+            self.zygote.stdin.close()
+            self.zygote.terminate()
+
+
+def compare(title, runs):
+    """Launch title runs times each way (needs a display); prints median launch-to-first-window."""
+    import tkinter as tk
+
+    root = tk.Tk()
+    root.withdraw()
+    results = {"fork": [], "popen": []}
+    errors = []
+    state = {"up": not FORK_AVAILABLE}
+
+    def on_event(event):
+        if event["event"] == "up":
+            state["up"] = True
+        elif event["event"] == "ready":
+            results[state["mode"]].append(event["ms"])
+            os.kill(event["pid"], signal.SIGTERM)
+        elif event["event"] == "error":
+            errors.append(event["error"])
+
+    for mode in ("fork", "popen"):
+        state["mode"] = mode
+        launcher = Launcher(root, on_event, mode=mode)
+        while not state["up"]:
+            root.update()
+            time.sleep(0.01)
+        for _ in range(runs):
+            before = len(results[mode])
+            launcher.launch(title)
+            while len(results[mode]) == before and not errors:
+                root.update()
+                time.sleep(0.005)
+            if errors:
+                raise SystemExit(f"{title} failed to open: {errors[0]}")
+        launcher.close()
+    root.destroy()
+    for mode, values in results.items():
+        values.sort()
+        print(f"{title} via {mode:<5}: median {values[len(values) // 2]:,.0f} ms to first window "
+              f"(min {values[0]:,.0f}, max {values[-1]:,.0f})")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Pre-forked module launcher.")
+    ap.add_argument("--serve", action="store_true", help="run as the zygote (started by the launcher)")
+    ap.add_argument("--run", metavar="TITLE", help="open one module window in this process")
+    ap.add_argument("--t0", type=float, help="time.monotonic() of the click, for the ready report")
+    ap.add_argument("--compare", metavar="TITLE", help="time fork against Popen launches of this module")
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+    if args.serve:
+        serve()
+    elif args.run:
+        raise SystemExit(_run_child(args.run, args.t0 if args.t0 is not None else time.monotonic()))
+    elif args.compare:
+        compare(args.compare, args.runs)
+    else:
+        ap.print_help()